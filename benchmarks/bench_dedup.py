@@ -0,0 +1,130 @@
+"""
+bench_dedup.py — поштучная проверка posted/pending против пакетной (dedup.lookup_known).
+
+Запуск:
+    python benchmarks/bench_dedup.py                      # фейковый клиент, RTT 60 мс
+    python benchmarks/bench_dedup.py --rtt 120 --counts 20 100 500
+    SUPABASE_URL=... SUPABASE_KEY=... python benchmarks/bench_dedup.py --live
+
+Для каждого числа кандидатов считает HTTP-запросы к Supabase и время:
+  per-url — как было: is_already_posted + is_already_pending на каждый URL
+  batch   — один запрос `in_` на таблицу (пачки по dedup.DEDUP_CHUNK)
+С фейковым клиентом каждый запрос «стоит» --rtt миллисекунд (time.sleep),
+с --live запросы идут в настоящую базу (только чтение).
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dedup import lookup_known  # noqa: E402
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client  = client
+        self.rows    = client.tables[table]
+        self.filters = []
+
+    def select(self, *_):
+        return self
+
+    def eq(self, col, value):
+        self.filters.append(lambda row: row.get(col) == value)
+        return self
+
+    def in_(self, col, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(col) in values)
+        return self
+
+    def execute(self):
+        self.client.trips += 1
+        time.sleep(self.client.rtt)
+
+        class _Res:
+            pass
+        res = _Res()
+        res.data = [row for row in self.rows if all(f(row) for f in self.filters)]
+        return res
+
+
+class FakeClient:
+    """Минимальный двойник supabase-py: table().select().eq()/in_().execute()."""
+
+    def __init__(self, tables: dict, rtt: float):
+        self.tables = tables
+        self.rtt    = rtt
+        self.trips  = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def per_url(db, urls):
+    """Старый путь из run_news: posted, затем pending — только если не опубликован."""
+    posted, pending = set(), set()
+    for url in urls:
+        if db.table("posted_news").select("id").eq("url_text", url).execute().data:
+            posted.add(url)
+        elif db.table("pending_posts").select("id").eq("url", url).eq("status", "pending").execute().data:
+            pending.add(url)
+    return posted, pending
+
+
+def make_tables(urls: list) -> dict:
+    rnd = random.Random(42)
+    return {
+        "posted_news":   [{"url_text": u} for u in urls if rnd.random() < 0.2],
+        "pending_posts": [{"url": u, "status": "pending"} for u in urls if rnd.random() < 0.05],
+    }
+
+
+def run(label, fn, db, urls):
+    if hasattr(db, "trips"):
+        db.trips = 0
+    t0 = time.perf_counter()
+    posted, pending = fn(db, urls)
+    elapsed = time.perf_counter() - t0
+    trips = getattr(db, "trips", None)
+    print(f"  {label:<8}{trips if trips is not None else '-':>8}{elapsed * 1000:>11.0f}"
+          f"{len(posted):>8}{len(pending):>9}")
+    return posted, pending
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--counts", type=int, nargs="+", default=[10, 50, 100, 200, 500])
+    ap.add_argument("--rtt", type=float, default=60, help="задержка одного запроса фейкового клиента, мс")
+    ap.add_argument("--live", action="store_true", help="настоящий Supabase из SUPABASE_URL/SUPABASE_KEY")
+    args = ap.parse_args()
+
+    live = None
+    if args.live:
+        from supabase import create_client
+        live = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+        known = [r["url_text"] for r in
+                 live.table("posted_news").select("url_text").limit(max(args.counts) // 5).execute().data or []]
+
+    for n in args.counts:
+        urls = [f"https://bench.example/news/{i}" for i in range(n)]
+        if live:
+            urls = known[:n // 5] + urls[:n - len(known[:n // 5])]
+            db   = live
+        else:
+            db   = FakeClient(make_tables(urls), args.rtt / 1000)
+        print(f"\n{n} candidates")
+        print(f"  {'mode':<8}{'trips':>8}{'time, ms':>11}{'posted':>8}{'pending':>9}")
+        a = run("per-url", per_url, db, urls)
+        b = run("batch", lookup_known, db, urls)
+        # per-url, как run_news, не спрашивает pending для уже опубликованных
+        if a != (b[0], b[1] - b[0]):
+            print("  MISMATCH between per-url and batch results!")
+
+
+if __name__ == "__main__":
+    main()
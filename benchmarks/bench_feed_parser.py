@@ -0,0 +1,114 @@
+"""
+bench_feed_parser.py — feedparser против потокового feed_stream на больших фидах.
+
+Запуск:
+    python benchmarks/bench_feed_parser.py                       # синтетические фиды
+    python benchmarks/bench_feed_parser.py saved/*.xml --days 5  # записанные фиды
+
+Записать фид: curl -sL https://kun.uz/rss -o saved/kun.xml
+
+Для каждого фида сравнивает время разбора (лучшее из --repeat) и пиковую
+память (tracemalloc):
+  feedparser     — полный разбор документа, как раньше
+  stream (full)  — feed_stream без ранней остановки
+  stream (early) — feed_stream с остановкой после RSS_STOP_AFTER_OLD старых записей
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from feed_stream import parse_feed_bytes  # noqa: E402
+
+try:
+    import feedparser
+except ImportError:
+    feedparser = None
+
+
+def make_rss(items: int, body_chars: int = 1500) -> bytes:
+    """Синтетический RSS 2.0: новые записи сверху, одна запись в час."""
+    now   = datetime.now(timezone.utc)
+    body  = ("Startup raised seed funding from venture investors. " * (body_chars // 52 + 1))[:body_chars]
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/">'
+        "<channel><title>Bench</title><link>https://bench.example/</link>"
+    ]
+    for i in range(items):
+        pub = format_datetime(now - timedelta(hours=i))
+        parts.append(
+            f"<item><title>Startup #{i} raises $5M&nbsp;seed</title>"
+            f"<link>https://bench.example/news/{i}</link>"
+            f"<description><![CDATA[<p>{body[:300]}</p>]]></description>"
+            f"<content:encoded><![CDATA[<p>{body}</p>]]></content:encoded>"
+            f"<pubDate>{pub}</pubDate></item>"
+        )
+    parts.append("</channel></rss>")
+    return "".join(parts).encode("utf-8")
+
+
+def _measure(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def bench(name: str, data: bytes, cutoff: float, stop_after_old: int, repeat: int):
+    print(f"\n{name}: {len(data) / 1024:.0f} KB")
+    print(f"  {'backend':<16}{'time, ms':>10}{'peak, KB':>11}{'entries':>9}{'in window':>11}")
+
+    def _row(label, fn):
+        t, peak, entries = _measure(fn, repeat)
+        fresh = sum(1 for e in entries if not e["pub_ts"] or e["pub_ts"] >= cutoff)
+        print(f"  {label:<16}{t * 1000:>10.1f}{peak / 1024:>11.0f}{len(entries):>9}{fresh:>11}")
+
+    if feedparser:
+        def _fp():
+            import calendar
+            out = []
+            for e in feedparser.parse(data).entries:
+                ts = e.get("published_parsed") or e.get("updated_parsed")
+                out.append({"pub_ts": calendar.timegm(ts) if ts else None})
+            return out
+        _row("feedparser", _fp)
+    else:
+        print("  feedparser      not installed — skipped")
+    _row("stream (full)", lambda: parse_feed_bytes(data, cutoff_ts=cutoff, stop_after_old=0))
+    _row("stream (early)", lambda: parse_feed_bytes(data, cutoff_ts=cutoff, stop_after_old=stop_after_old))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("files", nargs="*", help="записанные фиды (XML)")
+    ap.add_argument("--items", type=int, nargs="+", default=[200, 2000], help="размеры синтетических фидов")
+    ap.add_argument("--days", type=int, default=5, help="окно свежести, как в fetch_rss_candidates")
+    ap.add_argument("--stop-after-old", type=int, default=5)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    cutoff = time.time() - 86400 * args.days
+    if args.files:
+        for path in args.files:
+            with open(path, "rb") as f:
+                bench(os.path.basename(path), f.read(), cutoff, args.stop_after_old, args.repeat)
+    else:
+        for n in args.items:
+            bench(f"synthetic RSS, {n} items", make_rss(n), cutoff, args.stop_after_old, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
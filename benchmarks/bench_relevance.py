@@ -0,0 +1,137 @@
+"""
+bench_relevance.py — `kw in text` по каждому списку против relevance.KeywordMatcher.
+
+Запуск:
+    python benchmarks/bench_relevance.py
+    python benchmarks/bench_relevance.py --prohibitions 0 50 200 800 --texts 2000
+
+Синтетические запреты (анти-кейсы фаундера) добавляются к настоящим спискам
+из bridge.py (HARD_EXCLUDE_KEYWORDS, VC_KEYWORDS, RSS_VC_KEYWORDS) и
+feedback_intents.py (STAGE_BOOST_KEYWORDS). Для каждого размера списка запретов считает время
+проверки --texts кандидатов (title + snippet, ~75 слов):
+  naive    — как было: is_vc_relevant + фильтр RSS + stage-буст, по слову за раз
+  matcher  — одна сборка KeywordMatcher + один scan на текст
+              (до relevance.SMALL_VOCAB слов внутри тот же перебор `in`)
+Результаты обоих путей сверяются.
+"""
+
+import os
+import ast
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from relevance import KeywordMatcher  # noqa: E402
+from feedback_intents import STAGE_BOOST_KEYWORDS  # noqa: E402
+
+LISTS = ("HARD_EXCLUDE_KEYWORDS", "VC_KEYWORDS", "RSS_VC_KEYWORDS")
+
+
+def load_keyword_lists() -> dict:
+    """
+    Списки из bridge.py без импорта (bridge тянет supabase, groq, telegram);
+    STAGE_BOOST_KEYWORDS живёт в feedback_intents.py — он только stdlib.
+    """
+    with open(os.path.join(ROOT, "bridge.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    found = {"STAGE_BOOST_KEYWORDS": STAGE_BOOST_KEYWORDS}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) in LISTS:
+            found[node.targets[0].id] = ast.literal_eval(node.value)
+    return found
+
+
+WORDS = ("стартап", "казахстан", "платформа", "fintech", "платежи", "банк", "market",
+         "growth", "users", "маркетплейс", "логистика", "инвестор", "capital", "launch",
+         "product", "компания", "рынок", "сервис", "доставка", "клиенты", "revenue")
+
+
+def make_prohibitions(n: int, rnd: random.Random) -> list:
+    """Анти-кейсы в духе настоящих: короткие фразы из 2-4 слов."""
+    return [" ".join(rnd.sample(WORDS, rnd.randint(2, 4))) + f" {i}" for i in range(n)]
+
+
+def make_texts(n: int, rnd: random.Random) -> list:
+    """~75 слов на текст: в основном «обычные» слова, пара VC-фраз, как в настоящих сниппетах."""
+    syllables = ["ka", "zo", "ri", "men", "tal", "pro", "vek", "sta", "lin", "dor",
+                 "ган", "тор", "ми", "ска", "ло", "вер", "ни", "ба"]
+    vocab     = ["".join(rnd.choices(syllables, k=rnd.randint(2, 4))) for _ in range(400)] + list(WORDS)
+    texts     = []
+    for _ in range(n):
+        words = rnd.choices(vocab, k=75)
+        for _ in range(2):
+            words.insert(rnd.randrange(len(words)), rnd.choice(["raised $5m", "series a", "seed round", "стартап"]))
+        texts.append(" ".join(words).lower())
+    return texts
+
+
+def naive(lists: dict, prohibitions: list, texts: list) -> list:
+    out = []
+    for content in texts:
+        out.append((
+            any(kw in content for kw in lists["HARD_EXCLUDE_KEYWORDS"]),
+            any(rule in content for rule in prohibitions),
+            any(kw in content for kw in lists["VC_KEYWORDS"]),
+            any(kw in content for kw in lists["RSS_VC_KEYWORDS"]),
+            any(kw in content for kw in lists["STAGE_BOOST_KEYWORDS"]),
+        ))
+    return out
+
+
+def compiled(lists: dict, prohibitions: list, texts: list) -> list:
+    matcher = KeywordMatcher({
+        "exclude":     lists["HARD_EXCLUDE_KEYWORDS"],
+        "prohibition": prohibitions,
+        "vc":          lists["VC_KEYWORDS"],
+        "rss_vc":      lists["RSS_VC_KEYWORDS"],
+        "stage":       lists["STAGE_BOOST_KEYWORDS"],
+    })
+    out = []
+    for content in texts:
+        hits = matcher.scan(content)
+        out.append(tuple(g in hits for g in ("exclude", "prohibition", "vc", "rss_vc", "stage")))
+    return out
+
+
+def best_of(fn, repeat, *args):
+    best, result = None, None
+    for _ in range(repeat):
+        t0     = time.perf_counter()
+        result = fn(*args)
+        took   = time.perf_counter() - t0
+        best   = took if best is None else min(best, took)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--prohibitions", type=int, nargs="+", default=[0, 20, 100, 300, 1000])
+    ap.add_argument("--texts", type=int, default=1000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    lists = load_keyword_lists()
+    rnd   = random.Random(7)
+    texts = make_texts(args.texts, rnd)
+    base  = sum(len(v) for v in lists.values())
+    print(f"{args.texts} texts, {base} built-in keywords")
+    print(f"{'prohibitions':>13}{'naive, ms':>12}{'matcher, ms':>13}{'speedup':>9}")
+    for n in args.prohibitions:
+        prohibitions = make_prohibitions(n, rnd)
+        # часть текстов должна попадать под запреты
+        for i in range(0, len(texts), 50):
+            if prohibitions:
+                texts[i] += " " + rnd.choice(prohibitions)
+        t_naive, a = best_of(naive, args.repeat, lists, prohibitions, texts)
+        t_match, b = best_of(compiled, args.repeat, lists, prohibitions, texts)
+        print(f"{n:>13}{t_naive * 1000:>12.1f}{t_match * 1000:>13.1f}{t_naive / t_match:>8.1f}x")
+        if a != b:
+            print("  MISMATCH between naive and matcher results!")
+
+
+if __name__ == "__main__":
+    main()
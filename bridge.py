@@ -1,18 +1,41 @@
 import os
+import re
+import json
+import hashlib
 import sys
+import time
 import asyncio
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from datetime import datetime, timezone
 from supabase import create_client, Client
-from groq import Groq
+from groq import AsyncGroq
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import TelegramError
 from tavily import TavilyClient
+from local_store import load_json, save_json
+from feed_stream import iter_feed_entries
+from relevance import KeywordMatcher, feature_row, score_batch
+from feedback_intents import STAGE_BOOST_KEYWORDS, load_intents
+import near_dup
+import preranker
+import tavily_client
+import llm_cache
+import llm_client
+from dedup import (
+    canonical_url, url_hash, fetch_posted_keys, fetch_pending_urls, lookup_known_cached,
+    backfill_url_hashes, sync_snapshot, maybe_known, remember_known, insert_row,
+)
 try:
     import google.generativeai as genai
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
+try:
+    import feedparser
+    FEEDPARSER_AVAILABLE = True
+except ImportError:
+    FEEDPARSER_AVAILABLE = False
 
 # ────────────────────────────────────────────────
 # ENVIRONMENT VARIABLES
@@ -46,20 +69,25 @@ if not TAVILY_API_KEY:
 # ────────────────────────────────────────────────
 # INITIALIZATION
 # ────────────────────────────────────────────────
-groq_client  = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
+groq_client  = AsyncGroq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 bot          = Bot(token=TELEGRAM_BOT_TOKEN)
 tavily       = TavilyClient(api_key=TAVILY_API_KEY) if TAVILY_API_KEY else None
 
 # Gemini — основной генератор (нет дневного лимита токенов)
 # Groq — fallback если Gemini недоступен
+GEMINI_MODEL  = "gemini-1.5-flash"
+GROQ_MODEL    = "meta-llama/llama-4-scout-17b-16e-instruct"
 _gemini_model = None
 if GEMINI_AVAILABLE and GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
-    _gemini_model = genai.GenerativeModel("gemini-1.5-flash")
+    _gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+    llm_client.configure_gemini(_gemini_model, GEMINI_MODEL)
     print("LLM: Gemini 1.5 Flash (основной) + Groq (fallback)")
 else:
     print("LLM: Groq LLaMA only")
+if groq_client:
+    llm_client.configure_groq(groq_client, GROQ_MODEL, temperature=0.7, max_tokens=1024)
 
 
 def _tg_post(chat_id: str, text: str, reply_markup_dict: dict = None) -> bool:
@@ -101,33 +129,16 @@ def make_approval_keyboard(pending_id: str) -> InlineKeyboardMarkup:
 # ────────────────────────────────────────────────
 # LLM WRAPPER — Gemini первым, Groq как fallback
 # ────────────────────────────────────────────────
-def gemini_generate(prompt: str) -> str:
-    """Gemini 1.5 Flash основной, Groq LLaMA запасной."""
-    # Пробуем Gemini
-    if _gemini_model:
-        try:
-            resp = _gemini_model.generate_content(prompt)
-            return resp.text.strip()
-        except Exception as e:
-            print(f"Gemini error — fallback to Groq: {e}")
-
-    # Fallback: Groq
-    if groq_client:
-        try:
-            response = groq_client.chat.completions.create(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=1024,
-                temperature=0.7,
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            err = str(e)
-            if "rate_limit_exceeded" in err or "429" in err:
-                print(f"Groq error (обучение): {err[:200]}")
-            raise
-
-    raise RuntimeError("Нет доступного LLM генератора")
+async def gemini_generate(prompt: str, cache: bool = False) -> str:
+    """
+    Gemini 1.5 Flash основной, Groq LLaMA запасной — через async-клиенты
+    (llm_client): вызов не блокирует event loop, число одновременных
+    запросов к провайдеру ограничено, зависший запрос отменяется по таймауту.
+    cache=True (llm_cache) — только для классификации (выбор статьи, проверка
+    дублей): тот же промпт после падения даёт тот же ответ. Текст поста не
+    кэшируется — после отклонения повторный запуск должен написать новый.
+    """
+    return await llm_client.generate(prompt, cache=cache)
 
 # ────────────────────────────────────────────────
 # NOTIFY RECIPIENTS
@@ -306,173 +317,99 @@ GLOBAL_EDUCATION_TOPICS = [
 ]
 
 # ────────────────────────────────────────────────
-# FEEDBACK INTENT PARSER
-#
-# Разделяет фидбэк на два типа:
-#   - PROHIBITIONS: что запрещено публиковать (блокирует статьи)
-#   - PRIORITIES: что нужно публиковать чаще (буст приоритета кандидатов)
-#
-# Логика определения:
-#   Пожелание = содержит "больше", "чаще", "приоритет", "важнее", "хочу", "нужно больше", "желательно"
-#   Запрет = содержит "не нужно", "не публикуй", "без", "убери", "исключи", "не хочу"
-#   Остальное = считается запретом (безопаснее)
+# FEEDBACK INTENTS
+# Разбор фидбэка (parse_feedback_intents) живёт в feedback_intents.py и
+# выполняется feedback_bot'ом при каждом изменении анти-кейсов; здесь
+# загружается готовый артефакт (load_intents в main).
 # ────────────────────────────────────────────────
-
-# Слова-маркеры для определения типа фидбэка
-PRIORITY_MARKERS = [
-    "больше", "чаще", "приоритет", "важнее", "хочу видеть", "нужно больше",
-    "желательно", "предпочтительно", "фокус на", "акцент на", "давай больше",
-    "more", "focus on", "prioritize", "prefer",
-]
-
-PROHIBITION_MARKERS = [
-    "не нужно", "не публикуй", "без", "убери", "исключи", "не хочу",
-    "не надо", "избегай", "пропускай", "don't", "no ", "avoid", "skip",
-    "не про", "не о ", "не об ",
-]
-
-# Маппинг ключевых слов фидбэка → регион.
-# Используем корни слов (без окончаний) чтобы ловить все падежи русского языка:
-#   "центральная азия" / "центральной азии" / "центральную азию" → все поймаем по "центральн"+"азии|азия|азию"
-# Ключи — подстроки которые ищем в тексте (достаточно одного совпадения)
-REGION_BOOST_MAP = {
-    # Центральная Азия — все падежные формы через корни
-    "центральн":    "CentralAsia",   # центральная/центральной/центральную азия/азии/азию
-    "central asia": "CentralAsia",
-    "centralasia":  "CentralAsia",
-    # Казахстан — все падежи
-    "казахстан":    "Kazakhstan",    # казахстан/казахстана/казахстане/казахстану
-    "kazakhstan":   "Kazakhstan",
-    # Остальные страны ЦА
-    "узбекистан":   "CentralAsia",
-    "кыргызстан":   "CentralAsia",
-    "таджикистан":  "CentralAsia",
-    "туркменистан": "CentralAsia",
-    "ца ":          "CentralAsia",   # аббревиатура "ЦА"
-    " ца":          "CentralAsia",
-}
-
-STAGE_BOOST_KEYWORDS = [
-    "pre-seed", "preseed", "pre seed", "seed", "ранняя стадия",
-    "early stage", "early-stage", "ангельск", "angel",
-]
-
-
-def parse_feedback_intents(constraints: list) -> dict:
+def score_candidates(candidates: list, intents: dict) -> list:
     """
-    Разбирает список фидбэков на:
-      - prohibitions: список строк для блокировки статей (как раньше)
-      - region_boosts: список регионов которые надо поднять в приоритете
-      - stage_boost: True если нужно искать pre-seed/seed статьи
-      - priority_instructions: список строк для промпта ИИ (пожелания, не запреты)
+    Фильтр релевантности и бусты фидбэка одним пакетным проходом
+    (relevance.score_batch). Возвращает маску релевантности; каждому кандидату
+    дописывает "boosted_priority" и "score" для rank_candidates.
 
-    Логирует результат в консоль чтобы было видно в GitHub Actions.
+    Бусты (как раньше apply_priority_boosts, меньше = раньше):
+      - Регион в region_boosts → priority -= 2
+      - Статья содержит pre-seed/seed при stage_boost → priority -= 1
+      - World при наличии region_boosts → priority += 1
     """
-    prohibitions = []
-    region_boosts = []
-    stage_boost = False
-    priority_instructions = []
-
-    for feedback in constraints:
-        text = feedback.lower().strip()
-
-        # Определяем тип фидбэка
-        is_priority = any(marker in text for marker in PRIORITY_MARKERS)
-        is_prohibition = any(marker in text for marker in PROHIBITION_MARKERS)
-
-        if is_priority and not is_prohibition:
-            # Это пожелание — определяем что именно буститовать
-            priority_instructions.append(feedback)
-
-            # Проверяем регион
-            for keyword, region in REGION_BOOST_MAP.items():
-                if keyword in text:
-                    if region not in region_boosts:
-                        region_boosts.append(region)
-
-            # Проверяем стадию
-            if any(kw in text for kw in STAGE_BOOST_KEYWORDS):
-                stage_boost = True
-
+    hits = [scan_relevance(c["title"], c.get("snippet", ""), intents["prohibitions"]) for c in candidates]
+    rows = [feature_row(h, c["region"], c["priority"], intents["region_boosts"], intents["stage_boost"])
+            for h, c in zip(hits, candidates)]
+    relevant, priority, score = score_batch(rows)
+    for c, h, ok, prio, sc in zip(candidates, hits, relevant, priority, score):
+        c["boosted_priority"], c["score"] = prio, sc
+        if ok:
+            continue
+        if "exclude" in h:
+            print(f"Hard excluded ({h['exclude'][0]}): {c['title'][:60]}")
+        elif "prohibition" in h:
+            print(f"Prohibition matched ({h['prohibition'][0]!r}): {c['title'][:60]}")
         else:
-            # Это запрет (или неопределённый фидбэк — считаем запретом)
-            prohibitions.append(feedback)
-
-    # Логируем результат
-    print("=== FEEDBACK INTENT ANALYSIS ===")
-    print(f"  Prohibitions ({len(prohibitions)}): {prohibitions[:5]}")
-    print(f"  Region boosts: {region_boosts}")
-    print(f"  Stage boost (pre-seed/seed): {stage_boost}")
-    print(f"  Priority instructions ({len(priority_instructions)}): {priority_instructions[:3]}")
-    print("=" * 40)
-
-    return {
-        "prohibitions":          prohibitions,
-        "region_boosts":         region_boosts,
-        "stage_boost":           stage_boost,
-        "priority_instructions": priority_instructions,
-    }
-
+            print(f"No VC keywords matched: {c['title'][:60]}")
+    return relevant
 
-def apply_priority_boosts(candidates: list, intents: dict) -> list:
-    """
-    Корректирует числовой приоритет кандидатов на основе пожеланий фаундера.
-    Меньший priority = выбирается раньше (как в сортировке).
 
-    Логика бустов:
-      - Регион в region_boosts → priority -= 2 (поднять выше)
-      - Статья содержит pre-seed/seed при stage_boost → priority -= 1
-      - World при наличии region_boosts → priority += 1 (опустить ниже)
-    """
-    if not intents["region_boosts"] and not intents["stage_boost"]:
-        return candidates  # Нет пожеланий — ничего не меняем
-
-    boosted = []
+def rank_candidates(candidates: list) -> list:
+    """Сортирует по score из score_candidates; priority заменяется приоритетом с бустами."""
+    ranked = []
     for c in candidates:
-        new_priority = c["priority"]
-
-        # Регион буст
-        if c["region"] in intents["region_boosts"]:
-            new_priority -= 2
-            print(f"Priority boost (region {c['region']}): {c['title'][:50]}")
-
-        # Стадия буст (pre-seed, seed в заголовке или сниппете)
-        if intents["stage_boost"]:
-            content = (c["title"] + " " + c.get("snippet", "")).lower()
-            if any(kw in content for kw in STAGE_BOOST_KEYWORDS):
-                new_priority -= 1
-                print(f"Priority boost (stage pre-seed/seed): {c['title'][:50]}")
-
-        # Опускаем World если есть региональный буст
-        if intents["region_boosts"] and c["region"] == "World":
-            new_priority += 1
-
-        boosted.append({**c, "priority": new_priority})
-
-    return boosted
+        if c["boosted_priority"] < c["priority"]:
+            print(f"Priority boost ({c['priority']} → {c['boosted_priority']}): {c['title'][:50]}")
+        ranked.append({**c, "priority": c["boosted_priority"]})
+    ranked.sort(key=lambda c: c["score"])
+    return ranked
 
 
 # ────────────────────────────────────────────────
 # SUPABASE HELPERS
 # ────────────────────────────────────────────────
+def sync_known_urls():
+    """
+    Дозаполняет url_hash у старых строк и догружает локальный снимок
+    posted/pending URL (dedup.py). Без снимка проверки идут в сеть.
+    """
+    try:
+        filled = backfill_url_hashes(supabase)
+        if filled:
+            print(f"Backfilled url_hash for {filled} rows.")
+    except Exception as e:
+        print(f"url_hash backfill skipped: {e}")
+    try:
+        sync_snapshot(supabase)
+    except Exception as e:
+        print(f"Known-URL snapshot sync failed (using Supabase for every check): {e}")
+
 def is_already_posted(key: str) -> bool:
+    if not maybe_known(key):
+        return False
     try:
-        res = supabase.table("posted_news").select("id").eq("url_text", key).execute()
-        return len(res.data) > 0
+        return bool(fetch_posted_keys(supabase, [key]))
     except Exception as e:
         print(f"Supabase check error: {e}")
         return False
 
 def is_already_pending(url: str) -> bool:
-    if not url:
+    if not url or not maybe_known(url):
         return False
     try:
-        res = supabase.table("pending_posts").select("id").eq("url", url).eq("status", "pending").execute()
-        return len(res.data) > 0
+        return bool(fetch_pending_urls(supabase, [url]))
     except Exception as e:
         print(f"Supabase pending check error: {e}")
         return False
 
+def lookup_posted_pending(urls: list) -> tuple:
+    """
+    Пакетная версия is_already_posted + is_already_pending для списка кандидатов:
+    один запрос на таблицу вместо двух на каждый URL, и только для URL, которые
+    есть в локальном снимке. Возвращает (posted, pending).
+    """
+    try:
+        return lookup_known_cached(supabase, urls)
+    except Exception as e:
+        print(f"Supabase batch check error: {e}")
+        return set(), set()
+
 def expire_old_pending_posts():
     try:
         from datetime import timedelta
@@ -491,24 +428,20 @@ def expire_old_pending_posts():
         return 0
 
 def add_to_posted(key: str, news_type: str, score: int, source_type: str, title: str = ""):
+    remember_known(key)
+    row = {
+        "url_text":           key,
+        "url_hash":           url_hash(key),
+        "news_type":          news_type,
+        "shareability_score": score,
+        "source_type":        source_type,
+        "title":              title,
+    }
+    # В старых схемах может не быть колонок url_hash / title — тогда сохраняем без них
     try:
-        supabase.table("posted_news").insert({
-            "url_text":           key,
-            "news_type":          news_type,
-            "shareability_score": score,
-            "source_type":        source_type,
-            "title":              title,
-        }).execute()
+        insert_row(supabase, "posted_news", row, optional=("url_hash", "title"))
     except Exception as e:
-        try:
-            supabase.table("posted_news").insert({
-                "url_text":           key,
-                "news_type":          news_type,
-                "shareability_score": score,
-                "source_type":        source_type,
-            }).execute()
-        except Exception as e2:
-            print(f"Failed to save to posted_news: {e2}")
+        print(f"Failed to save to posted_news: {e}")
 
 def get_posted_count() -> int:
     try:
@@ -525,38 +458,26 @@ def get_education_count() -> int:
         return 0
 
 def save_pending_post(candidate: dict, post_text: str, image_url) -> str:
+    url = candidate.get("url", "")
+    remember_known(url)
+    row = {
+        "title":     candidate.get("title", ""),
+        "url":       url,
+        "url_hash":  url_hash(url) if url else None,
+        "post_text": post_text,
+        "image_url": image_url or "",
+        "region":    candidate.get("region", ""),
+        "status":    "pending",
+        # сниппет источника — обучающий текст для preranker
+        "source_snippet": (candidate.get("snippet") or "")[:1000],
+    }
     try:
-        res = supabase.table("pending_posts").insert({
-            "title":     candidate.get("title", ""),
-            "url":       candidate.get("url", ""),
-            "post_text": post_text,
-            "image_url": image_url or "",
-            "region":    candidate.get("region", ""),
-            "status":    "pending",
-        }).execute()
+        res = insert_row(supabase, "pending_posts", row, optional=("url_hash", "source_snippet"))
         return res.data[0]["id"]
     except Exception as e:
         print(f"Failed to save pending post: {e}")
         return None
 
-def fetch_negative_constraints() -> list:
-    """Возвращает список строк feedback (для фильтрации)."""
-    try:
-        res = supabase.table("negative_constraints").select("feedback, created_at").execute()
-        constraints = [row["feedback"].lower() for row in res.data]
-        if constraints:
-            print(f"=== NEGATIVE CONSTRAINTS LOADED ({len(constraints)}) ===")
-            for i, c in enumerate(constraints):
-                print(f"  [{i+1}] {c}")
-            print("=" * 40)
-        else:
-            print("No negative constraints in database.")
-        return constraints
-    except Exception as e:
-        print(f"Error loading negative constraints: {e}")
-        return []
-
-
 def fetch_rejected_examples(limit: int = 5) -> list:
     """
     Загружает примеры отклонённых постов с контентом из negative_constraints.
@@ -710,6 +631,86 @@ def get_approved_examples(region: str = None, limit: int = 3) -> list:
 
 
 
+# ────────────────────────────────────────────────
+# SEEN-ENTRY INDEX
+#
+# Компактный индекс уже оценённых статей (.cache/seen_entries.json):
+#   sha1(url)[:16] → [first_seen_ts, verdict] или [first_seen_ts, "irrelevant", scope]
+# verdict: irrelevant / posted / pending / duplicate / candidate.
+# fetch_rss_candidates и tavily_search сверяются с ним первыми — статьи,
+# которые вчера уже отсеяли (или уже опубликовали / отправили на одобрение),
+# отбрасываются до keyword-фильтра и до запросов в Supabase.
+# posted / pending / duplicate действуют для любого источника. "irrelevant"
+# хранит scope "источник:фильтр:версия" — вердикт RSS-предфильтра не глушит
+# ту же статью в выдаче Tavily, а после правки ключевых слов или запретов
+# (другая relevance_version) статья проверяется заново.
+# Записи старше SEEN_TTL_DAYS удаляются — индекс не растёт бесконечно.
+# TTL больше окна поиска (5-7 дней), так что статья не оценивается повторно,
+# пока она вообще может попасть в выдачу.
+# ────────────────────────────────────────────────
+SEEN_INDEX_FILE     = "seen_entries.json"
+SEEN_TTL_DAYS       = int(os.getenv("SEEN_TTL_DAYS", "8"))
+SEEN_DROP_VERDICTS  = {"posted", "pending", "duplicate"}
+
+_seen_index = None
+
+
+def _url_hash(url: str) -> str:
+    return url_hash(url)[:16]
+
+
+def _get_seen_index() -> dict:
+    """Загружает индекс один раз за запуск и выкидывает записи старше TTL."""
+    global _seen_index
+    if _seen_index is None:
+        raw     = load_json(SEEN_INDEX_FILE, {})
+        min_ts  = time.time() - 86400 * SEEN_TTL_DAYS
+        _seen_index = {h: v for h, v in raw.items() if v[0] >= min_ts}
+        print(f"Seen index: {len(_seen_index)} entries (evicted {len(raw) - len(_seen_index)} by TTL)")
+    return _seen_index
+
+
+def seen_verdict(url: str):
+    """Вердикт по URL из индекса или None если статья ещё не встречалась."""
+    entry = _get_seen_index().get(_url_hash(url))
+    return entry[1] if entry else None
+
+
+def irrelevant_scope(source: str, filter_name: str) -> str:
+    """Scope вердикта "irrelevant": источник + фильтр + версия его словаря."""
+    return f"{source}:{filter_name}:{relevance_version(filter_name)}"
+
+
+def is_seen_rejected(url: str, source: str) -> bool:
+    """
+    True если статью уже опубликовали/отправили/отсеяли как дубль, либо
+    отсеяли как нерелевантную в этом же источнике текущей версией фильтра.
+    """
+    entry = _get_seen_index().get(_url_hash(url))
+    if not entry:
+        return False
+    if entry[1] in SEEN_DROP_VERDICTS:
+        return True
+    if entry[1] != "irrelevant" or len(entry) < 3:
+        return False   # старые записи без scope — проверяем заново
+    return entry[2] in {irrelevant_scope(source, f) for f in RELEVANCE_FILTERS}
+
+
+def mark_seen(url: str, verdict: str, scope: str = None):
+    """Записывает вердикт (scope — для "irrelevant"). Время первого появления сохраняется."""
+    if not url:
+        return
+    index = _get_seen_index()
+    h     = _url_hash(url)
+    first = index[h][0] if h in index else int(time.time())
+    index[h] = [first, verdict, scope] if scope else [first, verdict]
+
+
+def save_seen_index():
+    if _seen_index is not None:
+        save_json(SEEN_INDEX_FILE, _seen_index)
+
+
 # ────────────────────────────────────────────────
 # RSS DIRECT FEEDS
 #
@@ -744,7 +745,7 @@ RSS_FEEDS = [
     {"url": "https://theaiinsider.tech/feed/",                        "region": "World",       "priority": 2},
 ]
 
-# VC-ключевые слова для фильтрации RSS статей (те же что в is_vc_relevant)
+# VC-ключевые слова для фильтрации RSS статей (укороченные корни VC_KEYWORDS)
 RSS_VC_KEYWORDS = [
     "стартап", "венчур", "инвестиц", "раунд", "финансирован",
     "startup", "venture", "funding", "raised", "series a", "series b",
@@ -753,92 +754,560 @@ RSS_VC_KEYWORDS = [
 ]
 
 
+# Параллельное чтение фидов: один медленный хост (forbes.kz, kun.uz)
+# больше не задерживает весь запуск.
+RSS_MAX_WORKERS    = int(os.getenv("RSS_MAX_WORKERS", "6"))
+RSS_FEED_TIMEOUT   = float(os.getenv("RSS_FEED_TIMEOUT", "15"))    # сек на один фид
+RSS_TOTAL_DEADLINE = float(os.getenv("RSS_TOTAL_DEADLINE", "40"))  # сек на все фиды
+RSS_USER_AGENT     = "Mozilla/5.0 (compatible; VentureAIBot/1.0)"
+
+# Парсер фидов: stream — потоковый expat (feed_stream.py) с остановкой после
+# RSS_STOP_AFTER_OLD записей подряд старше окна; feedparser — полный разбор.
+# Если потоковый парсер не справился с XML, фид разбирается feedparser'ом.
+RSS_PARSER         = os.getenv("RSS_PARSER", "stream")
+RSS_STOP_AFTER_OLD = int(os.getenv("RSS_STOP_AFTER_OLD", "5"))
+
+# ────────────────────────────────────────────────
+# RSS CONDITIONAL-GET CACHE
+#
+# Для каждого фида храним ETag, Last-Modified и уже разобранные записи
+# (.cache/rss_feed_cache.json). Следующий запуск шлёт If-None-Match /
+# If-Modified-Since — на 304 фид не скачивается и не парсится заново,
+# записи берутся из кэша.
+# ────────────────────────────────────────────────
+RSS_CACHE_FILE = "rss_feed_cache.json"
+
+
+def _normalize_feed_entries(feed) -> list:
+    """
+    Приводит записи feedparser к компактным dict:
+    link, title, summary (до 400 симв), pub_ts (unix-время или None).
+    Такой же формат хранится в кэше фидов.
+    """
+    from dateutil import parser as dateparser
+    import calendar
+    import re
+
+    entries = []
+    for entry in feed.entries:
+        url = entry.get("link", "")
+        if not url:
+            continue
+
+        # Определяем дату публикации
+        pub_ts = None
+        for date_field in ["published_parsed", "updated_parsed"]:
+            if hasattr(entry, date_field) and getattr(entry, date_field):
+                pub_ts = calendar.timegm(getattr(entry, date_field))
+                break
+
+        # Fallback: дата из URL
+        if not pub_ts:
+            m = re.search(r'/(20\d{2})[/-](\d{2})[/-](\d{2})', url)
+            if m:
+                try:
+                    pub_ts = dateparser.parse(f"{m.group(1)}-{m.group(2)}-{m.group(3)}").timestamp()
+                except Exception:
+                    pass
+
+        entries.append({
+            "link":    url,
+            "title":   entry.get("title", "").strip(),
+            "summary": entry.get("summary", "")[:400].strip(),
+            "pub_ts":  pub_ts,
+        })
+    return entries
+
+
+def _stream_feed_entries(resp, cutoff_ts: float) -> list:
+    """
+    Потоково читает тело ответа и разбирает записи по мере поступления.
+    Как только подряд идут RSS_STOP_AFTER_OLD записей старше окна — соединение
+    закрывается, остаток фида не скачивается.
+    При битом XML дочитывает тело и отдаёт его feedparser'у.
+    """
+    from xml.parsers.expat import ExpatError
+
+    consumed = []
+
+    def _chunks():
+        for chunk in resp.iter_content(chunk_size=16384):
+            consumed.append(chunk)
+            yield chunk
+
+    try:
+        entries = list(iter_feed_entries(_chunks(), cutoff_ts=cutoff_ts, stop_after_old=RSS_STOP_AFTER_OLD))
+        resp.close()
+        return entries
+    except ExpatError as e:
+        print(f"Stream parser failed ({resp.url[:45]}: {e}) — fallback to feedparser")
+        body = b"".join(consumed) + b"".join(resp.iter_content(chunk_size=16384))
+        feed = feedparser.parse(body)
+        if feed.bozo and not feed.entries:
+            raise ValueError(f"parse error: {feed.bozo_exception}")
+        return _normalize_feed_entries(feed)
+
+
+def _fetch_feed(feed_url: str, cached: dict = None, cutoff_ts: float = None):
+    """
+    Скачивает и парсит один RSS-фид. Выполняется в пуле потоков.
+    cached — запись из кэша фидов: её ETag/Last-Modified уходят в условный GET.
+    cutoff_ts — граница окна для ранней остановки потокового парсера.
+    Возвращает (entries, elapsed_sec, validators, error):
+      validators = None если сервер ответил 304 (entries взяты из кэша),
+      error — текст ошибки (entries = None), исключения наружу не пробрасываются.
+    """
+    started = time.monotonic()
+    headers = {"User-Agent": RSS_USER_AGENT}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        resp = requests.get(feed_url, timeout=RSS_FEED_TIMEOUT, headers=headers, stream=True)
+        if resp.status_code == 304 and cached:
+            resp.close()
+            return cached.get("entries", []), time.monotonic() - started, None, None
+        resp.raise_for_status()
+
+        if RSS_PARSER == "stream":
+            entries = _stream_feed_entries(resp, cutoff_ts)
+        else:
+            feed = feedparser.parse(resp.content)
+            if feed.bozo and not feed.entries:
+                raise ValueError(f"parse error: {feed.bozo_exception}")
+            entries = _normalize_feed_entries(feed)
+        validators = {
+            "etag":          resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+        }
+        return entries, time.monotonic() - started, validators, None
+    except Exception as e:
+        return None, time.monotonic() - started, None, str(e)
+
+
+# ────────────────────────────────────────────────
+# RSS FEED HEALTH
+#
+# Телеметрия по каждому фиду между запусками: задержка, доля ошибок, сколько
+# записей отдаёт, сколько из них проходят keyword-фильтр и сколько проходят
+# score_candidates в run_news.
+#
+# Хранится в bot_state (FEED_HEALTH_STATE_KEY): поллер и run_news живут в
+# разных снимках .cache, а фиды качают оба. При сохранении запись
+# перечитывается и сливается — счётчики складываются с дельтой этого
+# запуска, состояние (backoff, последняя ошибка) берётся от того, кто его
+# менял. .cache/rss_feed_health.json — запасной вариант без bot_state.
+#
+# Адаптивный backoff:
+#   - RSS_BACKOFF_AFTER_ERRORS ошибок подряд → пропускаем фид на
+#     RSS_BACKOFF_BASE_HOURS, каждая следующая ошибка удваивает паузу
+#   - RSS_EMPTY_AFTER_HOURS часов без единой новой VC-статьи → то же, но с
+#     базой RSS_EMPTY_BACKOFF_HOURS (пустой день у фида — норма). Считается
+#     по времени, а не по запускам: поллер ходит в фиды 48 раз в сутки,
+#     run_news — дважды, и «N пустых запусков» значило бы разное. 304 и уже
+#     виденные записи просто не сдвигают отметку последней VC-статьи
+# Пауза не больше RSS_BACKOFF_MAX_HOURS. После паузы фид пробуется снова;
+# первый удачный/непустой ответ сбрасывает счётчик.
+#
+# Отчёт: format_feed_health_report() — печатается каждый запуск,
+# POST_TYPE=feed_stats отправляет его админу.
+# ────────────────────────────────────────────────
+RSS_HEALTH_FILE          = "rss_feed_health.json"
+FEED_HEALTH_STATE_KEY    = "rss_feed_health"
+FEED_HEALTH_COUNTERS     = ("runs", "errors", "latency_total", "entries_total",
+                            "keyword_total", "relevant_total", "skipped_runs")
+RSS_BACKOFF_AFTER_ERRORS = int(os.getenv("RSS_BACKOFF_AFTER_ERRORS", "2"))
+RSS_EMPTY_AFTER_HOURS    = float(os.getenv("RSS_EMPTY_AFTER_HOURS", "120"))
+RSS_BACKOFF_BASE_HOURS   = float(os.getenv("RSS_BACKOFF_BASE_HOURS", "6"))
+RSS_EMPTY_BACKOFF_HOURS  = float(os.getenv("RSS_EMPTY_BACKOFF_HOURS", "24"))
+RSS_BACKOFF_MAX_HOURS    = float(os.getenv("RSS_BACKOFF_MAX_HOURS", "168"))
+
+_feed_health      = None
+_feed_health_base = {}   # снимок на момент загрузки — от него считается дельта
+
+
+def _read_feed_health() -> dict:
+    res = supabase.table("bot_state").select("state_value").eq("state_key", FEED_HEALTH_STATE_KEY).execute()
+    return json.loads(res.data[0]["state_value"]) if res.data else load_json(RSS_HEALTH_FILE, {})
+
+
+def _get_feed_health() -> dict:
+    global _feed_health, _feed_health_base
+    if _feed_health is None:
+        try:
+            _feed_health = _read_feed_health()
+        except Exception as e:
+            print(f"Feed health: bot_state unavailable, using local cache: {e}")
+            _feed_health = load_json(RSS_HEALTH_FILE, {})
+        _feed_health_base = json.loads(json.dumps(_feed_health))
+    return _feed_health
+
+
+def _feed_stats(feed_url: str) -> dict:
+    return _get_feed_health().setdefault(feed_url, {
+        "runs": 0, "errors": 0, "consecutive_errors": 0, "last_yield_ts": 0, "empty_backoffs": 0,
+        "latency_total": 0.0, "entries_total": 0, "keyword_total": 0, "relevant_total": 0,
+        "skipped_runs": 0, "skip_until": 0, "last_error": "",
+    })
+
+
+def _backoff_hours(base: float, streak: int, threshold: int) -> float:
+    return min(base * 2 ** max(0, streak - threshold), RSS_BACKOFF_MAX_HOURS)
+
+
+def feed_in_backoff(feed_url: str) -> bool:
+    """True если фид сейчас на паузе — тогда он не скачивается в этом запуске."""
+    stats = _feed_stats(feed_url)
+    if stats["skip_until"] > time.time():
+        stats["skipped_runs"] += 1
+        return True
+    return False
+
+
+def record_feed_fetch(feed_url: str, latency: float, entries: int = 0, error: str = None):
+    """Фиксирует результат загрузки фида и при необходимости ставит его на паузу."""
+    stats = _feed_stats(feed_url)
+    stats["runs"]          += 1
+    stats["latency_total"] += latency
+    if error:
+        stats["errors"]             += 1
+        stats["consecutive_errors"] += 1
+        stats["last_error"]          = error[:200]
+        if stats["consecutive_errors"] >= RSS_BACKOFF_AFTER_ERRORS:
+            hours = _backoff_hours(RSS_BACKOFF_BASE_HOURS, stats["consecutive_errors"], RSS_BACKOFF_AFTER_ERRORS)
+            stats["skip_until"] = time.time() + hours * 3600
+            print(f"RSS backoff {feed_url[:45]}: {stats['consecutive_errors']} errors in a row — pause {hours:.0f}h")
+    else:
+        stats["consecutive_errors"] = 0
+        stats["entries_total"]     += entries
+
+
+def record_feed_yield(feed_url: str, keyword_hits: int):
+    """Сколько новых статей фида прошло keyword-фильтр в этом запуске."""
+    stats = _feed_stats(feed_url)
+    now   = time.time()
+    stats["keyword_total"] += keyword_hits
+    if keyword_hits:
+        stats["last_yield_ts"]  = now
+        stats["empty_backoffs"] = 0
+        return
+    if not stats.get("last_yield_ts"):
+        # Первое наблюдение фида (или статистика старого формата) — отсчёт с этого момента
+        stats["last_yield_ts"] = now
+        return
+    quiet_hours = (now - stats["last_yield_ts"]) / 3600
+    if quiet_hours >= RSS_EMPTY_AFTER_HOURS:
+        stats["empty_backoffs"] = stats.get("empty_backoffs", 0) + 1
+        hours = _backoff_hours(RSS_EMPTY_BACKOFF_HOURS, stats["empty_backoffs"], 1)
+        stats["skip_until"] = now + hours * 3600
+        print(f"RSS backoff {feed_url[:45]}: no new VC entries for {quiet_hours:.0f}h — pause {hours:.0f}h")
+
+
+def record_feed_relevant(feed_url: str):
+    """Статья фида прошла score_candidates в run_news."""
+    if feed_url:
+        _feed_stats(feed_url)["relevant_total"] += 1
+
+
+def _merge_feed_health(latest: dict) -> dict:
+    """Накладывает изменения этого запуска на свежую запись из bot_state."""
+    merged = dict(latest)
+    for url, stats in _feed_health.items():
+        base = _feed_health_base.get(url, {})
+        if stats == base:
+            continue
+        row = dict(merged.get(url) or base)
+        for key, value in stats.items():
+            if key in FEED_HEALTH_COUNTERS:
+                row[key] = row.get(key, 0) + value - base.get(key, 0)
+            elif value != base.get(key):
+                row[key] = value
+        merged[url] = row
+    return merged
+
+
+def save_feed_health():
+    global _feed_health, _feed_health_base
+    if _feed_health is None:
+        return
+    try:
+        merged = _merge_feed_health(_read_feed_health())
+        value  = json.dumps(merged, ensure_ascii=False)
+        existing = supabase.table("bot_state").select("id").eq("state_key", FEED_HEALTH_STATE_KEY).execute()
+        if existing.data:
+            supabase.table("bot_state").update({"state_value": value}).eq("state_key", FEED_HEALTH_STATE_KEY).execute()
+        else:
+            supabase.table("bot_state").insert({"state_key": FEED_HEALTH_STATE_KEY, "state_value": value}).execute()
+        _feed_health, _feed_health_base = merged, json.loads(value)
+    except Exception as e:
+        print(f"Feed health: bot_state save failed, kept in local cache only: {e}")
+    save_json(RSS_HEALTH_FILE, _feed_health)
+
+
+def format_feed_health_report() -> str:
+    """Таблица по фидам: отсортирована по VC-релевантным статьям на секунду загрузки."""
+    health = _get_feed_health()
+    rows   = []
+    for cfg in RSS_FEEDS:
+        st   = health.get(cfg["url"])
+        host = cfg["url"].split("/")[2].replace("www.", "")
+        if not st or not st["runs"]:
+            rows.append((-1.0, f"{host}: нет данных"))
+            continue
+        runs     = st["runs"]
+        ok_runs  = max(1, runs - st["errors"])
+        latency  = st["latency_total"] / runs
+        value    = st["relevant_total"] / max(st["latency_total"], 0.01)
+        status   = ""
+        if st["skip_until"] > time.time():
+            status = f" | пауза до {datetime.utcfromtimestamp(st['skip_until']).strftime('%d.%m %H:%M')} UTC"
+        rows.append((value, (
+            f"{host}: {runs} runs, err {st['errors'] / runs:.0%}, {latency:.1f}s, "
+            f"entries/run {st['entries_total'] / ok_runs:.1f}, VC-kw {st['keyword_total']}, "
+            f"relevant {st['relevant_total']}{status}"
+        )))
+    rows.sort(key=lambda r: r[0], reverse=True)
+    return "RSS feed health (по VC-статьям на секунду загрузки):\n" + "\n".join(line for _, line in rows)
+
+
 def fetch_rss_candidates(days: int = 5) -> list:
     """
-    Читает все RSS_FEEDS и возвращает свежие VC-релевантные статьи.
+    Читает все RSS_FEEDS параллельно и возвращает свежие VC-релевантные статьи.
+    Фиды скачиваются пулом из RSS_MAX_WORKERS потоков, общий дедлайн — RSS_TOTAL_DEADLINE.
+    Неизменившиеся фиды (304) берутся из кэша без повторного парсинга.
+    По умолчанию фиды разбираются потоково и дочитываются только до границы окна.
+    Результаты объединяются строго в порядке RSS_FEEDS — вывод детерминирован.
     Требует: pip install feedparser
     Если feedparser не установлен — тихо возвращает пустой список.
     """
-    try:
-        import feedparser
-    except ImportError:
+    if not FEEDPARSER_AVAILABLE:
         print("feedparser not installed — RSS feeds skipped. Add to requirements.txt")
         return []
 
-    from dateutil import parser as dateparser
-    import re
-
-    cutoff   = datetime.utcnow().timestamp() - 86400 * days
-    results  = []
+    cutoff    = datetime.utcnow().timestamp() - 86400 * days
+    results   = []
     seen_urls = set()
-
-    for feed_cfg in RSS_FEEDS:
+    cache     = load_json(RSS_CACHE_FILE, {})
+
+    # ── Параллельная загрузка ──
+    fetched   = [None] * len(RSS_FEEDS)
+    feed_time = 0.0   # сумма времени по фидам = сколько заняло бы последовательно
+    not_modified = 0
+    started   = time.monotonic()
+    pool      = ThreadPoolExecutor(max_workers=RSS_MAX_WORKERS)
+    futures   = {}
+    for i, cfg in enumerate(RSS_FEEDS):
+        if feed_in_backoff(cfg["url"]):
+            print(f"RSS skipped (backoff): {cfg['url'][:45]}")
+            continue
+        futures[pool.submit(_fetch_feed, cfg["url"], cache.get(cfg["url"]), cutoff)] = i
+    try:
+        for fut in as_completed(futures, timeout=RSS_TOTAL_DEADLINE):
+            i = futures[fut]
+            feed_url = RSS_FEEDS[i]["url"]
+            entries, elapsed, validators, error = fut.result()
+            feed_time += elapsed
+            record_feed_fetch(feed_url, elapsed, entries=len(entries or []), error=error)
+            if error:
+                print(f"RSS feed failed ({feed_url[:50]}) after {elapsed:.2f}s: {error}")
+                continue
+            fetched[i] = entries
+            if validators is None:
+                not_modified += 1
+                print(f"RSS timing {feed_url[:45]}: {elapsed:.2f}s, 304 not modified ({len(entries)} cached)")
+            else:
+                cache[feed_url] = {**validators, "entries": entries,
+                                   "fetched_at": datetime.utcnow().isoformat()}
+                print(f"RSS timing {feed_url[:45]}: {elapsed:.2f}s, {len(entries)} entries")
+    except FuturesTimeoutError:
+        late = [RSS_FEEDS[i]["url"] for f, i in futures.items() if not f.done()]
+        print(f"RSS deadline {RSS_TOTAL_DEADLINE:.0f}s exceeded — skipped {len(late)} feeds: {[u[:45] for u in late]}")
+        for feed_url in late:
+            record_feed_fetch(feed_url, RSS_TOTAL_DEADLINE, error="deadline exceeded")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    wall = time.monotonic() - started
+    print(f"RSS fetch: {sum(1 for f in fetched if f is not None)}/{len(futures)} feeds in {wall:.2f}s "
+          f"(sequential ≈ {feed_time:.2f}s, saved ≈ {max(0.0, feed_time - wall):.2f}s, "
+          f"304: {not_modified}, workers={RSS_MAX_WORKERS})")
+
+    # Чистим кэш от фидов, которых больше нет в RSS_FEEDS
+    feed_urls = {cfg["url"] for cfg in RSS_FEEDS}
+    save_json(RSS_CACHE_FILE, {u: v for u, v in cache.items() if u in feed_urls})
+
+    # ── Разбор в порядке RSS_FEEDS ──
+    skipped_seen = 0
+    for feed_cfg, entries in zip(RSS_FEEDS, fetched):
+        if entries is None:
+            continue
         feed_url = feed_cfg["url"]
         region   = feed_cfg["region"]
         priority = feed_cfg["priority"]
 
-        try:
-            feed = feedparser.parse(feed_url)
-            if feed.bozo and not feed.entries:
-                print(f"RSS parse error ({feed_url[:50]}): {feed.bozo_exception}")
+        count = 0
+        for entry in entries:
+            url = entry["link"]
+            if url in seen_urls:
+                continue
+            if is_seen_rejected(url, "rss"):
+                skipped_seen += 1
                 continue
 
-            count = 0
-            for entry in feed.entries:
-                url = entry.get("link", "")
-                if not url or url in seen_urls:
-                    continue
+            title   = entry["title"]
+            snippet = entry["summary"]
 
-                title   = entry.get("title", "").strip()
-                snippet = entry.get("summary", "")[:400].strip()
-
-                # Определяем дату публикации
-                pub_date = None
-                for date_field in ["published_parsed", "updated_parsed"]:
-                    if hasattr(entry, date_field) and getattr(entry, date_field):
-                        import calendar
-                        pub_date = calendar.timegm(getattr(entry, date_field))
-                        break
-
-                # Fallback: дата из URL
-                if not pub_date:
-                    m = re.search(r'/(20\d{2})[/-](\d{2})[/-](\d{2})', url)
-                    if m:
-                        try:
-                            pub_date = dateparser.parse(f"{m.group(1)}-{m.group(2)}-{m.group(3)}").timestamp()
-                        except Exception:
-                            pass
-
-                # Пропускаем если старее окна
-                if pub_date and pub_date < cutoff:
-                    continue
+            # Пропускаем если старее окна
+            if entry["pub_ts"] and entry["pub_ts"] < cutoff:
+                continue
 
-                # Фильтр VC-релевантности (упрощённый — без prohibitions, они применятся позже)
-                content_lower = (title + " " + snippet).lower()
-                if not any(kw in content_lower for kw in RSS_VC_KEYWORDS):
-                    continue
+            # Фильтр VC-релевантности (упрощённый — без prohibitions, они применятся позже)
+            if "rss_vc" not in scan_relevance(title, snippet):
+                mark_seen(url, "irrelevant", irrelevant_scope("rss", "rss_vc"))
+                continue
 
-                seen_urls.add(url)
-                results.append({
-                    "title":    title,
-                    "url":      url,
-                    "snippet":  snippet,
-                    "region":   region,
-                    "priority": priority,
-                    "key":      url,
-                    "source":   "rss",
-                })
-                count += 1
+            seen_urls.add(url)
+            results.append({
+                "title":    title,
+                "url":      url,
+                "snippet":  snippet,
+                "region":   region,
+                "priority": priority,
+                "key":      url,
+                "source":   "rss",
+                "feed":     feed_url,
+                "pub_ts":   entry["pub_ts"],
+            })
+            count += 1
 
-            if count > 0:
-                print(f"RSS [{region}] {feed_url[:45]}: {count} новых статей")
+        record_feed_yield(feed_url, count)
+        if count > 0:
+            print(f"RSS [{region}] {feed_url[:45]}: {count} новых статей")
 
-        except Exception as e:
-            print(f"RSS feed failed ({feed_url[:50]}): {e}")
+    print(f"RSS total candidates: {len(results)} (skipped {skipped_seen} already seen)")
+    print(format_feed_health_report())
+    return results
+
+# ────────────────────────────────────────────────
+# CANDIDATE POOL (фоновый поллер RSS)
+#
+# POST_TYPE=poll запускает лёгкий проход: fetch_rss_candidates → upsert в
+# таблицу candidate_pool (уникальный url). Workflow feed_poller.yml вызывает
+# его каждые 30 минут; POLL_INTERVAL_MIN > 0 — крутиться в цикле самому.
+#
+# run_news берёт RSS-кандидатов из пула, если поллер обновлял его не позже
+# POOL_MAX_AGE_HOURS назад, иначе читает фиды сам, как раньше. Так утренний
+# запуск не ждёт фиды и видит статьи, которые за ночь выпали из RSS.
+# ────────────────────────────────────────────────
+POOL_DAYS           = int(os.getenv("POOL_DAYS", "7"))
+POOL_MAX_AGE_HOURS  = float(os.getenv("POOL_MAX_AGE_HOURS", "3"))
+POLL_INTERVAL_MIN   = float(os.getenv("POLL_INTERVAL_MIN", "0"))
+
+
+def upsert_candidate_pool(candidates: list) -> int:
+    """Сохраняет нормализованных кандидатов в candidate_pool. first_seen не перезаписывается."""
+    if not candidates:
+        return 0
+    now  = datetime.now(timezone.utc).isoformat()
+    rows = []
+    for c in candidates:
+        rows.append({
+            "url":          c["url"],
+            "title":        c["title"],
+            "snippet":      c["snippet"],
+            "region":       c["region"],
+            "priority":     c["priority"],
+            "source":       c.get("source", "rss"),
+            "feed":         c.get("feed", ""),
+            "published_at": datetime.fromtimestamp(c["pub_ts"], timezone.utc).isoformat() if c.get("pub_ts") else None,
+            "last_seen":    now,
+        })
+    try:
+        supabase.table("candidate_pool").upsert(rows, on_conflict="url").execute()
+        return len(rows)
+    except Exception as e:
+        print(f"candidate_pool upsert error: {e}")
+        return 0
+
+
+def prune_candidate_pool():
+    """Удаляет из пула статьи старше POOL_DAYS."""
+    from datetime import timedelta
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=POOL_DAYS)).isoformat()
+    try:
+        supabase.table("candidate_pool").delete().lt("published_at", cutoff).execute()
+        supabase.table("candidate_pool").delete().is_("published_at", "null").lt("first_seen", cutoff).execute()
+    except Exception as e:
+        print(f"candidate_pool prune error: {e}")
+
+
+def load_candidate_pool(days: int = 5):
+    """
+    Возвращает RSS-кандидатов из пула за последние days дней в формате
+    fetch_rss_candidates, или None если пул недоступен или устарел.
+    """
+    from datetime import timedelta
+    from dateutil import parser as dateparser
+
+    now    = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=days)).isoformat()
+    try:
+        latest = supabase.table("candidate_pool").select("last_seen") \
+            .order("last_seen", desc=True).limit(1).execute()
+        if not latest.data:
+            print("Candidate pool is empty — reading RSS live.")
+            return None
+        age_h = (now - dateparser.parse(latest.data[0]["last_seen"])).total_seconds() / 3600
+        if age_h > POOL_MAX_AGE_HOURS:
+            print(f"Candidate pool is stale ({age_h:.1f}h since last poll) — reading RSS live.")
+            return None
+
+        res = supabase.table("candidate_pool") \
+            .select("url, title, snippet, region, priority, source, feed, published_at") \
+            .or_(f"published_at.gte.{cutoff},published_at.is.null") \
+            .order("priority") \
+            .order("published_at", desc=True) \
+            .execute()
+    except Exception as e:
+        print(f"candidate_pool not available — reading RSS live: {e}")
+        return None
+
+    pool = []
+    for row in res.data or []:
+        if is_seen_rejected(row["url"], row.get("source") or "rss"):
             continue
+        pool.append({
+            "title":    row["title"] or "",
+            "url":      row["url"],
+            "snippet":  row["snippet"] or "",
+            "region":   row["region"],
+            "priority": row["priority"],
+            "key":      row["url"],
+            "source":   row.get("source") or "rss",
+            "feed":     row.get("feed") or "",
+            "pub_ts":   dateparser.parse(row["published_at"]).timestamp() if row.get("published_at") else None,
+        })
+    print(f"Candidate pool: {len(pool)} RSS candidates (last poll {age_h:.1f}h ago)")
+    return pool
+
+
+async def run_poll():
+    """Один проход поллера (или бесконечный цикл при POLL_INTERVAL_MIN > 0)."""
+    while True:
+        print(f"MODE: POLL | {datetime.utcnow().isoformat()} UTC")
+        candidates = fetch_rss_candidates(days=POOL_DAYS)
+        stored     = upsert_candidate_pool(candidates)
+        prune_candidate_pool()
+        save_seen_index()
+        save_feed_health()
+        print(f"Candidate pool: upserted {stored} candidates.")
+        if POLL_INTERVAL_MIN <= 0:
+            return
+        await asyncio.sleep(POLL_INTERVAL_MIN * 60)
 
-    print(f"RSS total candidates: {len(results)}")
-    return results
 
 # ────────────────────────────────────────────────
 # TAVILY SEARCH
@@ -862,9 +1331,10 @@ TRUSTED_NODATELESS_DOMAINS = [
     "dominovc.com", "investready.uz", "dunyo.info",
 ]
 
-def tavily_search(query: str, max_results: int = 5, days: int = 5) -> list:
+def tavily_search(query: str, max_results: int = 5, days: int = 5, essential: bool = True) -> list:
     """
     days: окно поиска. По умолчанию 5 дней.
+    essential=False — запрос пропускается, когда бюджет Tavily почти исчерпан.
     Статьи без даты в URL принимаются если домен в TRUSTED_NODATELESS_DOMAINS.
     """
     if not tavily:
@@ -873,17 +1343,16 @@ def tavily_search(query: str, max_results: int = 5, days: int = 5) -> list:
         import re
         from dateutil import parser as dateparser
 
-        response = tavily.search(
-            query=query,
-            search_depth="basic",
-            max_results=max_results,
-            days=days,
-        )
+        response = tavily_client.search(tavily, query, max_results=max_results, days=days,
+                                        essential=essential, timeout=TAVILY_QUERY_TIMEOUT)
         results = []
         cutoff = datetime.utcnow().timestamp() - 86400 * days
 
         for r in response.get("results", []):
             url = r.get("url", "")
+            if is_seen_rejected(url, "tavily"):
+                print(f"Already seen: {url[:70]}")
+                continue
             if any(domain in url for domain in BLOCKED_DOMAINS):
                 print(f"Blocked: {url[:70]}")
                 continue
@@ -913,6 +1382,7 @@ def tavily_search(query: str, max_results: int = 5, days: int = 5) -> list:
                     continue
 
             # Проверяем что не старее окна
+            pub_ts = None
             try:
                 pub_ts = dateparser.parse(pub_date).timestamp()
                 if pub_ts < cutoff:
@@ -926,12 +1396,227 @@ def tavily_search(query: str, max_results: int = 5, days: int = 5) -> list:
                 "url":      url,
                 "snippet":  r.get("content", "")[:400],
                 "pub_date": pub_date,
+                "pub_ts":   pub_ts,
             })
         return results
     except Exception as e:
         print(f"Tavily search error: {e}")
         return []
 
+
+# Параллельный поиск: запросы уходят пулом из TAVILY_MAX_WORKERS потоков,
+# каждому запросу — TAVILY_QUERY_TIMEOUT секунд с момента старта.
+# Таймаут передаётся в сам HTTP-запрос Tavily: оборванный запрос завершает
+# свой поток, а не тратит кредиты после того, как запуск пошёл дальше.
+# Сторож в tavily_search_many — страховка на TAVILY_TIMEOUT_GRACE секунд
+# дольше; ещё не начатые запросы отменяются (cancel_futures).
+TAVILY_MAX_WORKERS   = int(os.getenv("TAVILY_MAX_WORKERS", "4"))
+TAVILY_QUERY_TIMEOUT = float(os.getenv("TAVILY_QUERY_TIMEOUT", "20"))
+TAVILY_TIMEOUT_GRACE = 5.0
+
+# Окно новостей: основное (5 дней) и fallback (7 дней). Tavily ищет сразу
+# по fallback-окну — кредит за запрос тот же, поэтому берём больше результатов,
+# чтобы свежие статьи не вытеснялись более старыми.
+TAVILY_WINDOW_DAYS   = 5
+TAVILY_FALLBACK_DAYS = 7
+TAVILY_MAX_RESULTS   = 15
+
+
+def tavily_search_many(queries: list, max_results: int = 5, days: int = 5,
+                       essential: list = None) -> list:
+    """
+    Выполняет tavily_search для списка строк запросов параллельно.
+    Возвращает список результатов В ТОМ ЖЕ ПОРЯДКЕ, что и queries —
+    приоритет запросов сохраняется. Запрос, не уложившийся в таймаут, даёт [].
+    essential — флаги по запросам (см. tavily_search), по умолчанию все True.
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+
+    if not queries:
+        return []
+
+    started_at = {}   # индекс → время фактического старта в пуле
+
+    def _run(i, query):
+        started_at[i] = time.monotonic()
+        return tavily_search(query, max_results=max_results, days=days,
+                             essential=essential[i] if essential else True)
+
+    results = [[] for _ in queries]
+    started = time.monotonic()
+    pool    = ThreadPoolExecutor(max_workers=TAVILY_MAX_WORKERS)
+    pending = {pool.submit(_run, i, q): i for i, q in enumerate(queries)}
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i = pending.pop(fut)
+                results[i] = fut.result()
+            now = time.monotonic()
+            for fut, i in list(pending.items()):
+                if i in started_at and now - started_at[i] > TAVILY_QUERY_TIMEOUT + TAVILY_TIMEOUT_GRACE:
+                    print(f"Tavily timeout ({TAVILY_QUERY_TIMEOUT:.0f}s): {queries[i][:60]}")
+                    pending.pop(fut)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    print(f"Tavily: {len(queries)} queries in {time.monotonic() - started:.2f}s "
+          f"(workers={TAVILY_MAX_WORKERS})")
+    return results
+
+# ────────────────────────────────────────────────
+# QUERY YIELD & PLANNER
+#
+# Статистика по шаблонам запросов между запусками (.cache/query_yield.json).
+# Шаблон — запрос без месяца и года ("Kazakhstan startup funding round raised"),
+# поэтому история не обнуляется с новым месяцем. На каждый шаблон копятся:
+#   runs      — сколько раз запрос уходил в Tavily
+#   raw       — результаты, прошедшие окно дат и blocklist в tavily_search
+#   relevant  — кандидаты после posted/pending/score_candidates
+#   picks     — сколько раз кандидат этого запроса стал лучшей новостью
+#   approvals — сколько из picks админ одобрил (видим по posted_news на
+#               следующем запуске — feedback_bot при этом не меняется)
+#
+# Планировщик (plan_queries) сортирует запросы по ожидаемой отдаче и делит их
+# на две волны. Во второй — запросы с отдачей ниже QUERY_MIN_YIELD; она
+# уходит в Tavily только если после RSS и первой волны меньше
+# QUERY_ENOUGH_HIGH кандидатов с priority <= 1. Запросы по tracked entities,
+# новые шаблоны и шаблоны, не запускавшиеся QUERY_EXPLORE_DAYS дней, всегда
+# в первой волне — иначе статистика по ним никогда не обновится.
+#
+# Отчёт: POST_TYPE=query_stats отправляет format_query_yield_report() админу.
+# ────────────────────────────────────────────────
+QUERY_YIELD_FILE   = "query_yield.json"
+QUERY_MIN_YIELD    = float(os.getenv("QUERY_MIN_YIELD", "0.3"))
+QUERY_ENOUGH_HIGH  = int(os.getenv("QUERY_ENOUGH_HIGH", "5"))
+QUERY_EXPLORE_DAYS = float(os.getenv("QUERY_EXPLORE_DAYS", "7"))
+QUERY_PICK_TTL_DAYS = 3  # pending живёт 2 дня (expire_old_pending_posts) + запас
+
+# Вес сигналов в ожидаемой отдаче и сглаживание для шаблонов с малой историей:
+# новый шаблон стартует с отдачей QUERY_PRIOR_YIELD, как будто уже прошёл
+# QUERY_PRIOR_RUNS запусков.
+_YIELD_WEIGHTS     = {"relevant": 1.0, "picks": 3.0, "approvals": 5.0}
+QUERY_PRIOR_YIELD  = 1.0
+QUERY_PRIOR_RUNS   = 2
+
+_MONTH_WORDS = (
+    "январь|февраль|март|апрель|май|июнь|июль|август|сентябрь|октябрь|ноябрь|декабрь|"
+    "january|february|march|april|may|june|july|august|september|october|november|december"
+)
+_TEMPLATE_STRIP = re.compile(rf"\b(?:20\d{{2}}|{_MONTH_WORDS})\b", re.IGNORECASE)
+
+_query_yield = None
+
+
+def query_template(query: str) -> str:
+    """'Kazakhstan startup funding round raised May 2026' → 'kazakhstan startup funding round raised'."""
+    return " ".join(_TEMPLATE_STRIP.sub(" ", query).lower().split())
+
+
+def _get_query_yield() -> dict:
+    global _query_yield
+    if _query_yield is None:
+        _query_yield = load_json(QUERY_YIELD_FILE, {"templates": {}, "open_picks": {}})
+    return _query_yield
+
+
+def _template_stats(template: str) -> dict:
+    return _get_query_yield()["templates"].setdefault(template, {
+        "runs": 0, "raw": 0, "relevant": 0, "picks": 0, "approvals": 0, "last_run": 0,
+    })
+
+
+def expected_yield(template: str) -> float:
+    st = _get_query_yield()["templates"].get(template)
+    if not st:
+        return QUERY_PRIOR_YIELD
+    prior  = QUERY_PRIOR_YIELD * QUERY_PRIOR_RUNS
+    signal = sum(st[k] * w for k, w in _YIELD_WEIGHTS.items())
+    return (signal + prior) / (st["runs"] + QUERY_PRIOR_RUNS)
+
+
+def record_query_run(template: str, raw: int, relevant: int):
+    st = _template_stats(template)
+    st["runs"]     += 1
+    st["raw"]      += raw
+    st["relevant"] += relevant
+    st["last_run"]  = time.time()
+
+
+def record_query_pick(candidate: dict, approval_mode: bool):
+    """Лучшая новость выбрана. В режиме одобрения ждём решения админа."""
+    template = candidate.get("template")
+    if not template:
+        return  # RSS-кандидат
+    _template_stats(template)["picks"] += 1
+    if approval_mode:
+        _get_query_yield()["open_picks"][candidate["key"]] = {"template": template, "ts": time.time()}
+
+
+def resolve_query_approvals():
+    """Проверяет ожидающие решения picks по posted_news одним запросом."""
+    data  = _get_query_yield()
+    picks = data["open_picks"]
+    if not picks:
+        return
+    try:
+        posted = fetch_posted_keys(supabase, list(picks))
+    except Exception as e:
+        print(f"Query yield: approval check failed (will retry next run): {e}")
+        return
+    min_ts = time.time() - QUERY_PICK_TTL_DAYS * 86400
+    for url, pick in list(picks.items()):
+        if url in posted:
+            _template_stats(pick["template"])["approvals"] += 1
+            del picks[url]
+        elif pick["ts"] < min_ts:
+            del picks[url]  # отклонён или истёк
+
+
+def plan_queries(queries: list) -> tuple:
+    """
+    Возвращает (first_wave, second_wave). Внутри волн запросы отсортированы
+    по priority, затем по ожидаемой отдаче.
+    """
+    templates = _get_query_yield()["templates"]
+    stale_ts  = time.time() - QUERY_EXPLORE_DAYS * 86400
+    first, second = [], []
+    for q in queries:
+        template = query_template(q["query"])
+        st       = templates.get(template)
+        value    = expected_yield(template)
+        q        = {**q, "template": template, "expected_yield": value}
+        if q["priority"] < 0 or not st or st["last_run"] < stale_ts or value >= QUERY_MIN_YIELD:
+            first.append(q)
+        else:
+            second.append(q)
+    order = lambda q: (q["priority"], -q["expected_yield"])
+    first.sort(key=order)
+    second.sort(key=order)
+    if second:
+        print(f"Query planner: {len(first)} queries now, {len(second)} low-yield deferred: "
+              + ", ".join(f"{q['template'][:40]} ({q['expected_yield']:.2f})" for q in second))
+    return first, second
+
+
+def save_query_yield():
+    if _query_yield is not None:
+        save_json(QUERY_YIELD_FILE, _query_yield)
+
+
+def format_query_yield_report() -> str:
+    templates = _get_query_yield()["templates"]
+    if not templates:
+        return "Query yield: нет данных."
+    lines = []
+    for t in sorted(templates, key=expected_yield, reverse=True):
+        st = templates[t]
+        lines.append(
+            f"{t[:50]}: {st['runs']} runs, raw {st['raw']}, relevant {st['relevant']}, "
+            f"picks {st['picks']}, approved {st['approvals']}, yield {expected_yield(t):.2f}"
+        )
+    return "Query yield (по ожидаемой отдаче):\n" + "\n".join(lines)
+
 # ────────────────────────────────────────────────
 # VC RELEVANCE KEYWORD FILTER
 # ────────────────────────────────────────────────
@@ -952,29 +1637,69 @@ HARD_EXCLUDE_KEYWORDS = [
     "что стоит за", "активность сша", "активность китая",
 ]
 
-def is_vc_relevant(title: str, snippet: str, prohibitions: list) -> bool:
-    content = (title + " " + snippet).lower()
-
-    for kw in HARD_EXCLUDE_KEYWORDS:
-        if kw in content:
-            print(f"Hard excluded ({kw}): {title[:60]}")
-            return False
+# Все списки выше, RSS_VC_KEYWORDS, STAGE_BOOST_KEYWORDS и запреты фаундера
+# собираются в один KeywordMatcher (relevance.py) один раз за запуск —
+# каждый текст сканируется один раз, а не по разу на каждое слово.
+# Решение «релевантно / нет» принимает score_candidates по всему списку сразу.
+# RELEVANCE_FILTERS — какие группы решают «нерелевантно» в каждом фильтре;
+# relevance_version хэширует их словарь для scope вердиктов seen-индекса.
+_relevance = {"prohibitions": None, "matcher": None, "groups": {}, "versions": {}, "scans": {}}
+RELEVANCE_FILTERS = {
+    "rss_vc": ("rss_vc",),                        # предфильтр fetch_rss_candidates
+    "score":  ("exclude", "prohibition", "vc"),   # score_candidates
+}
 
-    for rule in prohibitions:
-        if rule in content:
-            print(f"Prohibition matched ({rule!r}): {title[:60]}")
-            return False
 
-    matched = [kw for kw in VC_KEYWORDS if kw in content]
-    if matched:
-        return True
+def relevance_matcher(prohibitions: list = None) -> KeywordMatcher:
+    """
+    Матчер текущего запуска. prohibitions=None — вернуть уже собранный
+    (или собрать без запретов, если его ещё нет, как в POST_TYPE=poll).
+    """
+    key = tuple(prohibitions) if prohibitions is not None else _relevance["prohibitions"]
+    if _relevance["matcher"] is None or key != _relevance["prohibitions"]:
+        key = key or ()
+        _relevance["groups"] = {
+            "exclude":     HARD_EXCLUDE_KEYWORDS,
+            "prohibition": key,
+            "vc":          VC_KEYWORDS,
+            "rss_vc":      RSS_VC_KEYWORDS,
+            "stage":       STAGE_BOOST_KEYWORDS,
+        }
+        _relevance["matcher"]      = KeywordMatcher(_relevance["groups"])
+        _relevance["prohibitions"] = key
+        _relevance["versions"]     = {}
+        _relevance["scans"]        = {}
+        print(f"Relevance matcher: {len(_relevance['matcher'])} keywords ({len(key)} prohibitions)")
+    return _relevance["matcher"]
+
+
+def relevance_version(filter_name: str) -> str:
+    """Короткий хэш словаря фильтра: меняется при правке ключевых слов или запретов."""
+    relevance_matcher()
+    version = _relevance["versions"].get(filter_name)
+    if version is None:
+        words   = [sorted(w.lower() for w in _relevance["groups"][g]) for g in RELEVANCE_FILTERS[filter_name]]
+        version = hashlib.sha1(json.dumps(words, ensure_ascii=False).encode()).hexdigest()[:8]
+        _relevance["versions"][filter_name] = version
+    return version
+
+
+def scan_relevance(title: str, snippet: str, prohibitions: list = None) -> dict:
+    """Попадания по группам для title + snippet; результат кэшируется на запуск."""
+    matcher = relevance_matcher(prohibitions)
+    content = (title + " " + (snippet or "")).lower()
+    hits    = _relevance["scans"].get(content)
+    if hits is None:
+        hits = _relevance["scans"][content] = matcher.scan(content)
+    return hits
 
-    print(f"No VC keywords matched: {title[:60]}")
-    return False
 
 # ────────────────────────────────────────────────
 # GEMINI: PICK BEST ARTICLE
 # ────────────────────────────────────────────────
+PICK_WINDOW = 10   # сколько кандидатов видит LLM при выборе
+
+
 async def pick_best_with_gemini(
     candidates: list,
     prohibitions: list,
@@ -987,8 +1712,11 @@ async def pick_best_with_gemini(
         return candidates[0]
 
     articles_text = ""
-    for i, c in enumerate(candidates[:10]):
-        articles_text += f"{i+1}. [{c['region']}] {c['title']}\n   {c['snippet']}\n\n"
+    for i, c in enumerate(candidates[:PICK_WINDOW]):
+        articles_text += f"{i+1}. [{c['region']}] {c['title']}\n   {c['snippet']}\n"
+        for rel in c.get("related", [])[:3]:
+            articles_text += f"   Also reported: {rel['title']} — {rel['snippet'][:150]}\n"
+        articles_text += "\n"
 
     avoid_context = ""
     if prohibitions:
@@ -1019,23 +1747,249 @@ async def pick_best_with_gemini(
             f"{articles_text}"
             "Respond with ONLY the number (e.g.: 3). Nothing else."
         )
-        idx = int(gemini_generate(prompt).strip(".")) - 1
-        if 0 <= idx < len(candidates[:10]):
+        idx = int((await gemini_generate(prompt, cache=True)).strip(".")) - 1
+        if 0 <= idx < len(candidates[:PICK_WINDOW]):
             return candidates[idx]
     except Exception as e:
         print(f"Gemini pick error: {e}")
 
     return candidates[0]
 
+# ────────────────────────────────────────────────
+# NEAR-DUPLICATE INDEX
+# Локальный MinHash-индекс по всей истории (near_dup.py): очевидные
+# перепечатки и очевидно новые истории решаются без LLM, в LLM уходит
+# только неоднозначная полоса — вместе с ближайшими соседями из истории.
+# ────────────────────────────────────────────────
+NEAR_DUP_HIGH        = float(os.getenv("NEAR_DUP_HIGH", "0.6"))
+NEAR_DUP_LOW         = float(os.getenv("NEAR_DUP_LOW", "0.2"))
+NEAR_DUP_RECENT_DAYS = int(os.getenv("NEAR_DUP_RECENT_DAYS", "30"))
+
+_near_dup_stats = {"duplicate": 0, "new": 0, "ambiguous": 0}
+
+
+def load_near_dup_index():
+    try:
+        near_dup.sync_index(supabase)
+    except Exception as e:
+        print(f"Near-dup index unavailable (every check goes to LLM): {e}")
+
+
+def near_dup_summary() -> str:
+    st = _near_dup_stats
+    return (f"Duplicate checks: {st['duplicate']} local dup, {st['new']} local new, "
+            f"{st['ambiguous']} sent to LLM")
+
+
+# ────────────────────────────────────────────────
+# PRE-RANKER
+# Локальная модель p(approve) (preranker.py: TF-IDF + логистическая регрессия
+# на истории одобрений/отклонений в pending_posts). Внутри одного priority
+# кандидаты идут по убыванию p(approve); кандидаты с p < PRERANK_PRUNE_BELOW
+# отсекаются до любых LLM-вызовов, но в списке остаётся не меньше
+# PRERANK_MIN_KEEP. MIN_KEEP меньше PICK_WINDOW — иначе в окно выбора
+# попадали бы те же кандидаты, что и без отсечения.
+# Пока размеченных постов мало, модель не используется.
+#
+# Экономия копится по запускам в .cache/prerank_runs.json: сколько отсечённых
+# стояло в окне выбора (PICK_WINDOW) и в первом окне проверки дублей
+# (DUP_SCREEN_TOP_K); сколько из последних near_dup не решил бы локально —
+# столько LLM-проверок дублей не понадобилось; и запуски, где после
+# отсечения остался один кандидат — вызов выбора не нужен.
+# Отчёт: POST_TYPE=prerank_stats — офлайн-оценка на holdout + эти счётчики.
+# ────────────────────────────────────────────────
+PRERANK_PRUNE_BELOW = float(os.getenv("PRERANK_PRUNE_BELOW", "0.15"))
+PRERANK_MIN_KEEP    = int(os.getenv("PRERANK_MIN_KEEP", "5"))
+PRERANK_RUNS_FILE   = "prerank_runs.json"
+
+
+def load_preranker():
+    try:
+        print(preranker.load(supabase))
+    except Exception as e:
+        print(f"Pre-ranker unavailable (ranking by priority only): {e}")
+
+
+def prerank_candidates(candidates: list) -> list:
+    probs = preranker.score(candidates)
+    if probs is None:
+        return candidates
+    for c, p in zip(candidates, probs):
+        c["p_approve"] = p
+    ranked = sorted(candidates, key=lambda c: (c["priority"], -c["p_approve"]))
+    keep   = [c for c in ranked if c["p_approve"] >= PRERANK_PRUNE_BELOW]
+    if len(keep) < PRERANK_MIN_KEEP:
+        low   = sorted((c for c in ranked if c["p_approve"] < PRERANK_PRUNE_BELOW),
+                       key=lambda c: -c["p_approve"])
+        keep += low[:PRERANK_MIN_KEEP - len(keep)]
+    kept   = {id(c) for c in keep}
+    keep   = [c for c in ranked if id(c) in kept]
+    pruned = [c for c in ranked if id(c) not in kept]
+    # Сколько мест в окне выбора и в первом окне проверки дублей досталось бы отсечённым
+    in_window     = sum(1 for c in ranked[:PICK_WINDOW] if id(c) not in kept)
+    in_dup_window = [c for c in ranked[:DUP_SCREEN_TOP_K] if id(c) not in kept]
+    dup_checks    = sum(1 for c in in_dup_window if near_dup.check(
+        c["title"], c.get("snippet", ""), high=NEAR_DUP_HIGH, low=NEAR_DUP_LOW,
+        recent_days=NEAR_DUP_RECENT_DAYS)[0] == "ambiguous")
+    record_prerank_run(len(ranked), len(pruned), in_window, len(in_dup_window), dup_checks,
+                       pick_avoided=len(ranked) > 1 and len(keep) == 1)
+    print(f"Pre-ranker: kept {len(keep)} of {len(ranked)} candidates "
+          f"(pruned {len(pruned)} with p(approve) < {PRERANK_PRUNE_BELOW}, "
+          f"{in_window} of them from the top {PICK_WINDOW}, "
+          f"{dup_checks} LLM duplicate checks avoided)")
+    for c in pruned[:5]:
+        print(f"  pruned p={c['p_approve']:.2f}: {c['title'][:60]}")
+    return keep
+
+
+def record_prerank_run(candidates: int, pruned: int, in_window: int, in_dup_window: int,
+                       dup_checks: int, pick_avoided: bool):
+    """Копит экономию отсечения по запускам (для POST_TYPE=prerank_stats)."""
+    stats = load_json(PRERANK_RUNS_FILE, {})
+    for key, value in (("runs", 1), ("candidates", candidates), ("pruned", pruned),
+                       ("in_window", in_window), ("in_dup_window", in_dup_window),
+                       ("dup_checks_avoided", dup_checks), ("pick_calls_avoided", int(pick_avoided))):
+        stats[key] = stats.get(key, 0) + value
+    save_json(PRERANK_RUNS_FILE, stats)
+
+
+def format_prerank_runs_report() -> str:
+    st = load_json(PRERANK_RUNS_FILE, {})
+    if not st.get("runs"):
+        return "Pre-ranker в запусках: ещё не отсекал."
+    return (
+        f"Pre-ranker в запусках ({st['runs']}):\n"
+        f"  отсечено {st['pruned']} из {st['candidates']} кандидатов\n"
+        f"  из них в окне выбора (top {PICK_WINDOW}): {st['in_window']}, "
+        f"в окне проверки дублей (top {DUP_SCREEN_TOP_K}): {st['in_dup_window']}\n"
+        f"  LLM-проверок дублей не понадобилось: {st['dup_checks_avoided']}, "
+        f"вызовов выбора: {st['pick_calls_avoided']}"
+    )
+
+
+# ────────────────────────────────────────────────
+# STORY CLUSTERING
+# Один раунд часто приходит 3-5 статьями из RSS и Tavily. Такие кандидаты
+# склеиваются в кластер (near_dup.cluster: общее имя компании + общая сумма
+# или похожий заголовок). В ранжирование идёт один представитель — лучший по
+# priority, затем RSS раньше Tavily, затем самый свежий; сниппеты остальных
+# передаются в "related" как контекст для выбора. В промпт генерации они не
+# идут: ошибочно склеенный кластер подставил бы в пост цифры чужой новости.
+# ────────────────────────────────────────────────
+CLUSTER_SIM_THRESHOLD = float(os.getenv("CLUSTER_SIM_THRESHOLD", "0.35"))
+
+
+def cluster_candidates(candidates: list) -> list:
+    """Возвращает по одному представителю на кластер, в порядке первого члена кластера."""
+    representatives = []
+    for members in near_dup.cluster(candidates, sim_threshold=CLUSTER_SIM_THRESHOLD, high=NEAR_DUP_HIGH):
+        rep = min(members, key=lambda c: (
+            c["priority"], 0 if c.get("source") == "rss" else 1, -(c.get("pub_ts") or 0),
+        ))
+        siblings = [c for c in members if c is not rep]
+        if siblings:
+            print(f"Cluster of {len(members)}: {rep['title'][:60]} "
+                  f"(+{', '.join(_url_host(c['url']) for c in siblings)})")
+        representatives.append({
+            **rep,
+            "related": [{"title": c["title"], "snippet": c["snippet"][:200], "url": c["url"]}
+                        for c in siblings],
+        })
+    return representatives
+
+
+def _url_host(url: str) -> str:
+    return url.split("/")[2].replace("www.", "") if url.count("/") >= 2 else url
+
+
 # ────────────────────────────────────────────────
 # GEMINI: SEMANTIC DUPLICATE CHECK
+#
+# DUP_SCREEN_MODE=batch (по умолчанию): top-K кандидатов проверяются локально,
+# все неоднозначные — ОДНИМ промптом со структурированным ответом, затем
+# выбор лучшего из выживших ещё одним вызовом. Итого не больше двух
+# LLM-вызовов вместо 2×N в поочерёдном цикле.
+# DUP_SCREEN_MODE=sequential — прежний цикл pick → is_semantic_duplicate.
 # ────────────────────────────────────────────────
+DUP_SCREEN_MODE  = os.getenv("DUP_SCREEN_MODE", "batch")
+DUP_SCREEN_TOP_K = int(os.getenv("DUP_SCREEN_TOP_K", "10"))
+
+_DUP_VERDICT_RE = re.compile(r'"?(\d+)"?\s*[:=\-–]\s*"?(YES|NO|DUP|NEW)', re.IGNORECASE)
+
+
+async def screen_duplicates_batch(candidates: list, recent_titles: list, rejected_titles: list) -> list:
+    """
+    Возвращает кандидатов из candidates, которые НЕ дубли (порядок сохраняется).
+    Локальный индекс решает очевидные случаи, остальные — один LLM-вызов.
+    """
+    survivors, ambiguous, neighbours_all = [], [], []
+    for c in candidates:
+        verdict, neighbours = near_dup.check(
+            c["title"], c.get("snippet", ""),
+            high=NEAR_DUP_HIGH, low=NEAR_DUP_LOW, recent_days=NEAR_DUP_RECENT_DAYS,
+        )
+        _near_dup_stats[verdict] += 1
+        if verdict == "duplicate":
+            sim, title, kind = neighbours[0]
+            print(f"Near-duplicate (local, {sim:.2f} vs {kind}): {c['title'][:60]} ≈ {title[:60]}")
+            mark_seen(c["url"], "duplicate")
+        elif verdict == "new":
+            survivors.append(c)
+        else:
+            ambiguous.append(c)
+            neighbours_all.extend(title for _, title, _ in neighbours[:4])
+
+    history = list(dict.fromkeys(str(t) for t in neighbours_all + recent_titles + rejected_titles))
+    if ambiguous and history:
+        articles = "\n".join(
+            f"{i + 1}. {c['title']}\n   {c['snippet'][:200]}" for i, c in enumerate(ambiguous)
+        )
+        prompt = (
+            "Recently published OR recently rejected articles/URLs:\n" + "\n".join(history[:40]) + "\n\n"
+            f"New articles:\n{articles}\n\n"
+            "For EACH new article: is it covering the SAME news story as any of the published/rejected "
+            "ones above? Same story = same event, same announcement, same data — even from a different source.\n"
+            'Answer ONLY with JSON like {"1": "YES", "2": "NO"} — one entry per new article.'
+        )
+        try:
+            answer   = await gemini_generate(prompt, cache=True)
+            verdicts = {int(n): v.upper() in ("YES", "DUP") for n, v in _DUP_VERDICT_RE.findall(answer)}
+        except Exception as e:
+            print(f"Batch duplicate check error: {e}")
+            verdicts = {}
+        for i, c in enumerate(ambiguous, 1):
+            if verdicts.get(i):
+                print(f"Semantic duplicate detected: {c['title']}")
+                mark_seen(c["url"], "duplicate")
+            else:
+                survivors.append(c)
+    else:
+        survivors.extend(ambiguous)
+
+    order = {id(c): i for i, c in enumerate(candidates)}
+    return sorted(survivors, key=lambda c: order[id(c)])
+
+
 async def is_semantic_duplicate(candidate: dict, recent_titles: list, rejected_titles: list) -> bool:
-    all_titles = recent_titles + rejected_titles
+    verdict, neighbours = near_dup.check(
+        candidate["title"], candidate.get("snippet", ""),
+        high=NEAR_DUP_HIGH, low=NEAR_DUP_LOW, recent_days=NEAR_DUP_RECENT_DAYS,
+    )
+    _near_dup_stats[verdict] += 1
+    if verdict == "duplicate":
+        sim, title, kind = neighbours[0]
+        print(f"Near-duplicate (local, {sim:.2f} vs {kind}): {candidate['title'][:60]} ≈ {title[:60]}")
+        return True
+    if verdict == "new":
+        return False
+
+    # Неоднозначно — ближайшие соседи из всей истории + последние заголовки
+    all_titles = [title for _, title, _ in neighbours] + recent_titles + rejected_titles
+    all_titles = list(dict.fromkeys(str(t) for t in all_titles))
     if not all_titles:
         return False
     try:
-        recent_text = "\n".join(str(t) for t in all_titles[:30])
+        recent_text = "\n".join(all_titles[:30])
         prompt = (
             f"New article title: {candidate['title']}\n"
             f"New article snippet: {candidate['snippet'][:200]}\n\n"
@@ -1044,7 +1998,7 @@ async def is_semantic_duplicate(candidate: dict, recent_titles: list, rejected_t
             "Same story = same event, same announcement, same data — even from a different source.\n"
             "Answer only YES or NO."
         )
-        answer = gemini_generate(prompt).upper()
+        answer = (await gemini_generate(prompt, cache=True)).upper()
         is_dup = answer.startswith("YES")
         if is_dup:
             print(f"Semantic duplicate detected: {candidate['title']}")
@@ -1056,7 +2010,7 @@ async def is_semantic_duplicate(candidate: dict, recent_titles: list, rejected_t
 # ────────────────────────────────────────────────
 # POST QUALITY SCORER
 # Оценивает пост по 5 критериям (0-100).
-# Если score < 60 — перегенерируем (макс 2 попытки).
+# Если score < 60 — перегенерируем (см. generate_post).
 # ────────────────────────────────────────────────
 def score_post_quality(post_text: str, region: str) -> dict:
     import re
@@ -1124,6 +2078,73 @@ def score_post_quality(post_text: str, region: str) -> dict:
     return {"score": score, "issues": issues, "passed": passed}
 
 
+# ────────────────────────────────────────────────
+# POST DRAFTS — best-of-N
+# POST_DRAFTS черновиков генерируются параллельно (cache=False — каждый
+# черновик новый сэмпл) и оцениваются score_post_quality; берётся лучший.
+# Только если ни один не прошёл — прежний цикл: проблемы лучшего черновика
+# дописываются в промпт, до POST_RETRIES перегенераций.
+# По умолчанию POST_DRAFTS=1 — прежнее поведение (один черновик + ретраи):
+# N черновиков — это N вызовов генерации на каждый пост при лимите Gemini
+# 15 RPM (llm_scheduler). Режим включается явно, например POST_DRAFTS=3.
+# ────────────────────────────────────────────────
+POST_DRAFTS  = int(os.getenv("POST_DRAFTS", "1"))
+POST_RETRIES = 2
+
+
+def _finish_draft(raw_text: str, region_header: str, url: str) -> str:
+    if not raw_text.startswith(region_header):
+        raw_text = f"{region_header}\n\n{raw_text}"
+    return f"{raw_text}\n\n{url}"
+
+
+async def generate_post(prompt: str, region_header: str, url: str) -> tuple:
+    """
+    Возвращает (post_text, quality) — лучший черновик по score_post_quality.
+    Если все черновики и ретраи провалили проверку — лучший из них.
+    Все LLM-вызовы упали — пробрасывает ошибку.
+    """
+    n = max(1, POST_DRAFTS)
+    if n == 1:
+        raws = [await gemini_generate(prompt)]
+    else:
+        results = await asyncio.gather(
+            *(gemini_generate(prompt) for _ in range(n)),
+            return_exceptions=True,
+        )
+        raws = [r for r in results if not isinstance(r, BaseException)]
+        if not raws:
+            raise results[0]
+        if len(raws) < n:
+            print(f"Drafts: {n - len(raws)}/{n} failed: {[str(r)[:100] for r in results if isinstance(r, BaseException)]}")
+
+    drafts = []
+    for raw in raws:
+        text = _finish_draft(raw, region_header, url)
+        drafts.append((text, score_post_quality(text, region_header)))
+    best_text, best_q = max(drafts, key=lambda d: d[1]["score"])
+    if len(drafts) > 1:
+        print(f"Best of {len(drafts)} drafts: {best_q['score']}/100 "
+              f"(scores: {[d[1]['score'] for d in drafts]})")
+    if best_q["passed"]:
+        return best_text, best_q
+
+    # Ни один черновик не прошёл — перегенерация с подсказкой по проблемам
+    for attempt in range(POST_RETRIES):
+        print(f"Attempt {attempt+1} failed (score {best_q['score']}): {best_q['issues']} — retrying...")
+        issues_hint = "; ".join(best_q["issues"])
+        prompt += f"\n\nПредыдущая попытка провалила проверку качества: {issues_hint}. Исправь это."
+        text    = _finish_draft(await gemini_generate(prompt), region_header, url)
+        quality = score_post_quality(text, region_header)
+        if quality["passed"]:
+            return text, quality
+        if quality["score"] >= best_q["score"]:
+            best_text, best_q = text, quality
+
+    print(f"All attempts failed quality check. Using best available (score: {best_q['score']}).")
+    return best_text, best_q
+
+
 # ────────────────────────────────────────────────
 # TRACKED ENTITIES
 # Читает таблицу tracked_entities из Supabase.
@@ -1197,6 +2218,46 @@ async def send_to_channel(text: str, image_url: str, thread_id: str = None):
 # ────────────────────────────────────────────────
 # NEWS POST LOGIC
 # ────────────────────────────────────────────────
+def fetch_post_image(best: dict):
+    """
+    Картинка к посту: og:image статьи, иначе Unsplash по ключевым словам.
+    Синхронная (requests) — run_news запускает её в потоке параллельно
+    с генерацией текста.
+    """
+    image_url = None
+    try:
+        from bs4 import BeautifulSoup
+        page = requests.get(best["url"], timeout=8)
+        soup = BeautifulSoup(page.text, "lxml")
+        img  = soup.find("meta", property="og:image")
+        if img and img.get("content"):
+            image_url = img["content"]
+    except Exception as e:
+        print(f"og:image failed: {e}")
+
+    if not image_url and UNSPLASH_ACCESS_KEY:
+        try:
+            keywords = best["title"].lower()
+            search_terms = []
+            if any(w in keywords for w in ["startup", "стартап"]):
+                search_terms.append("startup office")
+            if any(w in keywords for w in ["funding", "investment", "инвестиц", "раунд"]):
+                search_terms.append("business meeting")
+            if any(w in keywords for w in ["ai", "artificial intelligence"]):
+                search_terms.append("technology")
+            query = search_terms[0] if search_terms else "venture capital"
+            resp = requests.get(
+                f"https://api.unsplash.com/photos/random?query={query}&orientation=landscape",
+                headers={"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"},
+                timeout=5
+            )
+            if resp.status_code == 200:
+                image_url = resp.json()["urls"]["regular"]
+        except Exception as e:
+            print(f"Unsplash fallback failed: {e}")
+    return image_url
+
+
 async def run_news(posted_count: int, approval_mode: bool, intents: dict):
     print("MODE: NEWS (08:00)")
 
@@ -1218,82 +2279,135 @@ async def run_news(posted_count: int, approval_mode: bool, intents: dict):
         print(f"Tracked entities — added {len(entity_queries)} company-specific queries.")
 
     def _collect_candidates(queries, days):
-        found = []
-        for search in queries:
-            results = tavily_search(search["query"], max_results=10, days=days)
+        found   = []
+        batches = tavily_search_many(
+            [q["query"] for q in queries], max_results=TAVILY_MAX_RESULTS, days=days,
+            essential=[q["priority"] <= 1 for q in queries],  # мировые запросы — первыми под экономию
+        )
+        posted, pending = lookup_posted_pending([r["url"] for results in batches for r in results])
+        fresh = []   # (номер запроса, кандидат) — ещё не опубликованные и не в очереди
+        for qi, (search, results) in enumerate(zip(queries, batches)):
             for r in results:
-                if is_already_posted(r["url"]):
+                if r["url"] in posted:
                     print(f"Already posted: {r['url'][:65]}")
+                    mark_seen(r["url"], "posted")
                     continue
-                if is_already_pending(r["url"]):
+                if r["url"] in pending:
                     print(f"Already pending: {r['url'][:65]}")
+                    mark_seen(r["url"], "pending")
                     continue
-                if not is_vc_relevant(r["title"], r["snippet"], prohibitions):
-                    continue
-                found.append({
+                fresh.append((qi, {
                     "title":    r["title"],
                     "url":      r["url"],
                     "snippet":  r["snippet"],
                     "region":   search["region"],
                     "priority": search["priority"],
                     "key":      r["url"],
-                })
-        # Deduplicate by URL
+                    "pub_ts":   r["pub_ts"],
+                    "template": search["template"],
+                }))
+        relevant = [0] * len(queries)
+        for (qi, c), ok in zip(fresh, score_candidates([c for _, c in fresh], intents)):
+            if not ok:
+                mark_seen(c["url"], "irrelevant", irrelevant_scope("tavily", "score"))
+                continue
+            mark_seen(c["url"], "candidate")
+            relevant[qi] += 1
+            found.append(c)
+        for search, results, count in zip(queries, batches, relevant):
+            record_query_run(search["template"], len(results), count)
+        # Deduplicate by canonical URL
         seen, unique = set(), []
         for c in found:
-            if c["url"] not in seen:
-                seen.add(c["url"])
+            key = canonical_url(c["url"])
+            if key not in seen:
+                seen.add(key)
                 unique.append(c)
         return unique
 
-    # ── Шаг 1: RSS-фиды (прямое чтение источников) ──
-    print("Reading RSS feeds...")
-    rss_raw = fetch_rss_candidates(days=5)
+    # ── Шаг 1: RSS — из пула поллера, либо прямое чтение источников ──
+    rss_raw = load_candidate_pool(days=5)
+    if rss_raw is None:
+        print("Reading RSS feeds...")
+        rss_raw = fetch_rss_candidates(days=5)
 
     # Фильтруем RSS через те же проверки что и Tavily-результаты
     rss_candidates = []
+    rss_fresh = []
     rss_seen = set()
+    rss_posted, rss_pending = lookup_posted_pending([r["url"] for r in rss_raw])
     for r in rss_raw:
-        if r["url"] in rss_seen:
+        if canonical_url(r["url"]) in rss_seen:
             continue
-        if is_already_posted(r["url"]):
+        if r["url"] in rss_posted:
+            mark_seen(r["url"], "posted")
             continue
-        if is_already_pending(r["url"]):
+        if r["url"] in rss_pending:
+            mark_seen(r["url"], "pending")
             continue
-        if not is_vc_relevant(r["title"], r["snippet"], prohibitions):
+        rss_seen.add(canonical_url(r["url"]))
+        rss_fresh.append(dict(r))
+    for r, ok in zip(rss_fresh, score_candidates(rss_fresh, intents)):
+        if not ok:
+            mark_seen(r["url"], "irrelevant", irrelevant_scope(r.get("source") or "rss", "score"))
             continue
-        rss_seen.add(r["url"])
+        mark_seen(r["url"], "candidate")
+        record_feed_relevant(r.get("feed"))
         rss_candidates.append(r)
 
     print(f"RSS candidates after filter: {len(rss_candidates)}")
 
     # ── Шаг 2: Tavily (поиск по запросам) ──
-    print("Searching via Tavily (5-day window)...")
-    tavily_candidates = _collect_candidates(active_queries, days=5)
-    print(f"Tavily candidates (5-day): {len(tavily_candidates)}")
+    # Один проход с окном 7 дней; 5-дневный и 7-дневный уровни режем локально
+    # по pub_ts — fallback не повторяет ни запросы, ни проверки в Supabase.
+    # Планировщик: низкодоходные запросы — второй волной и только если мало
+    # приоритетных кандидатов (priority <= 1) после RSS и первой волны.
+    resolve_query_approvals()
+    first_wave, second_wave = plan_queries(active_queries)
+    print(f"Searching via Tavily ({TAVILY_FALLBACK_DAYS}-day window)...")
+    tavily_wide = _collect_candidates(first_wave, days=TAVILY_FALLBACK_DAYS)
+    if second_wave:
+        high = sum(1 for c in rss_candidates + tavily_wide if c["priority"] <= 1)
+        if high >= QUERY_ENOUGH_HIGH:
+            print(f"Query planner: {high} high-priority candidates — skipping {len(second_wave)} low-yield queries.")
+        else:
+            wave_urls    = {canonical_url(c["url"]) for c in tavily_wide}
+            tavily_wide += [c for c in _collect_candidates(second_wave, days=TAVILY_FALLBACK_DAYS)
+                            if canonical_url(c["url"]) not in wave_urls]
+    cutoff_5d   = time.time() - 86400 * TAVILY_WINDOW_DAYS
+    tavily_candidates = [c for c in tavily_wide if not c["pub_ts"] or c["pub_ts"] >= cutoff_5d]
+    print(f"Tavily candidates ({TAVILY_WINDOW_DAYS}-day): {len(tavily_candidates)}")
 
     # Fallback: расширяем до 7 дней если мало кандидатов от Tavily
     if len(tavily_candidates) < 3:
-        print("Too few Tavily candidates — expanding to 7-day window...")
-        tavily_candidates = _collect_candidates(active_queries, days=7)
-        print(f"Tavily candidates (7-day): {len(tavily_candidates)}")
+        print(f"Too few Tavily candidates — expanding to {TAVILY_FALLBACK_DAYS}-day window...")
+        tavily_candidates = tavily_wide
+        print(f"Tavily candidates ({TAVILY_FALLBACK_DAYS}-day): {len(tavily_candidates)}")
 
     # ── Объединяем: RSS первыми (они свежее и точнее) ──
-    # Дедупликация по URL между RSS и Tavily
-    tavily_urls = {c["url"] for c in rss_candidates}
-    tavily_unique = [c for c in tavily_candidates if c["url"] not in tavily_urls]
+    # Дедупликация по каноническому URL между RSS и Tavily
+    tavily_urls = {canonical_url(c["url"]) for c in rss_candidates}
+    tavily_unique = [c for c in tavily_candidates if canonical_url(c["url"]) not in tavily_urls]
     all_candidates = rss_candidates + tavily_unique
 
     print(f"Total candidates (RSS + Tavily): {len(all_candidates)}")
+    save_seen_index()
 
     if not all_candidates:
         print("No suitable news found.")
         notify_recipients("Main Bot: сегодня не нашлось подходящих новостей.")
         return
 
-    # Apply priority boosts from feedback
-    all_candidates = apply_priority_boosts(all_candidates, intents)
-    all_candidates.sort(key=lambda c: c["priority"])
+    # Бусты фидбэка уже посчитаны score_candidates — только сортировка
+    all_candidates = rank_candidates(all_candidates)
+    clustered      = cluster_candidates(all_candidates)
+    if len(clustered) < len(all_candidates):
+        print(f"Story clustering: {len(all_candidates)} candidates → {len(clustered)} distinct stories.")
+    all_candidates = clustered
+    # Индекс дублей — до пре-ранжирования: оно считает, какие LLM-проверки отсечение сэкономило
+    load_near_dup_index()
+    load_preranker()
+    all_candidates = prerank_candidates(all_candidates)
 
     recent_titles   = get_recent_post_titles()
     rejected_titles = get_rejected_post_summaries()
@@ -1302,7 +2416,18 @@ async def run_news(posted_count: int, approval_mode: bool, intents: dict):
     best = None
     remaining = list(all_candidates)
 
-    while remaining:
+    if DUP_SCREEN_MODE == "batch":
+        # Окна по DUP_SCREEN_TOP_K: следующее окно — только если в текущем все дубли
+        while remaining and not best:
+            window, remaining = remaining[:DUP_SCREEN_TOP_K], remaining[DUP_SCREEN_TOP_K:]
+            survivors = await screen_duplicates_batch(window, recent_titles, rejected_titles)
+            print(f"Duplicate screen: {len(survivors)}/{len(window)} candidates survived.")
+            if survivors:
+                best = await pick_best_with_gemini(
+                    survivors, prohibitions, rejected_titles, priority_instructions
+                )
+
+    while remaining and not best:
         candidate = await pick_best_with_gemini(
             remaining, prohibitions, rejected_titles, priority_instructions
         )
@@ -1312,8 +2437,10 @@ async def run_news(posted_count: int, approval_mode: bool, intents: dict):
             best = candidate
             break
         else:
+            mark_seen(candidate["url"], "duplicate")
             remaining = [c for c in remaining if c["url"] != candidate["url"]]
             print(f"Skipping duplicate, {len(remaining)} candidates left.")
+    print(near_dup_summary())
 
     if not best:
         print("All candidates are semantic duplicates of recent posts.")
@@ -1321,6 +2448,9 @@ async def run_news(posted_count: int, approval_mode: bool, intents: dict):
         return
 
     print(f"Selected [{best['region']}]: {best['title']}")
+    record_query_pick(best, approval_mode)
+    # Картинка не зависит от текста поста — качаем её, пока LLM пишет пост
+    image_task = asyncio.create_task(asyncio.to_thread(fetch_post_image, best))
     region_header = REGION_HEADER.get(best["region"], best["region"])
 
     region_country_hint = {
@@ -1391,65 +2521,14 @@ async def run_news(posted_count: int, approval_mode: bool, intents: dict):
             "- ТОЛЬКО факты из источника выше — никаких домыслов\n"
             "- Длина: 200-350 символов\n"
         )
-        # Generate post with up to 2 retries if quality score is too low
-        post_text  = None
-        quality    = None
-        for attempt in range(3):
-            raw_text = gemini_generate(prompt)
-            if not raw_text.startswith(region_header):
-                raw_text = f"{region_header}\n\n{raw_text}"
-            candidate_text = f"{raw_text}\n\n{best['url']}"
-            quality = score_post_quality(candidate_text, region_header)
-            if quality["passed"]:
-                post_text = candidate_text
-                break
-            else:
-                print(f"Attempt {attempt+1} failed (score {quality['score']}): {quality['issues']} — retrying...")
-                if attempt < 2:
-                    # Add issues to prompt so next attempt avoids them
-                    issues_hint = "; ".join(quality["issues"])
-                    prompt += f"\n\nПредыдущая попытка провалила проверку качества: {issues_hint}. Исправь это."
-
-        if post_text is None:
-            # Use last attempt even if failed
-            post_text = candidate_text
-            print(f"All attempts failed quality check. Using best available (score: {quality['score']}).")
-
-        image_url = None
-        try:
-            from bs4 import BeautifulSoup
-            page = requests.get(best["url"], timeout=8)
-            soup = BeautifulSoup(page.text, "lxml")
-            img  = soup.find("meta", property="og:image")
-            if img and img.get("content"):
-                image_url = img["content"]
-        except Exception as e:
-            print(f"og:image failed: {e}")
-
-        if not image_url and UNSPLASH_ACCESS_KEY:
-            try:
-                keywords = best["title"].lower()
-                search_terms = []
-                if any(w in keywords for w in ["startup", "стартап"]):
-                    search_terms.append("startup office")
-                if any(w in keywords for w in ["funding", "investment", "инвестиц", "раунд"]):
-                    search_terms.append("business meeting")
-                if any(w in keywords for w in ["ai", "artificial intelligence"]):
-                    search_terms.append("technology")
-                query = search_terms[0] if search_terms else "venture capital"
-                resp = requests.get(
-                    f"https://api.unsplash.com/photos/random?query={query}&orientation=landscape",
-                    headers={"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"},
-                    timeout=5
-                )
-                if resp.status_code == 200:
-                    image_url = resp.json()["urls"]["regular"]
-            except Exception as e:
-                print(f"Unsplash fallback failed: {e}")
+        # POST_DRAFTS черновиков параллельно, ретраи — только если ни один не прошёл
+        post_text, quality = await generate_post(prompt, region_header, best["url"])
 
+        image_url = await image_task
         print(f"Post ready ({len(post_text)} chars)")
 
     except Exception as e:
+        image_task.cancel()
         print(f"Gemini error: {e}")
         notify_recipients(f"Groq error: {str(e)}")
         return
@@ -1472,10 +2551,12 @@ async def run_news(posted_count: int, approval_mode: bool, intents: dict):
             f"{post_text}"
         )
         notify_approval(pending_id, preview)
+        mark_seen(best["url"], "pending")
         print(f"Sent for approval with buttons. ID: {pending_id}")
     else:
         await send_to_channel(post_text, image_url, NEWS_THREAD_ID)
         add_to_posted(best["key"], "NEWS", 8, best["region"], title=best.get("title", ""))
+        mark_seen(best["url"], "posted")
         print("PUBLISHED!")
         notify_recipients(f"Новость опубликована:\n{post_text[:200]}...")
 
@@ -1560,7 +2641,7 @@ async def run_education(posted_count: int, approval_mode: bool):
                 "- Заверши конкретным вопросом для обсуждения\n"
             )
 
-        post_text = gemini_generate(prompt)
+        post_text = await gemini_generate(prompt)
 
         if not post_text.startswith("Обучение"):
             post_text = f"Обучение\n\n{post_text}"
@@ -1604,21 +2685,50 @@ async def run_education(posted_count: int, approval_mode: bool):
 async def main():
     print(f"STARTING | {datetime.utcnow().isoformat()} UTC | TYPE: {POST_TYPE.upper()}")
 
+    # Служебные режимы — без загрузки анти-кейсов и счётчиков
+    if POST_TYPE in ("poll", "feed_stats", "query_stats", "prerank_stats"):
+        try:
+            if POST_TYPE == "poll":
+                await run_poll()
+            elif POST_TYPE == "feed_stats":
+                _tg_post(TELEGRAM_ADMIN_ID, format_feed_health_report())
+            elif POST_TYPE == "prerank_stats":
+                load_preranker()
+                _tg_post(TELEGRAM_ADMIN_ID, preranker.format_report(
+                    preranker.evaluate(threshold=PRERANK_PRUNE_BELOW)) + "\n\n" + format_prerank_runs_report())
+            else:
+                _tg_post(TELEGRAM_ADMIN_ID, format_query_yield_report())
+        finally:
+            save_seen_index()
+            save_feed_health()
+        return
+
     expired = expire_old_pending_posts()
     print(f"Cleaned up {expired} expired pending posts.")
+    sync_known_urls()
 
-    # Load all constraints and parse their intent
-    raw_constraints = fetch_negative_constraints()
-    intents         = parse_feedback_intents(raw_constraints)
+    # Intents из артефакта feedback_bot; разбор заново — только если анти-кейсы изменились
+    intents = load_intents(supabase)
+    relevance_matcher(intents["prohibitions"])
 
     posted_count  = get_posted_count()
     approval_mode = posted_count < 100
     print(f"Posts published: {posted_count} | Mode: {'APPROVAL' if approval_mode else 'AUTO'}")
 
-    if POST_TYPE == "education":
-        await run_education(posted_count, approval_mode)
-    else:
-        await run_news(posted_count, approval_mode, intents)
+    tavily_client.init_ledger(supabase, "bridge",
+                              on_alert=lambda text: _tg_post(TELEGRAM_ADMIN_ID, text))
+    try:
+        if POST_TYPE == "education":
+            await run_education(posted_count, approval_mode)
+        else:
+            await run_news(posted_count, approval_mode, intents)
+    finally:
+        save_seen_index()
+        save_feed_health()
+        save_query_yield()
+        tavily_client.save_cache()
+        tavily_client.flush_ledger()
+        llm_cache.save_cache()
 
 
 if __name__ == "__main__":
@@ -23,6 +23,13 @@ from datetime import datetime, timedelta, timezone
 from supabase import create_client, Client
 from groq import Groq
 from tavily import TavilyClient
+import tavily_client
+import llm_scheduler
+from llm_client import groq_request
+from dedup import (
+    canonical_url, url_hash, fetch_posted_keys, fetch_pending_urls,
+    sync_snapshot, maybe_known, remember_known, insert_row,
+)
 try:
     import google.generativeai as genai
     GEMINI_AVAILABLE = True
@@ -54,10 +61,12 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 tavily = TavilyClient(api_key=TAVILY_API_KEY)
 
 # Инициализируем Gemini если доступен
+GEMINI_MODEL = "gemini-1.5-flash"
+GROQ_MODEL   = "meta-llama/llama-4-scout-17b-16e-instruct"
 gemini_model = None
 if GEMINI_AVAILABLE and GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel("gemini-1.5-flash")
+    gemini_model = genai.GenerativeModel(GEMINI_MODEL)
     print("Generator: Gemini 1.5 Flash (основной)")
 elif GROQ_API_KEY:
     print("Generator: Groq LLaMA (основной)")
@@ -69,6 +78,7 @@ TARGET_COUNT = 100    # llama-4-scout: 500k токенов/день — хват
                      # Запускай 3 раза в разные дни чтобы получить 90 постов
                      # Каждый запуск добавляет посты в очередь, /bulk показывает все накопленные
 SEARCH_DAYS  = 90    # смотрим на 90 дней назад
+SEARCH_CACHE_HOURS = 24  # архив за 90 дней меняется медленно — повторный запуск берёт ответы Tavily из кэша
 
 # ────────────────────────────────────────────────
 # ПОИСКОВЫЕ ЗАПРОСЫ ДЛЯ АРХИВА (расширенные)
@@ -151,57 +161,47 @@ def notify(msg: str):
 
 
 def is_already_in_db(url: str) -> bool:
-    """Проверяем и posted_news и pending_posts."""
+    """Проверяем и posted_news и pending_posts. URL вне локального снимка — точно новый."""
+    if not maybe_known(url):
+        return False
     try:
-        r1 = supabase.table("posted_news").select("id").eq("url_text", url).limit(1).execute()
-        if r1.data:
+        if fetch_posted_keys(supabase, [url]):
             return True
-        r2 = supabase.table("pending_posts").select("id").eq("url", url).limit(1).execute()
-        return bool(r2.data)
+        return bool(fetch_pending_urls(supabase, [url], status=None))
     except Exception:
         return False
 
 
+def _groq_call(prompt: str) -> str:
+    return llm_scheduler.run(
+        "groq",
+        lambda: groq_request(groq_client, GROQ_MODEL, prompt, max_tokens=400, temperature=0.6),
+        llm_scheduler.estimate_tokens(prompt, 400),
+    )
+
+
 def _call_llm(prompt: str) -> str:
-    """Gemini первым (быстро, без лимитов), Groq как fallback."""
+    """
+    Gemini первым, Groq как fallback. Темп и повторы после 429 — llm_scheduler.
+    Текст поста не кэшируется: повторный прогон должен дать новый вариант.
+    """
     # Пробуем Gemini
     if gemini_model:
         try:
-            resp = gemini_model.generate_content(prompt)
-            return resp.text.strip()
+            return llm_scheduler.run(
+                "gemini",
+                lambda: (gemini_model.generate_content(prompt).text.strip(), None),
+                llm_scheduler.estimate_tokens(prompt),
+            )
         except Exception as e:
             print(f"  Gemini error: {e} — fallback to Groq")
 
     # Fallback: Groq
     if groq_client:
         try:
-            resp = groq_client.chat.completions.create(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=400,
-                temperature=0.6,
-            )
-            return resp.choices[0].message.content.strip()
+            return _groq_call(prompt)
         except Exception as e:
-            err = str(e)
-            if "rate_limit_exceeded" in err or "429" in err:
-                import re
-                wait = re.search(r"try again in (\d+)m", err)
-                wait_sec = int(wait.group(1)) * 60 + 30 if wait else 180
-                print(f"  Groq rate limit — жду {wait_sec}s...")
-                time.sleep(wait_sec)
-                try:
-                    resp2 = groq_client.chat.completions.create(
-                        model="meta-llama/llama-4-scout-17b-16e-instruct",
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=400,
-                        temperature=0.6,
-                    )
-                    return resp2.choices[0].message.content.strip()
-                except Exception as e2:
-                    print(f"  Groq retry failed: {e2}")
-            else:
-                print(f"  Groq error: {e}")
+            print(f"  Groq error: {e}")
     raise RuntimeError("Нет доступного генератора")
 
 
@@ -240,16 +240,21 @@ def generate_post(title: str, snippet: str, url: str, region: str) -> str:
         return None
 
 
-def save_bulk_pending(title: str, url: str, post_text: str, region: str) -> str:
+def save_bulk_pending(title: str, url: str, post_text: str, region: str, snippet: str = "") -> str:
+    remember_known(url)
+    row = {
+        "title":     title,
+        "url":       url,
+        "url_hash":  url_hash(url),
+        "post_text": post_text,
+        "image_url": "",
+        "region":    region,
+        "status":    "bulk_pending",  # отдельный статус для bulk review
+        "source_snippet": (snippet or "")[:1000],   # обучающий текст для preranker
+    }
     try:
-        res = supabase.table("pending_posts").insert({
-            "title":     title,
-            "url":       url,
-            "post_text": post_text,
-            "image_url": "",
-            "region":    region,
-            "status":    "bulk_pending",  # отдельный статус для bulk review
-        }).execute()
+        # колонок url_hash / source_snippet может не быть
+        res = insert_row(supabase, "pending_posts", row, optional=("url_hash", "source_snippet"))
         return res.data[0]["id"]
     except Exception as e:
         print(f"  Save error: {e}")
@@ -266,6 +271,12 @@ def main():
 
     notify(f"⚙️ Bulk seed запущен. Генерирую до {TARGET_COUNT} постов из архива за {SEARCH_DAYS} дней...")
 
+    tavily_client.init_ledger(supabase, "bulk_seed", on_alert=notify)
+    try:
+        sync_snapshot(supabase)
+    except Exception as e:
+        print(f"Known-URL snapshot sync failed (checking every URL in Supabase): {e}")
+
     all_articles = []
     seen_urls    = set()
 
@@ -274,15 +285,19 @@ def main():
     for search in ARCHIVE_QUERIES:
         print(f"\nSearching: {search['query'][:60]}")
         try:
-            results = tavily.search(
-                query=search["query"],
-                search_depth="basic",
+            results = tavily_client.search(
+                tavily, search["query"],
                 max_results=15,
                 days=SEARCH_DAYS,
+                ttl_hours=SEARCH_CACHE_HOURS,
+                essential=False,  # архив — первым уступает бюджет ежедневным запускам
             )
+            if results["skipped"]:
+                print("  Tavily budget nearly exhausted — stopping archive search.")
+                break
             for r in results.get("results", []):
                 url = r.get("url", "")
-                if not url or url in seen_urls:
+                if not url or canonical_url(url) in seen_urls:
                     continue
                 if any(d in url for d in BLOCKED_DOMAINS):
                     continue
@@ -314,7 +329,7 @@ def main():
                     print(f"  Already in DB: {url[:60]}")
                     continue
 
-                seen_urls.add(url)
+                seen_urls.add(canonical_url(url))
                 if title_key:
                     seen_title_keys.add(title_key)
                 all_articles.append({
@@ -323,10 +338,14 @@ def main():
                     "snippet": snippet,
                     "region":  search["region"],
                 })
-            time.sleep(0.3)  # rate limit
+            if not results["cached"]:
+                time.sleep(0.3)  # rate limit
         except Exception as e:
             print(f"  Tavily error: {e}")
 
+    tavily_client.save_cache()
+    tavily_client.flush_ledger()
+
     print(f"\n{'='*50}")
     print(f"Articles found: {len(all_articles)}")
 
@@ -358,6 +377,7 @@ def main():
             url=article["url"],
             post_text=post_text,
             region=article["region"],
+            snippet=article["snippet"],
         )
         if pid:
             generated += 1
@@ -365,11 +385,6 @@ def main():
         else:
             failed += 1
 
-        # Пауза каждые 10 запросов чтобы не перегрузить Groq rate limit
-        if i % 10 == 0:
-            print(f"  Rate limit pause (10 req)...")
-            time.sleep(3)
-
     print(f"\n{'='*50}")
     print(f"DONE: {generated} posts generated, {failed} failed")
 
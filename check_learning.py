@@ -19,6 +19,9 @@ from datetime import datetime, timezone
 from supabase import create_client, Client
 from groq import Groq
 
+import llm_scheduler
+from llm_client import groq_request
+
 GROQ_API_KEY   = os.getenv("GROQ_API_KEY")
 SUPABASE_URL   = os.getenv("SUPABASE_URL")
 SUPABASE_KEY   = os.getenv("SUPABASE_KEY")
@@ -32,6 +35,17 @@ groq_client      = Groq(api_key=GROQ_API_KEY)
 
 SEP = "─" * 60
 
+GROQ_MODEL = "llama-3.3-70b-versatile"
+
+
+def groq_generate(prompt: str) -> str:
+    """Темп и повторы после 429 — llm_scheduler. Текст поста не кэшируется."""
+    return llm_scheduler.run(
+        "groq",
+        lambda: groq_request(groq_client, GROQ_MODEL, prompt, max_tokens=512, temperature=0.6),
+        llm_scheduler.estimate_tokens(prompt, 512),
+    )
+
 def section(title: str):
     print(f"\n{'═'*60}")
     print(f"  {title}")
@@ -184,13 +198,7 @@ def test_generation(full_prompt: str, test_title: str, test_snippet: str):
 
     print("\n🤖 Генерирую пост с учётом всех фидбэков...\n")
     try:
-        resp = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": full_prompt}],
-            max_tokens=512,
-            temperature=0.6,
-        )
-        post_with = resp.choices[0].message.content.strip()
+        post_with = groq_generate(full_prompt)
     except Exception as e:
         post_with = f"ОШИБКА: {e}"
 
@@ -212,13 +220,7 @@ def test_generation(full_prompt: str, test_title: str, test_snippet: str):
 
     print("\n🤖 Генерирую пост БЕЗ фидбэков (для сравнения)...\n")
     try:
-        resp2 = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": bare_prompt}],
-            max_tokens=512,
-            temperature=0.6,
-        )
-        post_without = resp2.choices[0].message.content.strip()
+        post_without = groq_generate(bare_prompt)
     except Exception as e:
         post_without = f"ОШИБКА: {e}"
 
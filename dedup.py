@@ -0,0 +1,399 @@
+"""
+dedup.py — пакетная проверка «уже опубликовано / уже на одобрении».
+
+Раньше каждый кандидат проверялся двумя отдельными запросами к Supabase
+(is_already_posted + is_already_pending) — 100+ HTTP-запросов за запуск.
+Здесь весь список URL проверяется одним запросом `in_` на таблицу
+(с разбиением на пачки по DEDUP_CHUNK — длина URL запроса PostgREST ограничена).
+
+Функции принимают клиент Supabase аргументом: модуль не создаёт соединений,
+поэтому его можно импортировать из любого скрипта и из
+benchmarks/bench_dedup.py (с фейковым клиентом).
+
+Один и тот же материал приходит из RSS и Tavily с utm-метками, AMP-путями,
+мобильными хостами и слэшем на конце. Поэтому сравниваются не сырые URL,
+а url_hash(canonical_url(url)) — колонка url_hash в posted_news и
+pending_posts. Строки, записанные до появления колонки, дозаполняются
+backfill_url_hashes(); пока он не закончил, URL дополнительно ищутся по
+точному url_text / url.
+
+Локальный снимок известных URL (sync_snapshot / maybe_known) отвечает на
+частый случай «URL точно новый» вообще без запросов — см. раздел ниже.
+"""
+
+import os
+import json
+import mmap
+import array
+import bisect
+import hashlib
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from local_store import cache_path, load_json, save_json
+
+DEDUP_CHUNK = 80
+
+# ────────────────────────────────────────────────
+# КАНОНИЧЕСКИЙ URL
+# ────────────────────────────────────────────────
+# Параметры, которые не меняют страницу (трекинг, рефералы, AMP-флаги)
+_TRACKING_PARAMS = {
+    "fbclid", "gclid", "yclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "referrer", "source", "src", "via", "cmpid", "spm",
+    "_ga", "_gl", "amp", "outputtype", "output", "from", "share",
+}
+_TRACKING_PREFIXES = ("utm_", "ga_", "pk_", "hsa_", "at_")
+_HOST_PREFIXES     = ("www.", "m.", "mobile.", "amp.")
+
+
+def canonical_url(url: str) -> str:
+    """
+    Нормализует URL для сравнения:
+      https, хост в нижнем регистре без www./m./mobile./amp. и порта по умолчанию,
+      без AMP-сегментов (/amp, /amp/, .amp, /amp.html), без слэша на конце,
+      без фрагмента и трекинговых параметров, остальные параметры отсортированы.
+    Не-URL ключи (например, education-ключи в posted_news) возвращаются как есть.
+    """
+    url = (url or "").strip()
+    if not url.lower().startswith(("http://", "https://")):
+        return url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    host = (parts.hostname or "").lower()
+    for prefix in _HOST_PREFIXES:
+        if host.startswith(prefix) and host.count(".") > 1:
+            host = host[len(prefix):]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    segments = [seg for seg in parts.path.split("/") if seg and seg.lower() != "amp"]
+    if segments:
+        last = segments[-1]
+        for suffix in (".amp.html", ".amp"):
+            if last.lower().endswith(suffix):
+                segments[-1] = last[:-len(suffix)]
+        if segments[-1].lower() in ("amp.html", "index.html", "index.php"):
+            segments.pop()
+    path = "/" + "/".join(segments) if segments else ""
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith(_TRACKING_PREFIXES)
+    )
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def url_hash(url: str) -> str:
+    """Ключ фиксированной ширины (32 hex-символа) для колонки url_hash."""
+    return hashlib.blake2b(canonical_url(url).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _unique(urls) -> list:
+    """Убирает пустые значения и повторы, сохраняя порядок."""
+    return list(dict.fromkeys(u for u in urls if u))
+
+
+# Колонки url_hash может не быть, пока не применена миграция из TUTORIAL.md —
+# тогда проверяем только точное совпадение и не шумим ошибкой на каждом запросе.
+_hash_column = {"posted_news": True, "pending_posts": True}
+
+# Таблицы, где backfill_url_hashes дозаполнил все старые строки: точный
+# поиск по url_text / url там больше не нужен. Хранится в bot_state, чтобы
+# знали все скрипты; None — ещё не читали.
+BACKFILL_STATE_KEY = "url_hash_backfilled"
+_backfilled = None
+
+
+def missing_column(error, column: str = None) -> bool:
+    """
+    Ошибка PostgREST / Postgres «нет такой колонки» (PGRST204, 42703).
+    column — проверить, что речь именно о ней. Таймауты, 5xx и прочее — False.
+    """
+    text = str(error)
+    if not ("PGRST204" in text or "42703" in text
+            or ("column" in text and ("does not exist" in text or "Could not find" in text))):
+        return False
+    return column is None or column in text
+
+
+def insert_row(db, table: str, row: dict, optional=()):
+    """
+    insert с откатом на старую схему: если PostgREST не знает колонку из
+    optional — она убирается и insert повторяется. Любая другая ошибка
+    пробрасывается сразу (повтор после таймаута мог бы вставить строку дважды).
+    """
+    row = dict(row)
+    while True:
+        try:
+            return db.table(table).insert(row).execute()
+        except Exception as e:
+            dropped = [c for c in optional if c in row and missing_column(e, c)]
+            if not dropped:
+                raise
+            for c in dropped:
+                row.pop(c)
+            print(f"{table}: no column {', '.join(dropped)} — saving without it")
+
+
+def _load_backfilled(db) -> set:
+    global _backfilled
+    if _backfilled is None:
+        try:
+            res = db.table("bot_state").select("state_value").eq("state_key", BACKFILL_STATE_KEY).execute()
+            _backfilled = set(json.loads(res.data[0]["state_value"])) if res.data else set()
+        except Exception as e:
+            print(f"dedup: backfill state unavailable, exact URL fallback stays on: {e}")
+            _backfilled = set()
+    return _backfilled
+
+
+def _mark_backfilled(db, table: str):
+    done  = _load_backfilled(db)
+    done.add(table)
+    value = json.dumps(sorted(done))
+    existing = db.table("bot_state").select("id").eq("state_key", BACKFILL_STATE_KEY).execute()
+    if existing.data:
+        db.table("bot_state").update({"state_value": value}).eq("state_key", BACKFILL_STATE_KEY).execute()
+    else:
+        db.table("bot_state").insert({"state_key": BACKFILL_STATE_KEY, "state_value": value}).execute()
+
+
+def _fetch_known(db, table: str, column: str, urls, status: str = None) -> set:
+    """
+    Подмножество urls, которое есть в table — по url_hash; пока старые строки
+    не дозаполнены (backfill_url_hashes), ещё и по точному column.
+    """
+    urls    = _unique(urls)
+    by_hash = {}
+    for u in urls:
+        by_hash.setdefault(url_hash(u), []).append(u)
+
+    def _query(select, col, values):
+        q = db.table(table).select(select).in_(col, values)
+        if status:
+            q = q.eq("status", status)
+        return q.execute().data or []
+
+    found = set()
+    if _hash_column[table]:
+        try:
+            for chunk in _chunks(list(by_hash), DEDUP_CHUNK):
+                for row in _query("url_hash", "url_hash", chunk):
+                    found.update(by_hash.get(row["url_hash"], ()))
+        except Exception as e:
+            if not missing_column(e, "url_hash"):
+                raise
+            _hash_column[table] = False
+            print(f"dedup: {table}.url_hash not available, exact URL match only: {e}")
+        if table in _load_backfilled(db):
+            return found
+    # строки без url_hash (до миграции / до backfill) — точное совпадение
+    rest = [u for u in urls if u not in found]
+    for chunk in _chunks(rest, DEDUP_CHUNK):
+        found.update(row[column] for row in _query(column, column, chunk))
+    return found
+
+
+def fetch_posted_keys(db, urls) -> set:
+    """Подмножество urls, которое уже есть в posted_news."""
+    return _fetch_known(db, "posted_news", "url_text", urls)
+
+
+def fetch_pending_urls(db, urls, status: str = "pending") -> set:
+    """Подмножество urls в pending_posts с данным статусом (None — любой статус)."""
+    return _fetch_known(db, "pending_posts", "url", urls, status=status)
+
+
+def lookup_known(db, urls) -> tuple:
+    """
+    Возвращает (posted, pending) — два множества URL из списка кандидатов.
+    Ошибки Supabase пробрасываются: решение «пропустить проверку или нет»
+    остаётся за вызывающим кодом.
+    """
+    urls = _unique(urls)
+    if not urls:
+        return set(), set()
+    return fetch_posted_keys(db, urls), fetch_pending_urls(db, urls)
+
+
+# upsert — это INSERT ... ON CONFLICT, и NOT NULL проверяется на
+# вставляемой строке: кроме id и url_hash, шлём обязательные колонки как есть
+_BACKFILL_COLUMNS = {
+    "posted_news":   ("url_text", "news_type"),
+    "pending_posts": ("url", "post_text"),
+}
+
+
+def backfill_url_hashes(db, limit: int = 200) -> int:
+    """
+    Дозаполняет url_hash у старых строк (до limit на таблицу за вызов) —
+    одним upsert на таблицу, а не update на каждую строку.
+    Когда в таблице не осталось строк без url_hash, это записывается в
+    bot_state и точный поиск по URL для неё выключается. Возвращает число
+    обновлённых строк.
+    """
+    updated = 0
+    for table, column in (("posted_news", "url_text"), ("pending_posts", "url")):
+        if not _hash_column[table] or table in _load_backfilled(db):
+            continue
+        columns = _BACKFILL_COLUMNS[table]
+        rows = db.table(table).select(", ".join(("id",) + columns)).is_("url_hash", "null") \
+            .limit(limit).execute().data or []
+        if rows:
+            # Пустой url тоже получает хэш — иначе такая строка держала бы backfill вечно
+            db.table(table).upsert(
+                [dict(row, url_hash=url_hash(row.get(column) or "")) for row in rows],
+                on_conflict="id",
+            ).execute()
+            updated += len(rows)
+        if len(rows) < limit:
+            _mark_backfilled(db, table)
+            print(f"dedup: {table}.url_hash backfill complete — exact URL fallback off")
+    return updated
+
+
+# ────────────────────────────────────────────────
+# ЛОКАЛЬНЫЙ СНИМОК ИЗВЕСТНЫХ URL
+#
+# Отсортированный массив 64-битных хешей posted_news.url_text и
+# pending_posts.url (любой статус) в .cache/known_urls.bin, читается через
+# mmap + бинарный поиск. Это фильтр «точно новый»: если хеша нет в снимке,
+# URL не встречался ни в одной таблице — сеть не нужна. Совпадение
+# подтверждается обычным запросом (lookup_known), так что удалённые строки и
+# сменившийся статус pending не дают ложных «дублей».
+#
+# Синхронизация инкрементальная: в начале запуска догружаются строки с
+# created_at >= курсора (время прошлой синхронизации минус
+# SNAPSHOT_OVERLAP_MIN — запас на строки, вставленные с запаздыванием).
+# Нет снимка или курсора — полная загрузка постранично.
+# ────────────────────────────────────────────────
+SNAPSHOT_FILE        = "known_urls.bin"
+SNAPSHOT_META        = "known_urls.json"
+SNAPSHOT_OVERLAP_MIN = 15
+SNAPSHOT_PAGE        = 1000
+SNAPSHOT_VERSION     = 2   # 2 — хеши канонических URL; другая версия → полная перезагрузка
+_SNAPSHOT_SOURCES    = (("posted_news", "url_text"), ("pending_posts", "url"))
+
+_snapshot = {"hashes": None, "mm": None, "extra": set()}
+
+
+def url_hash64(url: str) -> int:
+    """64-битный хеш канонического URL для снимка."""
+    return int.from_bytes(hashlib.blake2b(canonical_url(url).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _close_snapshot():
+    if _snapshot["mm"] is not None:
+        _snapshot["hashes"].release()
+        _snapshot["mm"].close()
+        _snapshot["mm"] = None
+    _snapshot["hashes"] = None
+
+
+def _open_snapshot():
+    """mmap-ит файл снимка; пустой или отсутствующий файл — пустой массив."""
+    _close_snapshot()
+    path = cache_path(SNAPSHOT_FILE)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        _snapshot["hashes"] = memoryview(array.array("Q"))
+        return
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _snapshot["mm"]     = mm
+    _snapshot["hashes"] = memoryview(mm).cast("Q")
+
+
+def _write_snapshot(hashes: list):
+    data = array.array("Q", hashes)
+    tmp  = cache_path(SNAPSHOT_FILE + ".tmp")
+    with open(tmp, "wb") as f:
+        data.tofile(f)
+    os.replace(tmp, cache_path(SNAPSHOT_FILE))
+
+
+def _fetch_keys_since(db, table: str, column: str, since: str = None) -> list:
+    keys, start = [], 0
+    while True:
+        q = db.table(table).select(column)
+        if since:
+            q = q.gte("created_at", since)
+        rows = q.order("created_at").range(start, start + SNAPSHOT_PAGE - 1).execute().data or []
+        keys.extend(r[column] for r in rows if r.get(column))
+        if len(rows) < SNAPSHOT_PAGE:
+            return keys
+        start += SNAPSHOT_PAGE
+
+
+def sync_snapshot(db) -> int:
+    """
+    Догружает новые строки обеих таблиц в снимок. Возвращает число новых
+    хешей. Ошибки пробрасываются — без синхронизации снимок не используется.
+    """
+    meta    = load_json(SNAPSHOT_META, {}) or {}
+    started = datetime.now(timezone.utc)
+    since   = meta.get("cursor") if os.path.exists(cache_path(SNAPSHOT_FILE)) else None
+    _close_snapshot()
+    if meta.get("version") != SNAPSHOT_VERSION and os.path.exists(cache_path(SNAPSHOT_FILE)):
+        os.remove(cache_path(SNAPSHOT_FILE))
+        since = None
+
+    fresh = set()
+    for table, column in _SNAPSHOT_SOURCES:
+        fresh.update(url_hash64(k) for k in _fetch_keys_since(db, table, column, since))
+
+    _open_snapshot()
+    old   = _snapshot["hashes"]
+    added = [h for h in fresh if not _contains(old, h)]
+    if added:
+        merged = sorted(set(old.tolist()) | set(added))
+        _close_snapshot()
+        _write_snapshot(merged)
+        _open_snapshot()
+    cursor = (started - timedelta(minutes=SNAPSHOT_OVERLAP_MIN)).strftime("%Y-%m-%dT%H:%M:%S")
+    save_json(SNAPSHOT_META, {"cursor": cursor, "count": len(_snapshot["hashes"]),
+                               "version": SNAPSHOT_VERSION})
+    print(f"Known-URL snapshot: {len(_snapshot['hashes'])} hashes "
+          f"({'full load' if not since else f'+{len(added)} since {since}'})")
+    return len(added)
+
+
+def _contains(hashes, h: int) -> bool:
+    i = bisect.bisect_left(hashes, h)
+    return i < len(hashes) and hashes[i] == h
+
+
+def remember_known(url: str):
+    """URL записан в posted/pending в этом запуске — снимок узнает о нём при следующей синхронизации."""
+    if url:
+        _snapshot["extra"].add(url_hash64(url))
+
+
+def snapshot_ready() -> bool:
+    return _snapshot["hashes"] is not None
+
+
+def maybe_known(url: str) -> bool:
+    """False — URL точно новый. True — возможно известен (или снимок не загружен)."""
+    if not url or _snapshot["hashes"] is None:
+        return True
+    h = url_hash64(url)
+    return h in _snapshot["extra"] or _contains(_snapshot["hashes"], h)
+
+
+def lookup_known_cached(db, urls) -> tuple:
+    """
+    lookup_known через снимок: в Supabase уходят только URL, которые есть в
+    снимке. Если снимок не синхронизирован — проверяются все URL.
+    """
+    hits = [u for u in _unique(urls) if maybe_known(u)]
+    if not hits:
+        return set(), set()
+    return lookup_known(db, hits)
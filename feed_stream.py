@@ -0,0 +1,219 @@
+"""
+feed_stream.py — потоковый парсер RSS / Atom / RDF с ранней остановкой.
+
+feedparser строит всё дерево документа и только потом отдаёт записи —
+даже если нам нужны 5-10 свежих из 100. Здесь expat разбирает байты по мере
+поступления (chunk за chunk'ом), каждая запись отдаётся сразу после
+закрывающего </item> / </entry>, а дерево не строится вовсе.
+
+Ранняя остановка: фиды отсортированы от новых к старым, поэтому после
+stop_after_old записей подряд старше cutoff дальше читать незачем —
+генератор завершается, и вызывающий код может закрыть соединение.
+
+Формат записи совпадает с кэшем фидов в bridge.py:
+    {"link": str, "title": str, "summary": str (до 400 симв), "pub_ts": float | None}
+
+Только stdlib. При битом XML бросает xml.parsers.expat.ExpatError —
+bridge.py в этом случае откатывается на feedparser.
+"""
+
+import re
+import html
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from xml.parsers import expat
+
+ENTRY_TAGS   = {"item", "entry"}
+TITLE_TAGS   = {"title"}
+LINK_TAGS    = {"link"}
+SUMMARY_TAGS = {"description", "summary", "encoded", "content"}  # encoded = content:encoded
+DATE_TAGS    = ("pubDate", "published", "date", "issued", "updated", "modified")
+
+SUMMARY_LIMIT = 400
+
+_TAG_RE   = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+_URL_DATE = re.compile(r'/(20\d{2})[/-](\d{2})[/-](\d{2})')
+
+
+def _local(name: str) -> str:
+    """'http://www.w3.org/2005/Atom entry' → 'entry'."""
+    return name.rsplit(" ", 1)[-1]
+
+
+def _clean_text(text: str) -> str:
+    """Убирает HTML-теги и лишние пробелы из description/summary."""
+    text = html.unescape(_TAG_RE.sub(" ", text))
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def parse_date(value: str):
+    """RFC 822 (RSS pubDate) или ISO 8601 (Atom, dc:date) → unix-время. None если не разобрали."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _date_from_url(url: str):
+    m = _URL_DATE.search(url)
+    if not m:
+        return None
+    try:
+        return datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)), tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+class _EntryCollector:
+    """
+    Обработчики expat: собирает поля текущей записи, готовые записи
+    складывает в self.ready. Хранит только одну запись за раз.
+    """
+
+    def __init__(self):
+        self.ready    = []
+        self._depth   = 0       # глубина внутри текущей записи (0 = вне записи)
+        self._field   = None    # имя поля, текст которого сейчас собираем
+        self._buf     = []
+        self._entry   = None
+
+    def start(self, name, attrs):
+        tag = _local(name)
+        if self._entry is None:
+            if tag in ENTRY_TAGS:
+                self._entry = {"link": "", "title": "", "summary": "", "dates": {}}
+                self._depth = 1
+            return
+        self._depth += 1
+        if self._depth != 2:
+            return  # вложенные элементы (media:*, author/name и т.п.) не нужны
+        if tag in LINK_TAGS and "href" in attrs:
+            # Atom: <link rel="alternate" href="..."/>
+            if attrs.get("rel", "alternate") == "alternate" and not self._entry["link"]:
+                self._entry["link"] = attrs["href"].strip()
+            return
+        if tag in TITLE_TAGS or tag in LINK_TAGS or tag in SUMMARY_TAGS or tag in DATE_TAGS:
+            self._field = tag
+            self._buf   = []
+
+    def data(self, text):
+        if self._field:
+            self._buf.append(text)
+
+    def skipped_entity(self, name, is_parameter_entity):
+        # HTML-сущности (&nbsp;, &mdash;) без DTD — expat их пропускает, подставляем сами
+        if self._field and not is_parameter_entity:
+            self._buf.append(html.unescape(f"&{name};"))
+
+    def end(self, name):
+        if self._entry is None:
+            return
+        if self._field and self._depth == 2:
+            text  = "".join(self._buf)
+            field = self._field
+            self._field = None
+            if field in TITLE_TAGS:
+                self._entry["title"] = _clean_text(text)
+            elif field in LINK_TAGS:
+                if not self._entry["link"]:
+                    self._entry["link"] = text.strip()
+            elif field in SUMMARY_TAGS:
+                # description/summary приоритетнее полного content:encoded
+                if not self._entry["summary"] or field in ("description", "summary"):
+                    self._entry["summary"] = _clean_text(text)[:SUMMARY_LIMIT]
+            else:
+                self._entry["dates"].setdefault(field, text)
+        self._depth -= 1
+        if self._depth == 0:
+            self._finish()
+
+    def _finish(self):
+        entry, self._entry = self._entry, None
+        if not entry["link"]:
+            return
+        pub_ts = None
+        for tag in DATE_TAGS:
+            if tag in entry["dates"]:
+                pub_ts = parse_date(entry["dates"][tag])
+                if pub_ts:
+                    break
+        if not pub_ts:
+            pub_ts = _date_from_url(entry["link"])
+        self.ready.append({
+            "link":    entry["link"],
+            "title":   entry["title"],
+            "summary": entry["summary"],
+            "pub_ts":  pub_ts,
+        })
+
+
+def _make_parser(collector: _EntryCollector):
+    parser = expat.ParserCreate(namespace_separator=" ")
+    # Внешний «пустой» DTD: неизвестные HTML-сущности (&nbsp;) уходят в
+    # SkippedEntityHandler вместо ошибки "undefined entity".
+    parser.UseForeignDTD(True)
+    parser.SetParamEntityParsing(expat.XML_PARAM_ENTITY_PARSING_ALWAYS)
+
+    def _external_entity(context, base, system_id, public_id):
+        parser.ExternalEntityParserCreate(context).Parse(b"", True)
+        return 1
+
+    parser.ExternalEntityRefHandler = _external_entity
+    parser.StartElementHandler      = collector.start
+    parser.EndElementHandler        = collector.end
+    parser.CharacterDataHandler     = collector.data
+    parser.SkippedEntityHandler     = collector.skipped_entity
+    parser.buffer_text              = True
+    return parser
+
+
+def iter_feed_entries(chunks, cutoff_ts: float = None, stop_after_old: int = 5):
+    """
+    Потоково разбирает фид из итерируемого набора байтовых chunk'ов
+    (например resp.iter_content()) и отдаёт записи по одной.
+
+    cutoff_ts      — граница окна (unix-время); записи старше всё равно отдаются,
+                     решение о фильтрации остаётся за вызывающим кодом.
+    stop_after_old — после стольких записей ПОДРЯД старше cutoff_ts чтение
+                     прекращается (0 — читать до конца).
+    """
+    collector = _EntryCollector()
+    parser    = _make_parser(collector)
+    old_run   = 0
+
+    def _drain():
+        nonlocal old_run
+        while collector.ready:
+            entry = collector.ready.pop(0)
+            if cutoff_ts and entry["pub_ts"] and entry["pub_ts"] < cutoff_ts:
+                old_run += 1
+            else:
+                old_run = 0
+            yield entry
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parser.Parse(chunk, False)
+        yield from _drain()
+        if stop_after_old and old_run >= stop_after_old:
+            return
+    parser.Parse(b"", True)
+    yield from _drain()
+
+
+def parse_feed_bytes(data: bytes, cutoff_ts: float = None, stop_after_old: int = 5,
+                     chunk_size: int = 16384) -> list:
+    """Удобная обёртка: весь документ в памяти → список записей."""
+    chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    return list(iter_feed_entries(chunks, cutoff_ts=cutoff_ts, stop_after_old=stop_after_old))
@@ -13,6 +13,9 @@ from telegram.ext import (
     filters,
     ContextTypes,
 )
+import tavily_client
+from dedup import url_hash, insert_row
+from feedback_intents import rebuild_artifact
 
 # ────────────────────────────────────────────────
 # ENVIRONMENT VARIABLES
@@ -45,25 +48,24 @@ def is_authorized(user_id: int) -> bool:
 # ────────────────────────────────────────────────
 # SUPABASE HELPERS
 # ────────────────────────────────────────────────
-def add_to_posted(url_or_text: str, news_type: str, score: int, source_type: str, title: str = ""):
+def add_to_posted(url_or_text: str, news_type: str, score: int, source_type: str, title: str = "",
+                  strict: bool = False):
+    """strict=True — ошибка вставки пробрасывается (пост не считается опубликованным)."""
+    row = {
+        "url_text":           url_or_text,
+        "url_hash":           url_hash(url_or_text),
+        "news_type":          news_type,
+        "shareability_score": score,
+        "source_type":        source_type,
+        "title":              title,
+    }
+    # В старых схемах может не быть колонок url_hash / title — тогда сохраняем без них
     try:
-        supabase.table("posted_news").insert({
-            "url_text":           url_or_text,
-            "news_type":          news_type,
-            "shareability_score": score,
-            "source_type":        source_type,
-            "title":              title,
-        }).execute()
+        insert_row(supabase, "posted_news", row, optional=("url_hash", "title"))
     except Exception as e:
-        try:
-            supabase.table("posted_news").insert({
-                "url_text":  url_or_text,
-                "news_type": news_type,
-                "shareability_score": score,
-                "source_type": source_type,
-            }).execute()
-        except Exception as e2:
-            print(f"Failed to save to posted_news: {e2}")
+        print(f"Failed to save to posted_news: {e}")
+        if strict:
+            raise
 
 def add_negative_constraint(feedback: str, post_content: str = None):
     """
@@ -76,6 +78,7 @@ def add_negative_constraint(feedback: str, post_content: str = None):
         if post_content:
             payload["post_content"] = post_content[:1500]
         res = supabase.table("negative_constraints").insert(payload).execute()
+        rebuild_artifact(supabase)
         return res.data[0]["id"]
     except Exception as e:
         print(f"Failed to add negative constraint: {e}")
@@ -252,6 +255,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "• /digest — сводка за последние 7 дней\n"
         "• /metrics — метрики обучения ИИ (5 групп)\n"
         "• /bulk — массовый ревью 100 постов\n"
+        "• /tavily — расход кредитов Tavily за месяц\n"
         "━━━━━━━━━━━━━━━━━━━━"
     )
     await update.message.reply_text(text)
@@ -355,6 +359,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         feedback_id = data.split(":", 1)[1]
         try:
             supabase.table("negative_constraints").delete().eq("id", feedback_id).execute()
+            rebuild_artifact(supabase)
             await query.edit_message_text("Анти-кейс удалён.")
         except Exception as e:
             await query.edit_message_text(f"Ошибка: {e}")
@@ -1156,6 +1161,19 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await update.message.reply_text(f"Ошибка статистики: {e}")
 
+# ────────────────────────────────────────────────
+# /tavily  — расход кредитов Tavily за месяц (таблица tavily_ledger)
+# ────────────────────────────────────────────────
+async def tavily_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_authorized(update.effective_user.id):
+        return
+
+    try:
+        rows = tavily_client.fetch_month_rows(supabase, "created_at, source, query, credits, outcome")
+        await update.message.reply_text(tavily_client.format_usage_report(rows))
+    except Exception as e:
+        await update.message.reply_text(f"Ошибка отчёта Tavily: {e}")
+
 # ────────────────────────────────────────────────
 # /digest  — сводка за последние 7 дней (НОВАЯ КОМАНДА)
 # ────────────────────────────────────────────────
@@ -1316,6 +1334,7 @@ async def add_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         res    = supabase.table("negative_constraints").insert({"feedback": feedback}).execute()
         new_id = res.data[0]["id"]
+        rebuild_artifact(supabase)
         await update.message.reply_text(f"Анти-кейс добавлен (ID: {new_id}):\n{feedback}")
     except Exception as e:
         await update.message.reply_text(f"Ошибка: {e}")
@@ -1401,13 +1420,8 @@ async def _bulk_do_approve(pending_id: str) -> bool:
         if not post:
             return False
         supabase.table("pending_posts").update({"status": "approved"}).eq("id", pending_id).execute()
-        supabase.table("posted_news").insert({
-            "url_text":           post.get("url", pending_id),
-            "title":              post.get("title", ""),
-            "news_type":          "NEWS",
-            "shareability_score": 7,
-            "source_type":        post.get("region", "Kazakhstan"),
-        }).execute()
+        add_to_posted(post.get("url", pending_id), "NEWS", 7, post.get("region", "Kazakhstan"),
+                      title=post.get("title", ""), strict=True)
         await _save_post_metric(
             pending_id=pending_id,
             post_text=post.get("post_text", ""),
@@ -1441,6 +1455,7 @@ async def _bulk_do_reject(pending_id: str, reason: str) -> bool:
             supabase.table("negative_constraints").insert({
                 "feedback": reason_labels[reason]
             }).execute()
+            rebuild_artifact(supabase)
         await _save_post_metric(
             pending_id=pending_id,
             post_text=post.get("post_text", ""),
@@ -1502,6 +1517,7 @@ if __name__ == "__main__":
     app.add_handler(CommandHandler("digest",   digest))
     app.add_handler(CommandHandler("bulk",     bulk_cmd))
     app.add_handler(CommandHandler("metrics",  metrics_cmd))
+    app.add_handler(CommandHandler("tavily",   tavily_cmd))
 
     # Inline button callbacks
     app.add_handler(CallbackQueryHandler(button_handler))
@@ -0,0 +1,241 @@
+"""
+feedback_intents.py — разбор фидбэка фаундера и его скомпилированный артефакт.
+
+Раньше bridge.main на каждом запуске скачивал всю таблицу
+negative_constraints и заново прогонял parse_feedback_intents, хотя
+анти-кейсы меняются только когда их добавляют или удаляют в feedback_bot.
+
+Теперь feedback_bot после каждого изменения (add_negative_constraint,
+текстовый анти-кейс, отклонение bulk-поста, /delete) вызывает
+rebuild_artifact: разобранные intents (запреты, region boosts, stage boost,
+пожелания для промпта) сохраняются в bot_state под ARTIFACT_KEY вместе с
+версией набора анти-кейсов.
+
+Версия — "<число строк>:<последний created_at>" (меняется и при добавлении,
+и при удалении) плюс ARTIFACT_FORMAT, чтобы правка парсера сбрасывала
+старые артефакты. bridge.load_intents проверяет версию одним лёгким
+запросом (count + одна строка) и берёт артефакт из .cache/, затем из
+bot_state; разбор заново — только если версия не совпала ни там, ни там.
+Матчер запретов (relevance.KeywordMatcher) собирается из prohibitions
+артефакта — это одна компиляция regex, в JSON его не кладём.
+
+Разделение фидбэка на два типа:
+  - PROHIBITIONS: что запрещено публиковать (блокирует статьи)
+  - PRIORITIES: что нужно публиковать чаще (буст приоритета кандидатов)
+
+Логика определения:
+  Пожелание = содержит "больше", "чаще", "приоритет", "важнее", "хочу", "нужно больше", "желательно"
+  Запрет = содержит "не нужно", "не публикуй", "без", "убери", "исключи", "не хочу"
+  Остальное = считается запретом (безопаснее)
+
+Только stdlib + local_store. Клиент Supabase передаётся аргументом.
+"""
+
+import json
+from datetime import datetime, timezone
+
+from local_store import load_json, save_json
+
+ARTIFACT_KEY    = "compiled_intents"   # state_key в bot_state
+ARTIFACT_FORMAT = 1                    # поднять при изменении парсера
+INTENTS_FILE    = "compiled_intents.json"
+
+# Слова-маркеры для определения типа фидбэка
+PRIORITY_MARKERS = [
+    "больше", "чаще", "приоритет", "важнее", "хочу видеть", "нужно больше",
+    "желательно", "предпочтительно", "фокус на", "акцент на", "давай больше",
+    "more", "focus on", "prioritize", "prefer",
+]
+
+PROHIBITION_MARKERS = [
+    "не нужно", "не публикуй", "без", "убери", "исключи", "не хочу",
+    "не надо", "избегай", "пропускай", "don't", "no ", "avoid", "skip",
+    "не про", "не о ", "не об ",
+]
+
+# Маппинг ключевых слов фидбэка → регион.
+# Используем корни слов (без окончаний) чтобы ловить все падежи русского языка:
+#   "центральная азия" / "центральной азии" / "центральную азию" → все поймаем по "центральн"+"азии|азия|азию"
+# Ключи — подстроки которые ищем в тексте (достаточно одного совпадения)
+REGION_BOOST_MAP = {
+    # Центральная Азия — все падежные формы через корни
+    "центральн":    "CentralAsia",   # центральная/центральной/центральную азия/азии/азию
+    "central asia": "CentralAsia",
+    "centralasia":  "CentralAsia",
+    # Казахстан — все падежи
+    "казахстан":    "Kazakhstan",    # казахстан/казахстана/казахстане/казахстану
+    "kazakhstan":   "Kazakhstan",
+    # Остальные страны ЦА
+    "узбекистан":   "CentralAsia",
+    "кыргызстан":   "CentralAsia",
+    "таджикистан":  "CentralAsia",
+    "туркменистан": "CentralAsia",
+    "ца ":          "CentralAsia",   # аббревиатура "ЦА"
+    " ца":          "CentralAsia",
+}
+
+STAGE_BOOST_KEYWORDS = [
+    "pre-seed", "preseed", "pre seed", "seed", "ранняя стадия",
+    "early stage", "early-stage", "ангельск", "angel",
+]
+
+
+def parse_feedback_intents(constraints: list) -> dict:
+    """
+    Разбирает список фидбэков на:
+      - prohibitions: список строк для блокировки статей (как раньше)
+      - region_boosts: список регионов которые надо поднять в приоритете
+      - stage_boost: True если нужно искать pre-seed/seed статьи
+      - priority_instructions: список строк для промпта ИИ (пожелания, не запреты)
+
+    Логирует результат в консоль чтобы было видно в GitHub Actions.
+    """
+    prohibitions = []
+    region_boosts = []
+    stage_boost = False
+    priority_instructions = []
+
+    for feedback in constraints:
+        text = feedback.lower().strip()
+
+        # Определяем тип фидбэка
+        is_priority = any(marker in text for marker in PRIORITY_MARKERS)
+        is_prohibition = any(marker in text for marker in PROHIBITION_MARKERS)
+
+        if is_priority and not is_prohibition:
+            # Это пожелание — определяем что именно буститовать
+            priority_instructions.append(feedback)
+
+            # Проверяем регион
+            for keyword, region in REGION_BOOST_MAP.items():
+                if keyword in text:
+                    if region not in region_boosts:
+                        region_boosts.append(region)
+
+            # Проверяем стадию
+            if any(kw in text for kw in STAGE_BOOST_KEYWORDS):
+                stage_boost = True
+
+        else:
+            # Это запрет (или неопределённый фидбэк — считаем запретом)
+            prohibitions.append(feedback)
+
+    # Логируем результат
+    print("=== FEEDBACK INTENT ANALYSIS ===")
+    print(f"  Prohibitions ({len(prohibitions)}): {prohibitions[:5]}")
+    print(f"  Region boosts: {region_boosts}")
+    print(f"  Stage boost (pre-seed/seed): {stage_boost}")
+    print(f"  Priority instructions ({len(priority_instructions)}): {priority_instructions[:3]}")
+    print("=" * 40)
+
+    return {
+        "prohibitions":          prohibitions,
+        "region_boosts":         region_boosts,
+        "stage_boost":           stage_boost,
+        "priority_instructions": priority_instructions,
+    }
+
+
+EMPTY_INTENTS = {
+    "prohibitions":          [],
+    "region_boosts":         [],
+    "stage_boost":           False,
+    "priority_instructions": [],
+}
+
+
+# ────────────────────────────────────────────────
+# АРТЕФАКТ
+# ────────────────────────────────────────────────
+def constraints_version(db) -> str:
+    """Версия набора анти-кейсов: число строк + последний created_at. Ошибки пробрасываются."""
+    res    = db.table("negative_constraints").select("created_at", count="exact") \
+             .order("created_at", desc=True).limit(1).execute()
+    latest = res.data[0]["created_at"] if res.data else ""
+    return f"{ARTIFACT_FORMAT}:{res.count or 0}:{latest}"
+
+
+def fetch_constraints(db) -> list:
+    """Все анти-кейсы строками в нижнем регистре."""
+    res = db.table("negative_constraints").select("feedback, created_at").execute()
+    constraints = [row["feedback"].lower() for row in res.data]
+    if constraints:
+        print(f"=== NEGATIVE CONSTRAINTS LOADED ({len(constraints)}) ===")
+        for i, c in enumerate(constraints):
+            print(f"  [{i+1}] {c}")
+        print("=" * 40)
+    else:
+        print("No negative constraints in database.")
+    return constraints
+
+
+def _read_artifact(db):
+    res = db.table("bot_state").select("state_value").eq("state_key", ARTIFACT_KEY).execute()
+    return json.loads(res.data[0]["state_value"]) if res.data else None
+
+
+def _write_artifact(db, artifact: dict):
+    value    = json.dumps(artifact, ensure_ascii=False)
+    existing = db.table("bot_state").select("id").eq("state_key", ARTIFACT_KEY).execute()
+    if existing.data:
+        db.table("bot_state").update({"state_value": value}).eq("state_key", ARTIFACT_KEY).execute()
+    else:
+        db.table("bot_state").insert({"state_key": ARTIFACT_KEY, "state_value": value}).execute()
+
+
+def rebuild_artifact(db) -> dict:
+    """
+    Разбирает все анти-кейсы и сохраняет артефакт в bot_state и .cache/.
+    Возвращает артефакт или None при ошибке (вызывающий продолжает работу,
+    bridge пересоберёт артефакт сам по несовпадению версии).
+    """
+    try:
+        version  = constraints_version(db)
+        artifact = {
+            "version":  version,
+            "built_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+            "intents":  parse_feedback_intents(fetch_constraints(db)),
+        }
+        _write_artifact(db, artifact)
+        save_json(INTENTS_FILE, artifact)
+        print(f"Intents artifact rebuilt (version {version})")
+        return artifact
+    except Exception as e:
+        print(f"Intents artifact rebuild failed: {e}")
+        return None
+
+
+def load_intents(db) -> dict:
+    """
+    Intents для запуска bridge: локальный артефакт → bot_state → разбор заново.
+    Если Supabase недоступен — последний локальный артефакт или пустые intents.
+    """
+    local = load_json(INTENTS_FILE, None)
+    try:
+        version = constraints_version(db)
+    except Exception as e:
+        print(f"Intents version check failed: {e}")
+        return dict(local["intents"]) if local else dict(EMPTY_INTENTS)
+
+    artifact = local if local and local.get("version") == version else None
+    source   = "local cache"
+    if artifact is None:
+        try:
+            artifact = _read_artifact(db)
+        except Exception as e:
+            print(f"Intents artifact read failed: {e}")
+            artifact = None
+        source = "bot_state"
+        if artifact and artifact.get("version") == version:
+            save_json(INTENTS_FILE, artifact)
+        else:
+            artifact = rebuild_artifact(db)
+            source   = "rebuilt"
+    if artifact is None:
+        return dict(EMPTY_INTENTS)
+
+    intents = artifact["intents"]
+    print(f"Intents artifact {artifact['version']} ({source}): "
+          f"{len(intents['prohibitions'])} prohibitions, region boosts {intents['region_boosts']}, "
+          f"stage boost {intents['stage_boost']}, {len(intents['priority_instructions'])} priority instructions")
+    return dict(intents)
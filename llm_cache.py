@@ -0,0 +1,98 @@
+"""
+llm_cache.py — кэш ответов LLM на диске (.cache/llm_cache.json) для
+классифицирующих вызовов bridge.gemini_generate(cache=True): выбор статьи
+и проверка дублей.
+
+Ключ — хэш (provider, model, prompt, temperature, max_tokens). Запуск,
+повторённый после падения, заново строит те же промпты выбора статьи и
+проверки дублей; с кэшем такие повторы не тратят токены и не ждут сеть.
+
+  LLM_CACHE_TTL_HOURS   — сколько часов ответ считается свежим (0 — кэш выключен)
+  LLM_CACHE_MAX_ENTRIES — максимум записей; лишние вытесняются по LRU
+
+Текст постов (новости, обучающие посты, bulk_seed, check_learning) не
+кэшируется: промпт обучающего поста зависит только от темы, и повторный
+запуск после отклонения получил бы тот же отклонённый текст.
+
+Кэшируются только успешные ответы. Только stdlib + local_store.
+Потокобезопасно.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from local_store import load_json, save_json
+
+LLM_CACHE_FILE        = "llm_cache.json"
+LLM_CACHE_TTL_HOURS   = float(os.getenv("LLM_CACHE_TTL_HOURS", "24"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+
+_cache = None
+_lock  = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "saved_chars": 0}
+
+
+def cache_key(provider: str, model: str, prompt: str, temperature=None, max_tokens=None) -> str:
+    raw = json.dumps([provider, model, temperature, max_tokens, prompt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _get_cache() -> dict:
+    """Загружает кэш один раз за процесс и выкидывает просроченные записи."""
+    global _cache
+    if _cache is None:
+        raw    = load_json(LLM_CACHE_FILE, {})
+        now    = time.time()
+        _cache = {k: v for k, v in raw.items() if now - v["ts"] < LLM_CACHE_TTL_HOURS * 3600}
+    return _cache
+
+
+def _evict(cache: dict):
+    """LRU: оставляем LLM_CACHE_MAX_ENTRIES записей с самым свежим used."""
+    if len(cache) <= LLM_CACHE_MAX_ENTRIES:
+        return
+    by_use = sorted(cache, key=lambda k: cache[k]["used"])
+    for k in by_use[:len(cache) - LLM_CACHE_MAX_ENTRIES]:
+        del cache[k]
+
+
+def get(provider: str, model: str, prompt: str, temperature=None, max_tokens=None):
+    """Свежий ответ из кэша или None."""
+    if LLM_CACHE_TTL_HOURS <= 0:
+        return None
+    key = cache_key(provider, model, prompt, temperature, max_tokens)
+    now = time.time()
+    with _lock:
+        entry = _get_cache().get(key)
+        if entry and now - entry["ts"] < LLM_CACHE_TTL_HOURS * 3600:
+            entry["used"] = now
+            _stats["hits"]        += 1
+            _stats["saved_chars"] += len(prompt)
+            return entry["text"]
+    return None
+
+
+def put(provider: str, model: str, prompt: str, text: str, temperature=None, max_tokens=None):
+    if LLM_CACHE_TTL_HOURS <= 0:
+        return
+    key = cache_key(provider, model, prompt, temperature, max_tokens)
+    now = time.time()
+    with _lock:
+        cache = _get_cache()
+        cache[key] = {"text": text, "ts": now, "used": now, "provider": provider}
+        _evict(cache)
+        _stats["misses"] += 1
+
+
+def save_cache():
+    """Сохраняет кэш на диск. Вызывается в конце запуска."""
+    with _lock:
+        if _cache is None:
+            return
+        save_json(LLM_CACHE_FILE, _cache)
+    if _stats["hits"] or _stats["misses"]:
+        print(f"LLM cache: {_stats['hits']} hits (~{_stats['saved_chars'] // 4} prompt tokens saved), "
+              f"{_stats['misses']} misses, {len(_cache)} entries stored")
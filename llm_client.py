@@ -0,0 +1,121 @@
+"""
+llm_client.py — асинхронный слой LLM: Gemini основной, Groq запасной.
+
+pick_best_with_gemini, screen_duplicates_batch и is_semantic_duplicate
+объявлены async, но вызывали блокирующий gemini_generate — каждый LLM-вызов
+останавливал event loop, и ничего не могло идти параллельно. Здесь оба
+бэкенда вызываются через их нативные async-клиенты
+(GenerativeModel.generate_content_async, groq.AsyncGroq):
+
+  LLM_CONCURRENCY_GEMINI / LLM_CONCURRENCY_GROQ — семафор на провайдера:
+                          не больше стольких одновременных запросов
+  LLM_TIMEOUT           — секунд на один запрос; по таймауту запрос
+                          отменяется (asyncio.wait_for) и пробуется
+                          следующий провайдер
+
+Отмена задачи вызывающим (task.cancel()) отменяет и HTTP-запрос
+провайдера — CancelledError не превращается в fallback.
+
+Перед каждым запросом — очередь llm_scheduler (RPM/TPM, лимиты из
+заголовков, повтор после 429); таймаут считается только на сам запрос,
+не на ожидание в очереди.
+
+cache=True — ответ берётся из llm_cache и кладётся в него (только для
+детерминированных классификаций; текст постов не кэшируется).
+
+Провайдеры регистрируются скриптом при старте (configure_gemini /
+configure_groq) — модуль сам клиентов не создаёт и ключей не читает.
+"""
+
+import os
+import asyncio
+
+import llm_cache
+import llm_scheduler
+
+LLM_TIMEOUT     = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CONCURRENCY = {
+    "gemini": int(os.getenv("LLM_CONCURRENCY_GEMINI", "4")),
+    "groq":   int(os.getenv("LLM_CONCURRENCY_GROQ", "2")),
+}
+PROVIDER_ORDER  = ("gemini", "groq")
+
+_providers  = {}   # имя → {"model", "temperature", "max_tokens", "call": async (prompt) -> (text, headers)}
+_semaphores = {}   # (имя, id event loop) → asyncio.Semaphore
+
+
+def configure_gemini(model, model_name: str):
+    """model — google.generativeai.GenerativeModel."""
+    async def call(prompt: str) -> str:
+        resp = await model.generate_content_async(prompt)
+        return resp.text.strip(), None
+    _providers["gemini"] = {"model": model_name, "temperature": None, "max_tokens": None, "call": call}
+
+
+def configure_groq(client, model_name: str, temperature: float = 0.7, max_tokens: int = 1024):
+    """client — groq.AsyncGroq."""
+    async def call(prompt: str) -> tuple:
+        # with_raw_response — ради заголовков x-ratelimit-* для llm_scheduler
+        raw = await client.chat.completions.with_raw_response.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        return raw.parse().choices[0].message.content.strip(), raw.headers
+    _providers["groq"] = {"model": model_name, "temperature": temperature,
+                          "max_tokens": max_tokens, "call": call}
+
+
+def groq_request(client, model_name: str, prompt: str, max_tokens: int, temperature: float) -> tuple:
+    """Синхронный запрос к groq.Groq → (text, headers) для llm_scheduler.run."""
+    raw = client.chat.completions.with_raw_response.create(
+        model=model_name,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=max_tokens,
+        temperature=temperature,
+    )
+    return raw.parse().choices[0].message.content.strip(), raw.headers
+
+
+def available() -> list:
+    return [name for name in PROVIDER_ORDER if name in _providers]
+
+
+def _semaphore(name: str) -> asyncio.Semaphore:
+    # Семафор привязан к event loop: bulk_seed и тесты могут звать asyncio.run несколько раз
+    key = (name, id(asyncio.get_running_loop()))
+    if key not in _semaphores:
+        _semaphores[key] = asyncio.Semaphore(LLM_CONCURRENCY.get(name, 2))
+    return _semaphores[key]
+
+
+async def _call(name: str, prompt: str, cache: bool, timeout: float) -> str:
+    p = _providers[name]
+    if cache:
+        text = llm_cache.get(name, p["model"], prompt, p["temperature"], p["max_tokens"])
+        if text is not None:
+            return text
+    async def call():
+        async with _semaphore(name):
+            return await asyncio.wait_for(p["call"](prompt), timeout)
+    tokens = llm_scheduler.estimate_tokens(prompt, p["max_tokens"])
+    text   = await llm_scheduler.run_async(name, call, tokens)
+    if cache:
+        llm_cache.put(name, p["model"], prompt, text, p["temperature"], p["max_tokens"])
+    return text
+
+
+async def generate(prompt: str, cache: bool = False, timeout: float = None) -> str:
+    """Ответ первого провайдера, который справился. Все упали — последняя ошибка."""
+    error = None
+    for name in available():
+        try:
+            return await _call(name, prompt, cache, timeout or LLM_TIMEOUT)
+        except asyncio.TimeoutError:
+            error = TimeoutError(f"{name}: no response in {timeout or LLM_TIMEOUT:.0f}s")
+            print(f"LLM {name} timeout — trying next provider")
+        except Exception as e:
+            error = e
+            print(f"LLM {name} error — trying next provider: {str(e)[:200]}")
+    raise error or RuntimeError("Нет доступного LLM генератора")
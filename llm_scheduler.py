@@ -0,0 +1,264 @@
+"""
+llm_scheduler.py — общий планировщик LLM-запросов с учётом rate limit.
+
+Раньше каждый скрипт обходил лимиты по-своему: bulk_seed парсил регуляркой
+"try again in Nm" из текста 429 и спал минуты (плюс 3s каждые 10 постов
+наугад), bridge просто пробрасывал 429. Здесь — один token bucket на
+провайдера для запросов и токенов в минуту:
+
+  - перед запросом вызывающий резервирует 1 запрос и оценку токенов
+    (промпт + max_tokens); если ведро пустое — ждёт ровно столько, сколько
+    нужно до пополнения. Резерв уходит в минус, поэтому параллельные
+    вызовы выстраиваются в очередь и идут с нужным темпом, а не пачкой.
+  - лимиты уточняются по ответам: заголовки x-ratelimit-{limit,remaining,
+    reset}-{requests,tokens} (Groq) задают ёмкость, текущий остаток и
+    скорость пополнения; окно до ~минуты заменяет стартовые RPM/TPM,
+    более длинное (дневной лимит запросов у Groq) — отдельное ведро.
+  - 429: задержка из retry-after или тела ошибки ("try again in 7.66s",
+    retry_delay у Gemini), провайдер блокируется на это время, запрос
+    повторяется. Задержка неизвестна — экспоненциальный backoff.
+  - ожидание дольше LLM_MAX_WAIT не делаем: ошибка сразу, чтобы
+    вызывающий перешёл на другой провайдер.
+
+  LLM_RPM_GEMINI / LLM_TPM_GEMINI, LLM_RPM_GROQ / LLM_TPM_GROQ — стартовые
+                        лимиты до первого ответа с заголовками
+  LLM_MAX_WAIT        — максимум секунд ожидания одного запроса
+  LLM_RATE_RETRIES    — сколько раз повторять запрос после 429
+
+Gemini SDK заголовков не отдаёт — для него работают стартовые лимиты и
+задержка из 429. Только stdlib. Потокобезопасно; есть sync (run) и
+async (run_async) варианты.
+"""
+
+import os
+import re
+import time
+import asyncio
+import threading
+
+LLM_MAX_WAIT     = float(os.getenv("LLM_MAX_WAIT", "300"))
+LLM_RATE_RETRIES = int(os.getenv("LLM_RATE_RETRIES", "3"))
+DEFAULT_LIMITS   = {
+    # провайдер → (запросов в минуту, токенов в минуту)
+    "gemini": (int(os.getenv("LLM_RPM_GEMINI", "15")), int(os.getenv("LLM_TPM_GEMINI", "1000000"))),
+    "groq":   (int(os.getenv("LLM_RPM_GROQ", "30")),   int(os.getenv("LLM_TPM_GROQ", "30000"))),
+}
+MINUTE_WINDOW    = 90     # окно из заголовков короче — это поминутный лимит
+BACKOFF_BASE     = 5.0    # 429 без задержки в ответе: 5s, 10s, 20s…
+
+_lock  = threading.Lock()
+_state = {}   # провайдер → {"buckets": {имя: bucket}, "blocked_until": monotonic}
+
+_DURATION_RE  = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_RETRY_BODY_RE = (
+    re.compile(r"try again in ((?:\d+(?:\.\d+)?(?:ms|h|m|s))+)", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)"),
+    re.compile(r'"retryDelay"\s*:\s*"(\d+(?:\.\d+)?s)"'),
+)
+
+
+# ────────────────────────────────────────────────
+# РАЗБОР ЛИМИТОВ
+# ────────────────────────────────────────────────
+def parse_duration(value):
+    """'7.66s', '2m59.56s', '150ms', '30' → секунды; непонятное — None."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(text)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(n) * scale[unit] for n, unit in parts)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _headers(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None)
+
+
+def is_rate_limited(error) -> bool:
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status == 429:
+        return True
+    text = str(error).lower()
+    return any(m in text for m in ("429", "rate_limit", "rate limit", "resource_exhausted", "resource exhausted"))
+
+
+def retry_delay(error):
+    """Сколько ждать после 429: retry-after или текст ошибки. Неизвестно — None."""
+    headers = _headers(error)
+    if headers:
+        delay = parse_duration(headers.get("retry-after"))
+        if delay is not None:
+            return delay
+    text = str(error)
+    for rx in _RETRY_BODY_RE:
+        m = rx.search(text)
+        if m:
+            return parse_duration(m.group(1))
+    return None
+
+
+# ────────────────────────────────────────────────
+# TOKEN BUCKETS
+# ────────────────────────────────────────────────
+def _bucket(capacity: float, per_seconds: float) -> dict:
+    return {"capacity": capacity, "rate": capacity / per_seconds,
+            "level": capacity, "ts": time.monotonic()}
+
+
+def _get_state(provider: str) -> dict:
+    if provider not in _state:
+        rpm, tpm = DEFAULT_LIMITS.get(provider, (30, 30000))
+        _state[provider] = {
+            "buckets": {"rpm": _bucket(rpm, 60), "tpm": _bucket(tpm, 60)},
+            "blocked_until": 0.0,
+        }
+    return _state[provider]
+
+
+def _refill(b: dict, now: float):
+    b["level"] = min(b["capacity"], b["level"] + (now - b["ts"]) * b["rate"])
+    b["ts"]    = now
+
+
+def _cost(name: str, tokens: int) -> float:
+    return 1 if name in ("rpm", "rpd") else tokens
+
+
+def configure(provider: str, rpm: int = None, tpm: int = None):
+    """Задать поминутные лимиты вручную (например, для другой модели)."""
+    with _lock:
+        st = _get_state(provider)
+        if rpm:
+            st["buckets"]["rpm"] = _bucket(rpm, 60)
+        if tpm:
+            st["buckets"]["tpm"] = _bucket(tpm, 60)
+
+
+def estimate_tokens(prompt: str, max_tokens: int = None) -> int:
+    """Грубая оценка: ~3 символа на токен (кириллица) + резерв на ответ."""
+    return len(prompt) // 3 + (max_tokens or 512)
+
+
+def reserve(provider: str, tokens: int, max_wait: float = None) -> float:
+    """
+    Резервирует запрос и токены. Возвращает, сколько секунд подождать перед
+    отправкой. Если ждать дольше max_wait — резерв снимается, RuntimeError.
+    """
+    max_wait = LLM_MAX_WAIT if max_wait is None else max_wait
+    with _lock:
+        st   = _get_state(provider)
+        now  = time.monotonic()
+        wait = max(0.0, st["blocked_until"] - now)
+        taken = []
+        for name, b in st["buckets"].items():
+            _refill(b, now)
+            # Оценка больше ёмкости — берём всю ёмкость, иначе ждать вечно
+            cost = min(_cost(name, tokens), b["capacity"])
+            b["level"] -= cost
+            taken.append((b, cost))
+            if b["level"] < 0:
+                wait = max(wait, -b["level"] / b["rate"])
+        if wait > max_wait:
+            for b, cost in taken:
+                b["level"] += cost
+            raise RuntimeError(f"{provider}: rate limit, нужно ждать {wait:.0f}s (> LLM_MAX_WAIT={max_wait:.0f}s)")
+    return wait
+
+
+def observe(provider: str, headers):
+    """Уточняет вёдра по заголовкам x-ratelimit-* ответа."""
+    if not headers:
+        return
+    with _lock:
+        st  = _get_state(provider)
+        now = time.monotonic()
+        for unit, minute_name, long_name in (("requests", "rpm", "rpd"), ("tokens", "tpm", "tpd")):
+            limit     = _number(headers.get(f"x-ratelimit-limit-{unit}"))
+            remaining = _number(headers.get(f"x-ratelimit-remaining-{unit}"))
+            reset     = parse_duration(headers.get(f"x-ratelimit-reset-{unit}"))
+            if not limit or remaining is None:
+                continue
+            # Остаток восстанавливается до limit за reset секунд — отсюда скорость.
+            # Ведро полное — окно неизвестно, и поминутный это лимит или дневной, не понять
+            if not reset or remaining >= limit:
+                continue
+            rate = (limit - remaining) / reset
+            name = minute_name if limit / rate <= MINUTE_WINDOW else long_name
+            b    = st["buckets"].get(name)
+            if b is None:
+                b = st["buckets"][name] = {"capacity": limit, "rate": rate, "level": limit, "ts": now}
+            _refill(b, now)
+            b["capacity"] = limit
+            b["rate"]     = rate
+            # Резервы ещё не ответивших запросов уже вычтены — не откатываем их
+            b["level"] = min(b["level"], remaining)
+
+
+def penalize(provider: str, error, attempt: int) -> float:
+    """429: блокирует провайдера до конца задержки. Возвращает задержку."""
+    observe(provider, _headers(error))
+    delay = retry_delay(error)
+    if delay is None:
+        delay = BACKOFF_BASE * (2 ** attempt)
+    with _lock:
+        st = _get_state(provider)
+        st["blocked_until"] = max(st["blocked_until"], time.monotonic() + delay)
+    return delay
+
+
+# ────────────────────────────────────────────────
+# ВЫПОЛНЕНИЕ
+# call() возвращает (text, headers); headers — None, если SDK их не отдаёт.
+# ────────────────────────────────────────────────
+def _retry_or_raise(provider: str, error, attempt: int, retries: int, max_wait: float):
+    if not is_rate_limited(error) or attempt >= retries:
+        raise error
+    delay = penalize(provider, error, attempt)
+    if delay > (LLM_MAX_WAIT if max_wait is None else max_wait):
+        raise error
+    print(f"{provider} rate limit — повтор через {delay:.1f}s (попытка {attempt + 2})")
+
+
+def run(provider: str, call, tokens: int, retries: int = None, max_wait: float = None) -> str:
+    retries = LLM_RATE_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        wait = reserve(provider, tokens, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            text, headers = call()
+        except Exception as e:
+            _retry_or_raise(provider, e, attempt, retries, max_wait)
+            continue
+        observe(provider, headers)
+        return text
+
+
+async def run_async(provider: str, call, tokens: int, retries: int = None, max_wait: float = None) -> str:
+    """То же, что run, но call — корутинная функция, ожидание не блокирует event loop."""
+    retries = LLM_RATE_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        wait = reserve(provider, tokens, max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            text, headers = await call()
+        except Exception as e:
+            _retry_or_raise(provider, e, attempt, retries, max_wait)
+            continue
+        observe(provider, headers)
+        return text
@@ -0,0 +1,51 @@
+"""
+local_store.py — локальное хранилище состояния между запусками (JSON-файлы).
+
+Файлы лежат в BOT_CACHE_DIR (по умолчанию .cache/ в корне репозитория).
+В GitHub Actions каталог переносится между запусками через actions/cache
+(см. .github/workflows/main.yml). Если кэша нет — модули работают как при
+первом запуске: load_json возвращает default.
+
+Только stdlib — модуль можно импортировать из bridge.py, bulk_seed.py и feedback_bot.py.
+"""
+
+import os
+import json
+import tempfile
+
+CACHE_DIR = os.getenv("BOT_CACHE_DIR", ".cache")
+
+
+def cache_path(name: str) -> str:
+    """Полный путь к файлу в CACHE_DIR (каталог создаётся при необходимости)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+
+def load_json(name: str, default=None):
+    """Читает JSON из CACHE_DIR. При отсутствии или порче файла — default."""
+    try:
+        with open(os.path.join(CACHE_DIR, name), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except Exception as e:
+        print(f"local_store: failed to read {name} (starting fresh): {e}")
+        return default
+
+
+def save_json(name: str, data) -> bool:
+    """
+    Атомарно записывает JSON в CACHE_DIR (через временный файл + os.replace),
+    чтобы прерванный запуск не оставил битый файл.
+    """
+    try:
+        path = cache_path(name)
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, prefix=f".{name}.", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        return True
+    except Exception as e:
+        print(f"local_store: failed to write {name}: {e}")
+        return False
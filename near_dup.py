@@ -0,0 +1,311 @@
+"""
+near_dup.py — локальный индекс почти-дублей по всей истории постов.
+
+is_semantic_duplicate в bridge.py раньше отправлял LLM промпт на каждого
+кандидата, и видел только 30 последних заголовков. Здесь каждый документ
+истории (posted_news + pending/rejected из pending_posts) хранится как
+MinHash-подпись символьных 4-грамм нормализованного заголовка и набор
+«якорей» — имён собственных и сумм ($5M, 5 млн → 5m).
+
+Решение по кандидату (check):
+  duplicate — сходство >= high с документом, с которым есть общее имя
+              компании, а в заголовках нет расходящихся имён или сумм
+              (перепечатка той же новости; «Alem raises $10M» и «Beta
+              raises $10M» похожи, но это разные истории — решает LLM)
+  new       — сходство < low со всей историей И ни одного общего якоря
+              с документами за recent_days (та же новость на другом языке
+              почти всегда делит имя компании или сумму)
+  ambiguous — всё остальное; решает LLM, получая ближайших соседей
+
+Кириллица транслитерируется перед шинглами и якорями, поэтому
+«Казахстан» и «Kazakhstan» дают общие 4-граммы.
+
+Индекс лежит в .cache/near_dup_index.json и синхронизируется
+инкрементально по created_at (как снимок URL в dedup.py). Статусы
+pending-документов обновляются одним запросом за запуск: отклонённые
+остаются в индексе, одобренные/истёкшие удаляются (одобренные придут из
+posted_news).
+
+Только stdlib + local_store. Клиент Supabase передаётся аргументом.
+"""
+
+import re
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from local_store import load_json, save_json
+
+NEAR_DUP_FILE    = "near_dup_index.json"
+NEAR_DUP_VERSION = 2   # 2 — расширен список общих слов в якорях
+NUM_PERM         = 128
+SHINGLE_SIZE     = 4
+SYNC_OVERLAP_MIN = 15
+SYNC_PAGE        = 1000
+
+_MERSENNE = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Параметры перестановок фиксированы — подписи из кэша совместимы между запусками
+_PERMS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "little") % (_MERSENNE - 1) + 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "little") % _MERSENNE)
+    for i in range(NUM_PERM)
+]
+
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya", "қ": "k", "ғ": "g", "ү": "u", "ұ": "u", "ө": "o", "ә": "a", "і": "i",
+    "ң": "n", "һ": "h",
+})
+
+_STOPWORDS = {
+    "the", "a", "an", "of", "in", "on", "for", "to", "and", "with", "by", "from", "at",
+    "as", "is", "are", "its", "it", "this", "that", "new",
+    "в", "на", "и", "с", "по", "из", "для", "о", "от", "к", "что", "как", "за",
+}
+
+# Слова с заглавной буквы, которые не отличают одну новость от другой
+_GENERIC_ANCHORS = {
+    "startup", "startups", "стартап", "стартапы", "series", "seed", "pre", "round", "fund",
+    "funding", "ventures", "venture", "capital", "ai", "ии", "vc", "ipo", "ceo", "the",
+    "kazakhstan", "kazakh", "казахстан", "казахстанский", "uzbekistan", "uzbek",
+    "узбекистан", "kyrgyzstan", "кыргызстан", "central", "asia", "центральная", "азия",
+    "astana", "астана", "almaty", "алматы", "tashkent", "ташкент", "world", "global",
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december", "new", "how", "why", "what",
+    "hub", "accelerator", "incubator", "fintech", "edtech", "tech", "launches", "launch",
+    "raises", "secures", "closes", "for", "and", "with", "from",
+}
+
+_WORD_RE   = re.compile(r"[^\w\s$%€]")
+_NAME_RE   = re.compile(r"\b[A-ZА-ЯЁ][\w\-]{2,}")
+_AMOUNT_RE = re.compile(
+    r"[$€£]?\s*(\d+(?:[.,]\d+)?)\s*"
+    r"(млрд|billion|bn|b|млн|million|mln|m|тыс|thousand|k)\b",
+    re.IGNORECASE,
+)
+_UNIT = {"млрд": "b", "billion": "b", "bn": "b", "b": "b",
+         "млн": "m", "million": "m", "mln": "m", "m": "m",
+         "тыс": "k", "thousand": "k", "k": "k"}
+
+
+def normalize(text: str) -> str:
+    text  = _WORD_RE.sub(" ", (text or "").lower())
+    words = [w for w in text.split() if w not in _STOPWORDS]
+    return " ".join(words).translate(_TRANSLIT)
+
+
+def anchors(text: str) -> set:
+    """Имена собственные и суммы — то, что отличает одну новость от другой."""
+    text  = text or ""
+    found = set()
+    for name in _NAME_RE.findall(text):
+        key = name.lower()
+        if key not in _GENERIC_ANCHORS:
+            found.add(key.translate(_TRANSLIT))
+    for value, unit in _AMOUNT_RE.findall(text):
+        found.add(f"{value.replace(',', '.')}{_UNIT[unit.lower()]}")
+    return found
+
+
+def _names(anchor_set: set) -> set:
+    return {x for x in anchor_set if not x[0].isdigit()}
+
+
+def conflicting(title_a: str, title_b: str) -> bool:
+    """
+    Заголовки называют разные компании или разные суммы: у одного есть имя,
+    которого нет у другого, или суммы есть в обоих и не совпадают.
+    """
+    anch_a, anch_b = anchors(title_a), anchors(title_b)
+    amounts_a, amounts_b = anch_a - _names(anch_a), anch_b - _names(anch_b)
+    if amounts_a and amounts_b and amounts_a != amounts_b:
+        return True
+    return _names(anch_a) != _names(anch_b)
+
+
+def _shingles(text: str) -> set:
+    text = normalize(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> list:
+    """MinHash-подпись из NUM_PERM 32-битных значений."""
+    base = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+            for s in _shingles(text)]
+    if not base:
+        return [_MAX_HASH] * NUM_PERM
+    return [min(((a * h + b) % _MERSENNE) & _MAX_HASH for h in base) for a, b in _PERMS]
+
+
+def similarity(sig_a: list, sig_b: list) -> float:
+    """Оценка сходства Жаккара по двум подписям."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+# ────────────────────────────────────────────────
+# ИНДЕКС
+# ────────────────────────────────────────────────
+_index = None
+
+
+def _empty_index() -> dict:
+    return {"version": NEAR_DUP_VERSION, "cursors": {}, "docs": {}}
+
+
+def _doc(title: str, extra: str, kind: str, created_at: str) -> dict:
+    return {
+        "title":   title[:200],
+        "kind":    kind,
+        "ts":      (created_at or "")[:19],
+        "sig":     minhash(title),
+        "anchors": sorted(anchors(f"{title} {extra or ''}"[:600])),
+    }
+
+
+def _fetch_since(db, table: str, columns: str, since: str, apply_filter) -> list:
+    rows, start = [], 0
+    while True:
+        q = apply_filter(db.table(table).select(columns))
+        if since:
+            q = q.gte("created_at", since)
+        page = q.order("created_at").range(start, start + SYNC_PAGE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < SYNC_PAGE:
+            return rows
+        start += SYNC_PAGE
+
+
+def sync_index(db) -> dict:
+    """
+    Загружает индекс с диска и догружает новые строки. Возвращает индекс.
+    Ошибки Supabase пробрасываются — без синхронизации решает LLM.
+    """
+    global _index
+    index = load_json(NEAR_DUP_FILE, None)
+    if not index or index.get("version") != NEAR_DUP_VERSION:
+        index = _empty_index()
+    docs    = index["docs"]
+    started = datetime.now(timezone.utc)
+    added   = 0
+
+    posted = _fetch_since(
+        db, "posted_news", "id, title, created_at", index["cursors"].get("posted_news"),
+        lambda q: q.in_("news_type", ["NEWS", "НОВОСТЬ"]),
+    )
+    for row in posted:
+        key = f"posted:{row['id']}"
+        if row.get("title") and key not in docs:
+            docs[key] = _doc(row["title"], "", "posted", row.get("created_at"))
+            added += 1
+
+    pending = _fetch_since(
+        db, "pending_posts", "id, title, post_text, status, created_at",
+        index["cursors"].get("pending_posts"),
+        lambda q: q.in_("status", ["pending", "rejected"]),
+    )
+    for row in pending:
+        key = f"pending:{row['id']}"
+        if row.get("title") and key not in docs:
+            docs[key] = _doc(row["title"], row.get("post_text", ""), row["status"], row.get("created_at"))
+            added += 1
+
+    # pending → rejected остаётся, одобренные / истёкшие — удаляем
+    open_ids = [k.split(":", 1)[1] for k, d in docs.items() if d["kind"] == "pending"]
+    for i in range(0, len(open_ids), 80):
+        chunk  = open_ids[i:i + 80]
+        status = {r["id"]: r["status"] for r in
+                  db.table("pending_posts").select("id, status").in_("id", chunk).execute().data or []}
+        for pid in chunk:
+            st = status.get(pid)
+            if st == "rejected":
+                docs[f"pending:{pid}"]["kind"] = "rejected"
+            elif st != "pending":
+                docs.pop(f"pending:{pid}", None)
+
+    cursor = (started - timedelta(minutes=SYNC_OVERLAP_MIN)).strftime("%Y-%m-%dT%H:%M:%S")
+    index["cursors"] = {"posted_news": cursor, "pending_posts": cursor}
+    save_json(NEAR_DUP_FILE, index)
+    _index = index
+    print(f"Near-dup index: {len(docs)} documents (+{added})")
+    return index
+
+
+def check(title: str, text: str = "", high: float = 0.6, low: float = 0.2,
+          recent_days: int = 30, top_k: int = 8) -> tuple:
+    """
+    Возвращает (verdict, neighbours):
+      verdict    — "duplicate" | "new" | "ambiguous" (индекс не загружен → ambiguous)
+      neighbours — до top_k ближайших документов [(similarity, title, kind)]
+    """
+    if _index is None:
+        return "ambiguous", []
+    sig        = minhash(title)
+    cand_anch  = anchors(f"{title} {text or ''}"[:600])
+    recent_ts  = (datetime.now(timezone.utc) - timedelta(days=recent_days)).strftime("%Y-%m-%dT%H:%M:%S")
+    scored     = []
+    anchor_hit = False
+    for doc in _index["docs"].values():
+        sim    = similarity(sig, doc["sig"])
+        shared = cand_anch.intersection(doc["anchors"])
+        # Локально — только при общем имени компании и без расхождений; иначе LLM
+        if sim >= high and _names(shared) and not conflicting(title, doc["title"]):
+            return "duplicate", [(sim, doc["title"], doc["kind"])]
+        if shared and doc["ts"] >= recent_ts:
+            anchor_hit = True
+        scored.append((sim, doc["title"], doc["kind"]))
+    scored.sort(key=lambda s: s[0], reverse=True)
+    neighbours = scored[:top_k]
+    best       = neighbours[0][0] if neighbours else 0.0
+    if best < low and not anchor_hit:
+        return "new", neighbours
+    return "ambiguous", neighbours
+
+
+# ────────────────────────────────────────────────
+# КЛАСТЕРЫ КАНДИДАТОВ
+# ────────────────────────────────────────────────
+def _same_story(a: dict, b: dict, sim_threshold: float, high: float) -> bool:
+    """
+    Одна история: суммы не противоречат друг другу, есть общее имя компании
+    И (общая сумма или сходство >= sim_threshold). Очень похожие заголовки
+    (>= high) — тоже только при общем имени и без расходящихся имён/сумм.
+    «X raises $10M Series A» и «Y raises $10M Series A» — разные истории.
+    """
+    amounts_a = {x for x in a["anchors"] if x[0].isdigit()}
+    amounts_b = {x for x in b["anchors"] if x[0].isdigit()}
+    if amounts_a and amounts_b and not amounts_a & amounts_b:
+        return False
+    sim    = similarity(a["sig"], b["sig"])
+    shared = a["anchors"] & b["anchors"]
+    names  = _names(shared)
+    if not names:
+        return False
+    if sim >= high:
+        return not conflicting(a["title"], b["title"])
+    return len(shared) > len(names) or sim >= sim_threshold
+
+
+def cluster(candidates: list, sim_threshold: float = 0.35, high: float = 0.6) -> list:
+    """
+    Группирует кандидатов (dict с title и snippet) по событиям.
+    Возвращает список кластеров — списков кандидатов; порядок кластеров
+    и порядок внутри кластера совпадают с порядком входного списка.
+    """
+    feats    = [{"title": c["title"], "sig": minhash(c["title"]),
+                 "anchors": anchors(f"{c['title']} {c.get('snippet', '')}"[:600])}
+                for c in candidates]
+    clusters = []   # [(индексы членов)]
+    for i, f in enumerate(feats):
+        for members in clusters:
+            if any(_same_story(f, feats[j], sim_threshold, high) for j in members):
+                members.append(i)
+                break
+        else:
+            clusters.append([i])
+    return [[candidates[j] for j in members] for members in clusters]
@@ -0,0 +1,316 @@
+"""
+preranker.py — локальная модель «одобрит / отклонит» для пре-ранжирования кандидатов.
+
+pick_best_with_gemini получает до десяти кандидатов, упорядоченных только
+грубым priority, и часть LLM-вызовов уходит на статьи, которые фаундер
+очевидно отклонит. Здесь на истории pending_posts (approved / bulk_approved
+против rejected) обучается TF-IDF + логистическая регрессия:
+
+  признаки — униграммы и биграммы нормализованного текста (near_dup.normalize:
+             нижний регистр, без стоп-слов, кириллица транслитерирована),
+             хэшированные в DIM корзин; tf = 1 + log(count), idf по корпусу,
+             L2-нормировка
+  модель   — логистическая регрессия, полный градиентный спуск на NumPy
+             (разреженное умножение через bincount), веса классов выровнены
+
+Текст документа — title + начало сниппета исходной статьи, одинаково при
+обучении (pending_posts.source_snippet) и на инференсе (snippet кандидата).
+Сгенерированный русский post_text в признаки не идёт: на инференсе его ещё
+нет. У строк, сохранённых до появления source_snippet, есть только title.
+
+Дообучение инкрементальное: корпус лежит в .cache/preranker.json и
+догружается по created_at (как near_dup); решения по ещё открытым pending
+проверяются одним запросом за запуск. Модель переобучается только когда
+появились новые метки, стартуя с прежних весов.
+
+evaluate() — офлайн-оценка на последних по времени HOLDOUT_SHARE документах
+(модель обучена на более ранних): precision/recall отсечения и сколько
+одобренных потерялось бы. Сэкономленные LLM-вызовы считаются в bridge.py
+по реальным запускам (prerank_candidates).
+
+Только stdlib + local_store + near_dup; без NumPy модель не обучается и
+score() возвращает None.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from local_store import load_json, save_json
+from near_dup import normalize
+from dedup import missing_column
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+PRERANK_FILE     = "preranker.json"
+PRERANK_VERSION  = 2   # 2 — признаки по source_snippet вместо post_text
+DIM              = 1 << 16
+SNIPPET_CHARS    = 400     # сколько символов сниппета идёт в текст документа
+MIN_PER_CLASS    = 15      # меньше примеров любого класса — модель не используется
+HOLDOUT_SHARE    = 0.2
+L2               = 1e-3
+LEARNING_RATE    = 2.0
+EPOCHS_FULL      = 300
+EPOCHS_WARM      = 80
+SYNC_OVERLAP_MIN = 15
+SYNC_PAGE        = 1000
+
+POSITIVE = ("approved", "bulk_approved")
+NEGATIVE = ("rejected",)
+OPEN     = ("pending", "bulk_pending")
+
+_state = None   # {"version", "cursor", "docs", "open", "model"}
+_model = None   # {"w": ndarray, "b": float, "idf": ndarray}
+
+
+# ────────────────────────────────────────────────
+# ПРИЗНАКИ
+# ────────────────────────────────────────────────
+def doc_text(title: str, snippet: str = None) -> str:
+    """Текст документа — один и тот же для обучения и инференса."""
+    return f"{title or ''} {(snippet or '')[:SNIPPET_CHARS]}"
+
+
+def _token_ids(text: str) -> dict:
+    """{индекс корзины: count} по униграммам и биграммам."""
+    words  = normalize(text).split()
+    tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    counts = {}
+    for tok in tokens:
+        idx = int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest(), "little") % DIM
+        counts[idx] = counts.get(idx, 0) + 1
+    return counts
+
+
+def _idf(docs: list) -> "np.ndarray":
+    df = np.zeros(DIM, dtype=np.float64)
+    for d in docs:
+        df[np.fromiter((int(i) for i in d["f"]), dtype=np.int64)] += 1
+    return np.log((1 + len(docs)) / (1 + df)) + 1
+
+
+def _matrix(feature_dicts: list, idf) -> tuple:
+    """Разреженная матрица в CSR-виде: (indices, values, row_of_value, n_rows)."""
+    indices, values, rows = [], [], []
+    for r, feats in enumerate(feature_dicts):
+        if not feats:
+            continue
+        idx = np.fromiter((int(i) for i in feats), dtype=np.int64, count=len(feats))
+        tf  = 1 + np.log(np.fromiter(feats.values(), dtype=np.float64, count=len(feats)))
+        val = tf * idf[idx]
+        val /= np.linalg.norm(val) or 1.0
+        indices.append(idx)
+        values.append(val)
+        rows.append(np.full(len(idx), r, dtype=np.int64))
+    if not indices:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, np.zeros(0), empty, len(feature_dicts)
+    return np.concatenate(indices), np.concatenate(values), np.concatenate(rows), len(feature_dicts)
+
+
+def _logits(X: tuple, w, b: float):
+    idx, val, rows, n = X
+    return np.bincount(rows, weights=val * w[idx], minlength=n) + b
+
+
+def _sigmoid(z):
+    return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+
+# ────────────────────────────────────────────────
+# ОБУЧЕНИЕ И ОЦЕНКА
+# ────────────────────────────────────────────────
+def train(docs: list, warm: dict = None) -> dict:
+    """Логистическая регрессия на документах корпуса; warm — прежняя модель для старта."""
+    idf  = _idf(docs)
+    X    = _matrix([d["f"] for d in docs], idf)
+    y    = np.array([d["y"] for d in docs], dtype=np.float64)
+    pos  = max(y.sum(), 1)
+    neg  = max(len(y) - y.sum(), 1)
+    cw   = np.where(y == 1, len(y) / (2 * pos), len(y) / (2 * neg))   # выровненные веса классов
+    w    = warm["w"].copy() if warm else np.zeros(DIM)
+    b    = warm["b"] if warm else 0.0
+    idx, val, rows, n = X
+    for _ in range(EPOCHS_WARM if warm else EPOCHS_FULL):
+        err  = (_sigmoid(_logits(X, w, b)) - y) * cw / n
+        grad = np.bincount(idx, weights=val * err[rows], minlength=DIM) + L2 * w
+        w   -= LEARNING_RATE * grad
+        b   -= LEARNING_RATE * err.sum()
+    return {"w": w, "b": float(b), "idf": idf}
+
+
+def predict(model: dict, texts: list) -> list:
+    """Вероятность одобрения для каждого текста."""
+    X = _matrix([_token_ids(t) for t in texts], model["idf"])
+    return _sigmoid(_logits(X, model["w"], model["b"])).tolist()
+
+
+def evaluate(docs: list = None, threshold: float = 0.15) -> dict:
+    """
+    Офлайн-оценка на временном разбиении: обучение на ранних документах,
+    проверка на последних HOLDOUT_SHARE. «Отсечён» — p(approve) < threshold.
+      prune_precision — доля отклонённых среди отсечённых
+      prune_recall    — доля отклонённых, которые модель отсекла бы
+      approved_lost   — одобренные, которые отсеклись бы по ошибке
+    """
+    docs = sorted(docs if docs is not None else (_state or {}).get("docs", {}).values(),
+                  key=lambda d: d["ts"])
+    cut  = int(len(docs) * (1 - HOLDOUT_SHARE))
+    train_docs, test_docs = docs[:cut], docs[cut:]
+    if not NUMPY_AVAILABLE or not _enough(train_docs) or not test_docs:
+        return {"ready": False, "docs": len(docs)}
+    model = train(train_docs)
+    X     = _matrix([d["f"] for d in test_docs], model["idf"])
+    p     = _sigmoid(_logits(X, model["w"], model["b"]))
+    y     = np.array([d["y"] for d in test_docs])
+    pruned   = p < threshold
+    rejected = y == 0
+    tp       = int((pruned & rejected).sum())
+    return {
+        "ready":           True,
+        "docs":            len(docs),
+        "test":            len(test_docs),
+        "threshold":       threshold,
+        "pruned":          int(pruned.sum()),
+        "prune_precision": tp / pruned.sum() if pruned.sum() else 0.0,
+        "prune_recall":    tp / rejected.sum() if rejected.sum() else 0.0,
+        "approved_lost":   int((pruned & ~rejected).sum()),
+        "accuracy":        float(((p >= 0.5) == (y == 1)).mean()),
+    }
+
+
+def format_report(m: dict) -> str:
+    if not m.get("ready"):
+        return (f"Pre-ranker: недостаточно размеченных постов ({m.get('docs', 0)}; "
+                f"нужно >= {MIN_PER_CLASS} каждого класса)")
+    return (
+        f"Pre-ranker (holdout {m['test']} из {m['docs']}, порог {m['threshold']}):\n"
+        f"  accuracy {m['accuracy']:.0%}\n"
+        f"  отсечено до окон выбора и проверки дублей {m['pruned']}: precision {m['prune_precision']:.0%}, "
+        f"recall отклонённых {m['prune_recall']:.0%}, потеряно одобренных {m['approved_lost']}"
+    )
+
+
+def _enough(docs) -> bool:
+    pos = sum(1 for d in docs if d["y"] == 1)
+    return pos >= MIN_PER_CLASS and len(docs) - pos >= MIN_PER_CLASS
+
+
+# ────────────────────────────────────────────────
+# КОРПУС И СИНХРОНИЗАЦИЯ
+# ────────────────────────────────────────────────
+def _empty_state() -> dict:
+    return {"version": PRERANK_VERSION, "cursor": None, "docs": {}, "open": [], "model": None}
+
+
+def _label(row: dict, docs: dict) -> bool:
+    """Добавляет решённую строку в корпус. True — если появилась новая метка."""
+    status = row.get("status")
+    if status not in POSITIVE + NEGATIVE or row["id"] in docs:
+        return False
+    text = doc_text(row.get("title"), row.get("source_snippet"))
+    docs[row["id"]] = {
+        "f":  {str(k): v for k, v in _token_ids(text).items()},
+        "y":  1 if status in POSITIVE else 0,
+        "ts": (row.get("created_at") or "")[:19],
+    }
+    return True
+
+
+def sync(db) -> int:
+    """
+    Догружает новые решения из pending_posts. Возвращает число новых меток.
+    Ошибки Supabase пробрасываются.
+    """
+    global _state
+    state = load_json(PRERANK_FILE, None)
+    if not state or state.get("version") != PRERANK_VERSION:
+        state = _empty_state()
+    docs, started, added = state["docs"], datetime.now(timezone.utc), 0
+    columns = "id, title, source_snippet, status, created_at"
+    try:
+        db.table("pending_posts").select(columns).limit(1).execute()
+    except Exception as e:
+        if not missing_column(e, "source_snippet"):
+            raise
+        print("Pre-ranker: pending_posts.source_snippet missing (see TUTORIAL.md) — training on titles only")
+        columns = "id, title, status, created_at"
+
+    start = 0
+    while True:
+        q = db.table("pending_posts").select(columns)
+        if state["cursor"]:
+            q = q.gte("created_at", state["cursor"])
+        page = q.order("created_at").range(start, start + SYNC_PAGE - 1).execute().data or []
+        for row in page:
+            if row.get("status") in OPEN:
+                if row["id"] not in state["open"]:
+                    state["open"].append(row["id"])
+            elif _label(row, docs):
+                added += 1
+        if len(page) < SYNC_PAGE:
+            break
+        start += SYNC_PAGE
+
+    # Решения по постам, которые в прошлый раз ещё ждали
+    still_open = []
+    for i in range(0, len(state["open"]), 80):
+        chunk = state["open"][i:i + 80]
+        for row in db.table("pending_posts").select(columns).in_("id", chunk).execute().data or []:
+            if row.get("status") in OPEN:
+                still_open.append(row["id"])
+            elif _label(row, docs):
+                added += 1
+    state["open"]   = still_open
+    state["cursor"] = (started - timedelta(minutes=SYNC_OVERLAP_MIN)).strftime("%Y-%m-%dT%H:%M:%S")
+    _state = state
+    return added
+
+
+def _pack(model: dict) -> dict:
+    nz = np.flatnonzero(model["w"])
+    return {"idx": nz.tolist(), "val": model["w"][nz].tolist(), "b": model["b"]}
+
+
+def _unpack(packed: dict, idf) -> dict:
+    w = np.zeros(DIM)
+    w[np.asarray(packed["idx"], dtype=np.int64)] = packed["val"]
+    return {"w": w, "b": packed["b"], "idf": idf}
+
+
+def load(db) -> str:
+    """
+    Синхронизирует корпус и (пере)обучает модель, если появились новые метки.
+    Возвращает строку для лога. Модель доступна через score().
+    """
+    global _model
+    added = sync(db)
+    docs  = list(_state["docs"].values())
+    pos   = sum(1 for d in docs if d["y"] == 1)
+    if not NUMPY_AVAILABLE:
+        _model = None
+        summary = "numpy not installed — disabled"
+    elif not _enough(docs):
+        _model = None
+        summary = f"not enough labels ({pos} approved / {len(docs) - pos} rejected) — disabled"
+    else:
+        warm = _unpack(_state["model"], _idf(docs)) if _state.get("model") else None
+        if added or warm is None:
+            _model = train(docs, warm=warm)
+            _state["model"] = _pack(_model)
+            summary = f"retrained on {len(docs)} posts (+{added})"
+        else:
+            _model = warm
+            summary = f"{len(docs)} posts, no new labels"
+    save_json(PRERANK_FILE, _state)
+    return f"Pre-ranker: {summary}, {len(_state['open'])} undecided"
+
+
+def score(candidates: list) -> list:
+    """p(approve) для кандидатов (title + snippet) или None, если модели нет."""
+    if _model is None or not candidates:
+        return None
+    return predict(_model, [doc_text(c["title"], c.get("snippet")) for c in candidates])
@@ -0,0 +1,163 @@
+"""
+relevance.py — скомпилированный матчер ключевых слов для фильтров релевантности.
+
+is_vc_relevant, фильтр RSS и apply_priority_boosts проверяли `kw in content`
+для каждого слова каждого списка: HARD_EXCLUDE_KEYWORDS, все запреты
+фаундера, VC_KEYWORDS, RSS_VC_KEYWORDS, STAGE_BOOST_KEYWORDS. С сотнями
+анти-кейсов это сотни проходов по тексту на каждого кандидата.
+
+KeywordMatcher собирает все списки в один автомат — регулярное выражение
+в форме префиксного дерева (общие префиксы слов не повторяются, например
+pre(?:-seed|seed)). Один проход re.search находит позицию, где начинается
+хоть одно слово; в ней все слова проверяются через startswith по корзинам
+первых двух символов, и поиск продолжается со следующего символа — так
+перекрывающиеся совпадения (seed / pre-seed / seed round) из разных групп
+тоже находятся.
+
+На малых словарях `in` по каждому слову (C-цикл) быстрее обхода автомата,
+поэтому до SMALL_VOCAB слов используется он. Замеры:
+benchmarks/bench_relevance.py.
+
+Совпадение — подстрока, как раньше: текст и слова сравниваются как есть,
+приведение к нижнему регистру — на стороне вызывающего.
+
+Только stdlib; NumPy для score_batch — опционально.
+"""
+
+import re
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+SMALL_VOCAB = 150   # до стольких слов — простой перебор `in` (точка безубыточности по бенчмарку)
+
+
+def _trie_regex(words) -> "re.Pattern":
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return re.compile(build(trie))
+
+
+class KeywordMatcher:
+    """
+    Матчер для нескольких именованных групп слов:
+
+        m = KeywordMatcher({"exclude": [...], "vc": [...]})
+        m.scan(text)  →  {"exclude": [...], "vc": [...]}  (только группы с попаданиями)
+    """
+
+    def __init__(self, groups: dict):
+        self.groups   = {}   # слово → [группы] (одно слово может быть в нескольких)
+        for group, words in groups.items():
+            for word in words:
+                if word and group not in self.groups.setdefault(word, []):
+                    self.groups[word].append(group)
+        self._buckets = {}   # первые 1-2 символа → слова
+        for word in self.groups:
+            self._buckets.setdefault(word[:2], []).append(word)
+        self._re = _trie_regex(self.groups) if len(self.groups) > SMALL_VOCAB else None
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def scan(self, text: str) -> dict:
+        """Все попадания: {группа: [слова]}."""
+        hits = {}
+        if not text:
+            return hits
+        if self._re is None:
+            for word, groups in self.groups.items():
+                if word in text:
+                    for group in groups:
+                        hits.setdefault(group, []).append(word)
+            return hits
+
+        seen, pos, search = set(), 0, self._re.search
+        while True:
+            m = search(text, pos)
+            if m is None:
+                return hits
+            i = m.start()
+            for key in (text[i:i + 2], text[i]):
+                for word in self._buckets.get(key, ()):
+                    if word not in seen and text.startswith(word, i):
+                        seen.add(word)
+                        for group in self.groups[word]:
+                            hits.setdefault(group, []).append(word)
+            pos = i + 1
+
+    def matches(self, text: str, group: str) -> bool:
+        return group in self.scan(text)
+
+
+# ────────────────────────────────────────────────
+# ПАКЕТНЫЙ СКОРИНГ
+#
+# Фильтр релевантности и ранжирование — один проход по всему списку
+# кандидатов: матрица признаков (строка на кандидата) → маска релевантности,
+# приоритет с бустами и итоговый score. С NumPy — векторно (тысячи
+# кандидатов из пула поллера за миллисекунды), без него — тот же расчёт
+# циклом. Группы попаданий — как в bridge.relevance_matcher.
+# ────────────────────────────────────────────────
+FEATURES = ("vc_hits", "excluded", "prohibited", "region_boost", "world_demote", "stage_hit", "priority")
+
+# Сдвиг приоритета за region_boost / world_demote / stage_hit (меньше = раньше)
+BOOST_WEIGHTS = (-2, 1, -1)
+# Плотность VC-слов разбивает ничьи внутри одного приоритета, но никогда
+# не перепрыгивает в соседний: вклад не больше VC_HIT_WEIGHT < 1
+VC_HIT_WEIGHT = 0.5
+VC_HIT_CAP    = 5
+
+
+def feature_row(hits: dict, region: str, priority: int,
+                region_boosts=(), stage_boost: bool = False) -> tuple:
+    """Строка признаков в порядке FEATURES из попаданий KeywordMatcher.scan."""
+    return (
+        len(hits.get("vc", ())),
+        int("exclude" in hits),
+        int("prohibition" in hits),
+        int(region in region_boosts),
+        int(bool(region_boosts) and region == "World"),
+        int(stage_boost and "stage" in hits),
+        priority,
+    )
+
+
+def score_batch(rows: list) -> tuple:
+    """
+    rows — строки feature_row. Возвращает три списка той же длины:
+      relevant — есть VC-слово и нет исключений/запретов
+      priority — приоритет с бустами фидбэка (как раньше apply_priority_boosts)
+      score    — ключ сортировки: priority минус вклад плотности VC-слов
+    """
+    if not rows:
+        return [], [], []
+    if NUMPY_AVAILABLE:
+        m        = np.asarray(rows, dtype=np.float64)
+        relevant = (m[:, 0] > 0) & (m[:, 1] == 0) & (m[:, 2] == 0)
+        priority = m[:, 6] + m[:, 3:6] @ np.asarray(BOOST_WEIGHTS, dtype=np.float64)
+        score    = priority - VC_HIT_WEIGHT * np.minimum(m[:, 0], VC_HIT_CAP) / (VC_HIT_CAP + 1)
+        return relevant.tolist(), priority.astype(int).tolist(), score.tolist()
+
+    relevant, priority, score = [], [], []
+    for vc, excluded, prohibited, region, world, stage, prio in rows:
+        boosted = prio + region * BOOST_WEIGHTS[0] + world * BOOST_WEIGHTS[1] + stage * BOOST_WEIGHTS[2]
+        relevant.append(vc > 0 and not excluded and not prohibited)
+        priority.append(boosted)
+        score.append(boosted - VC_HIT_WEIGHT * min(vc, VC_HIT_CAP) / (VC_HIT_CAP + 1))
+    return relevant, priority, score
@@ -0,0 +1,320 @@
+"""
+tavily_client.py — общий вызов Tavily Search для bridge.py и bulk_seed.py
+с кэшем ответов на диске (.cache/tavily_cache.json).
+
+Ключ кэша — (query, days, max_results, search_depth). Запросы из
+_build_search_queries меняются раз в месяц, поэтому повторный запуск после
+падения, 7-дневный fallback и повторные прогоны bulk_seed не тратят кредиты
+Tavily и не ждут сеть.
+
+  TAVILY_CACHE_TTL_HOURS   — сколько часов ответ считается свежим (0 — кэш выключен);
+                             вызов может передать свой ttl_hours (bulk_seed — архив за 90 дней)
+  TAVILY_CACHE_MAX_ENTRIES — максимум записей; лишние вытесняются по LRU
+
+Учёт кредитов (таблица tavily_ledger в Supabase): каждый вызов search()
+записывается с источником, стоимостью и исходом (ok / cached / stale /
+error / timeout / skipped). Бюджеты:
+
+  TAVILY_DAILY_BUDGET   — кредитов в сутки (UTC), 0 — без лимита
+  TAVILY_MONTHLY_BUDGET — кредитов в календарный месяц, 0 — без лимита
+  TAVILY_DEGRADE_AT     — доля бюджета, после которой включается деградация:
+                          необязательные запросы (essential=False) пропускаются,
+                          обязательные сначала берут устаревший ответ из кэша
+При исчерпании бюджета пропускаются все запросы. Переход в деградацию или
+исчерпание один раз за процесс сообщается через on_alert из init_ledger().
+Отчёт для админа — format_usage_report() (команда /tavily в feedback_bot.py).
+
+Журнал пишет строку на каждый вызов, включая бесплатные (cached / stale /
+skipped), поэтому за месяц строк больше лимита ответа PostgREST (1000):
+расход читается постранично (fetch_month_rows), для бюджета — только
+строки с credits > 0. Стоимость запроса резервируется под _lock до
+отправки, поэтому параллельные потоки bridge.py не выходят за бюджет.
+Запрос, оборвавшийся по timeout, мог успеть списать кредиты — его резерв
+не возвращается, в журнал он идёт как "timeout" с полной стоимостью.
+
+Только stdlib + local_store. Потокобезопасно: bridge.py ищет из пула потоков.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+from local_store import load_json, save_json
+
+TAVILY_CACHE_FILE        = "tavily_cache.json"
+TAVILY_CACHE_TTL_HOURS   = float(os.getenv("TAVILY_CACHE_TTL_HOURS", "6"))
+TAVILY_CACHE_MAX_ENTRIES = int(os.getenv("TAVILY_CACHE_MAX_ENTRIES", "300"))
+TAVILY_CACHE_STALE_HOURS = 72   # сколько держим просроченные ответы на случай деградации
+
+TAVILY_LEDGER_TABLE   = "tavily_ledger"
+TAVILY_DAILY_BUDGET   = int(os.getenv("TAVILY_DAILY_BUDGET", "0"))     # 0 — без лимита
+TAVILY_MONTHLY_BUDGET = int(os.getenv("TAVILY_MONTHLY_BUDGET", "0"))   # задаётся по тарифу, см. TUTORIAL
+TAVILY_DEGRADE_AT     = float(os.getenv("TAVILY_DEGRADE_AT", "0.8"))
+LEDGER_PAGE           = 1000   # лимит строк одного ответа PostgREST по умолчанию
+
+# Стоимость одного запроса в кредитах Tavily (не зависит от max_results)
+SEARCH_COST = {"basic": 1, "advanced": 2}
+
+# Поля результата, которые реально используются — остальное в кэш не пишем
+_RESULT_FIELDS = ("url", "title", "content", "published_date", "score")
+
+_cache = None
+_lock  = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+_ledger = {
+    "db": None, "source": "", "on_alert": None,
+    "day_key": "", "day_used": 0, "month_used": 0,
+    "rows": [], "alerted": "ok",
+}
+
+
+def _cache_key(query: str, days: int, max_results: int, search_depth: str) -> str:
+    raw = f"{search_depth}|{days}|{max_results}|{query.strip().lower()}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def _get_cache() -> dict:
+    """Загружает кэш один раз за процесс и выкидывает просроченные записи."""
+    global _cache
+    if _cache is None:
+        raw    = load_json(TAVILY_CACHE_FILE, {})
+        now    = time.time()
+        keep_h = TAVILY_CACHE_STALE_HOURS
+        _cache = {k: v for k, v in raw.items()
+                  if now - v["ts"] < max(v.get("ttl", TAVILY_CACHE_TTL_HOURS), keep_h) * 3600}
+    return _cache
+
+
+def _evict(cache: dict):
+    """LRU: оставляем TAVILY_CACHE_MAX_ENTRIES записей с самым свежим used."""
+    if len(cache) <= TAVILY_CACHE_MAX_ENTRIES:
+        return
+    by_use = sorted(cache, key=lambda k: cache[k]["used"])
+    for k in by_use[:len(cache) - TAVILY_CACHE_MAX_ENTRIES]:
+        del cache[k]
+
+
+# ────────────────────────────────────────────────
+# CREDIT LEDGER & BUDGET
+# ────────────────────────────────────────────────
+def fetch_month_rows(db, columns: str, paid_only: bool = False) -> list:
+    """
+    Все строки tavily_ledger за текущий месяц, постранично.
+    paid_only — только строки с credits > 0 (для подсчёта расхода).
+    """
+    month_start = datetime.now(timezone.utc).strftime("%Y-%m-01T00:00:00+00:00")
+    rows, start = [], 0
+    while True:
+        q = db.table(TAVILY_LEDGER_TABLE).select(columns).gte("created_at", month_start)
+        if paid_only:
+            q = q.gt("credits", 0)
+        page = q.order("created_at").range(start, start + LEDGER_PAGE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < LEDGER_PAGE:
+            return rows
+        start += LEDGER_PAGE
+
+
+def init_ledger(db=None, source: str = "", on_alert=None):
+    """
+    Подключает учёт кредитов. db — клиент Supabase (None — учёт только в памяти),
+    source — имя скрипта для отчёта, on_alert(text) — уведомление админа.
+    Загружает расход за текущий месяц (платные строки, постранично).
+    """
+    today = datetime.now(timezone.utc)
+    _ledger.update({"db": db, "source": source, "on_alert": on_alert,
+                    "day_key": today.strftime("%Y-%m-%d")})
+    if db is None:
+        return
+    try:
+        rows = fetch_month_rows(db, "credits, created_at", paid_only=True)
+        _ledger["month_used"] = sum(r.get("credits") or 0 for r in rows)
+        _ledger["day_used"]   = sum(r.get("credits") or 0 for r in rows
+                                    if (r.get("created_at") or "").startswith(_ledger["day_key"]))
+        print(f"Tavily credits: today {_ledger['day_used']}/{TAVILY_DAILY_BUDGET or '∞'}, "
+              f"month {_ledger['month_used']}/{TAVILY_MONTHLY_BUDGET or '∞'}")
+    except Exception as e:
+        print(f"tavily_ledger not available (budget counted for this run only): {e}")
+
+
+def budget_state(cost: int = 0) -> str:
+    """'ok' | 'degraded' | 'exhausted' — с учётом стоимости следующего запроса."""
+    fraction = 0.0
+    for used, budget in ((_ledger["day_used"], TAVILY_DAILY_BUDGET),
+                         (_ledger["month_used"], TAVILY_MONTHLY_BUDGET)):
+        if budget > 0:
+            if used + cost > budget:
+                return "exhausted"
+            fraction = max(fraction, used / budget)
+    return "degraded" if fraction >= TAVILY_DEGRADE_AT else "ok"
+
+
+def _record(query: str, days: int, max_results: int, search_depth: str,
+            credits: int, outcome: str, results: int = 0):
+    """
+    Пишет вызов в буфер журнала (вызывается под _lock). Счётчики расхода
+    здесь не меняются — стоимость резервируется в search() до запроса.
+    """
+    _ledger["rows"].append({
+        "source":       _ledger["source"],
+        "query":        query[:200],
+        "days":         days,
+        "max_results":  max_results,
+        "search_depth": search_depth,
+        "credits":      credits,
+        "outcome":      outcome,
+        "results":      results,
+    })
+
+
+def _check_alert():
+    """Один раз за процесс сообщает о переходе в degraded/exhausted."""
+    with _lock:
+        state = budget_state(SEARCH_COST["basic"])
+        if state == "ok" or state == _ledger["alerted"] or _ledger["alerted"] == "exhausted":
+            return
+        _ledger["alerted"] = state
+    text = (
+        f"Tavily: бюджет {'исчерпан — запросы пропускаются' if state == 'exhausted' else 'почти исчерпан — режим экономии'}.\n"
+        f"Сегодня {_ledger['day_used']}/{TAVILY_DAILY_BUDGET or '∞'}, "
+        f"месяц {_ledger['month_used']}/{TAVILY_MONTHLY_BUDGET or '∞'} кредитов."
+    )
+    print(text)
+    if _ledger["on_alert"]:
+        try:
+            _ledger["on_alert"](text)
+        except Exception as e:
+            print(f"Tavily budget alert failed: {e}")
+
+
+def flush_ledger():
+    """Отправляет накопленные записи журнала в Supabase одним insert."""
+    with _lock:
+        rows, _ledger["rows"] = _ledger["rows"], []
+    if not rows or _ledger["db"] is None:
+        return
+    try:
+        _ledger["db"].table(TAVILY_LEDGER_TABLE).insert(rows).execute()
+    except Exception as e:
+        print(f"Failed to write tavily_ledger ({len(rows)} rows): {e}")
+
+
+def format_usage_report(rows: list) -> str:
+    """
+    Отчёт по строкам tavily_ledger за текущий месяц
+    (нужны поля created_at, source, query, credits, outcome).
+    """
+    today   = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    month   = sum(r.get("credits") or 0 for r in rows)
+    day     = sum(r.get("credits") or 0 for r in rows if (r.get("created_at") or "").startswith(today))
+    by_src, by_outcome, by_query = {}, {}, {}
+    for r in rows:
+        credits = r.get("credits") or 0
+        by_src[r.get("source") or "?"]       = by_src.get(r.get("source") or "?", 0) + credits
+        by_outcome[r.get("outcome") or "?"]  = by_outcome.get(r.get("outcome") or "?", 0) + 1
+        by_query[r.get("query") or ""]       = by_query.get(r.get("query") or "", 0) + credits
+    top = sorted(by_query.items(), key=lambda kv: kv[1], reverse=True)[:5]
+    return (
+        "Tavily credits\n\n"
+        f"Сегодня: {day}/{TAVILY_DAILY_BUDGET or '∞'}\n"
+        f"Месяц:   {month}/{TAVILY_MONTHLY_BUDGET or '∞'}\n\n"
+        "По источникам: " + (", ".join(f"{k} {v}" for k, v in sorted(by_src.items())) or "—") + "\n"
+        "Вызовы: " + (", ".join(f"{k} {v}" for k, v in sorted(by_outcome.items())) or "—") + "\n\n"
+        "Самые дорогие запросы:\n" + ("\n".join(f"  {v} — {q[:60]}" for q, v in top if v) or "  —")
+    )
+
+
+def _is_timeout(error) -> bool:
+    # tavily.errors.TimeoutError не наследует встроенный TimeoutError
+    return isinstance(error, TimeoutError) or "timeout" in type(error).__name__.lower() \
+        or "timed out" in str(error).lower()
+
+
+def search(client, query: str, max_results: int = 5, days: int = 5,
+           search_depth: str = "basic", ttl_hours: float = None,
+           essential: bool = True, timeout: float = None) -> dict:
+    """
+    Аналог client.search(...) с кэшем и бюджетом.
+    Возвращает {"results": [...], "cached": bool, "skipped": bool}.
+    skipped=True — запрос не отправлен из-за бюджета (results пустой).
+    timeout — секунд на HTTP-запрос (None — таймаут SDK по умолчанию).
+    Ошибки Tavily пробрасываются наружу — обработка остаётся у вызывающего кода.
+    """
+    ttl       = TAVILY_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours
+    use_cache = TAVILY_CACHE_TTL_HOURS > 0 and ttl > 0
+    key       = _cache_key(query, days, max_results, search_depth)
+    cost      = SEARCH_COST.get(search_depth, 1)
+    now       = time.time()
+
+    with _lock:
+        state = budget_state(cost)
+        entry = _get_cache().get(key) if use_cache else None
+        if entry and (now - entry["ts"] < ttl * 3600 or state != "ok"):
+            # Свежий ответ — всегда; устаревший — только в режиме экономии
+            entry["used"] = now
+            _stats["hits"] += 1
+            outcome = "cached" if now - entry["ts"] < ttl * 3600 else "stale"
+            _record(query, days, max_results, search_depth, 0, outcome, len(entry["results"]))
+            return {"results": entry["results"], "cached": True, "skipped": False}
+        if state == "exhausted" or (state == "degraded" and not essential):
+            _record(query, days, max_results, search_depth, 0, "skipped")
+            print(f"Tavily budget ({state}): skipped {query[:60]}")
+            skipped = True
+        else:
+            # Резерв до запроса: следующий поток уже видит эти кредиты потраченными
+            _ledger["day_used"]   += cost
+            _ledger["month_used"] += cost
+            skipped = False
+    if skipped:
+        _check_alert()
+        return {"results": [], "cached": False, "skipped": True}
+
+    params = {"timeout": timeout} if timeout else {}
+    try:
+        response = client.search(
+            query=query,
+            search_depth=search_depth,
+            max_results=max_results,
+            days=days,
+            **params,
+        )
+    except Exception as e:
+        with _lock:
+            if _is_timeout(e):
+                # Tavily мог обработать запрос — кредиты считаем потраченными
+                _record(query, days, max_results, search_depth, cost, "timeout")
+            else:
+                _ledger["day_used"]   -= cost
+                _ledger["month_used"] -= cost
+                _record(query, days, max_results, search_depth, 0, "error")
+        raise
+    results = [
+        {f: r.get(f) for f in _RESULT_FIELDS if r.get(f) is not None}
+        for r in response.get("results", [])
+    ]
+    for r in results:
+        if r.get("content"):
+            r["content"] = r["content"][:600]
+
+    with _lock:
+        _record(query, days, max_results, search_depth, cost, "ok", len(results))
+        if use_cache:
+            cache = _get_cache()
+            cache[key] = {"ts": now, "used": now, "ttl": ttl, "results": results}
+            _evict(cache)
+            _stats["misses"] += 1
+    _check_alert()
+    return {"results": results, "cached": False, "skipped": False}
+
+
+def save_cache():
+    """Сохраняет кэш на диск. Вызывается в конце запуска."""
+    with _lock:
+        if _cache is None:
+            return
+        save_json(TAVILY_CACHE_FILE, _cache)
+    if _stats["hits"] or _stats["misses"]:
+        print(f"Tavily cache: {_stats['hits']} hits, {_stats['misses']} misses, {len(_cache)} entries stored")
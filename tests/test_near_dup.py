@@ -0,0 +1,46 @@
+import near_dup
+
+
+def _index_with(title: str):
+    near_dup._index = {"docs": {"posted:1": near_dup._doc(title, "", "posted", "2099-01-01T00:00:00")}}
+
+
+def teardown_function():
+    near_dup._index = None
+
+
+def test_different_company_same_amount_is_not_local_duplicate():
+    _index_with("Kazakh fintech startup Alem raises $10M Series A")
+    verdict, _ = near_dup.check("Kazakh fintech startup Beta raises $10M Series A")
+    assert verdict == "ambiguous"
+
+
+def test_different_accelerator_focus_is_not_local_duplicate():
+    _index_with("Astana Hub launches accelerator for AI startups")
+    verdict, _ = near_dup.check("Astana Hub launches accelerator for fintech startups")
+    assert verdict == "ambiguous"
+
+
+def test_reprint_with_same_company_and_amount_is_duplicate():
+    _index_with("Kazakh startup Alem raises $10M Series A")
+    verdict, _ = near_dup.check("Kazakh fintech startup Alem raises $10M Series A")
+    assert verdict == "duplicate"
+
+
+def _clusters(*titles):
+    return near_dup.cluster([{"title": t, "snippet": ""} for t in titles])
+
+
+def test_cluster_keeps_different_companies_apart():
+    assert len(_clusters("Kazakh fintech startup Alem raises $10M Series A",
+                         "Kazakh fintech startup Beta raises $10M Series A")) == 2
+
+
+def test_cluster_keeps_different_accelerators_apart():
+    assert len(_clusters("Astana Hub launches accelerator for AI startups",
+                         "Astana Hub launches accelerator for fintech startups")) == 2
+
+
+def test_cluster_merges_reprints_of_one_round():
+    assert len(_clusters("Kazakh startup Alem raises $10M Series A",
+                         "Kazakh fintech startup Alem raises $10M Series A")) == 1